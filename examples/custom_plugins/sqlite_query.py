@@ -0,0 +1,50 @@
+"""
+SQLite Query Plugin 🗃️
+
+Runs a query on a SQLite database and returns its rows. Jobs which run at
+the same time share one connection per database, see run_batch.
+
+Parameters:
+  - database: Path of the database file.
+  - query: SQL query to run.
+
+Returns:
+  - rows: List of the rows, every row is a list of its values.
+
+Example:
+  plugin: file:./examples/custom_plugins/sqlite_query.py
+  params:
+    database: app.db
+    query: "SELECT COUNT(*) FROM users"
+"""
+
+import sqlite3
+from taskcrafter.models.plugin import PluginInterface
+
+
+class Plugin(PluginInterface):
+    name = "SQLite query 🗃️"
+    description = "Runs a query on a SQLite database, one connection per batch 🗃️"
+
+    def run(self, params: dict):
+        return self.run_batch([params])[0]
+
+    def run_batch(self, batch: list[dict]) -> list:
+        connections = {}
+        results = []
+
+        try:
+            for params in batch:
+                try:
+                    database = params["database"]
+                    if database not in connections:
+                        connections[database] = sqlite3.connect(database)
+                    rows = connections[database].execute(params["query"]).fetchall()
+                    results.append({"rows": [list(row) for row in rows]})
+                except Exception as e:
+                    results.append(e)
+        finally:
+            for connection in connections.values():
+                connection.close()
+
+        return results
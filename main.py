@@ -1,18 +1,43 @@
 import pathlib
+import time
 import click
-from taskcrafter.logger import app_logger
+from taskcrafter.logger import app_logger, configure as configure_logger
 from taskcrafter.util.file import get_file_content
 from taskcrafter.job_loader import JobManager
 from taskcrafter.hook_loader import HookManager
 from taskcrafter.plugin_loader import plugin_list, init_plugins, plugin_lookup
 from taskcrafter.scheduler import SchedulerManager
+from taskcrafter.trigger_engine import TriggerEngine
 from taskcrafter.preview import (
     rich_preview,
     result_table,
     plugin_info_preview,
     plugin_list_preview,
+    profile_preview,
+    cache_preview,
+    plan_preview,
+    stats_preview,
+    slowest_preview,
+    regression_preview,
+    schedule_preview,
+)
+from taskcrafter.input_output_resolver import find_profile_path, list_runs, prune_runs
+from taskcrafter.profiler import (
+    PROFILE_SUFFIX,
+    SNAPSHOT_SUFFIX,
+    get_profile_file,
+    top_allocations,
+    top_functions,
 )
 from taskcrafter.config import app_config
+from taskcrafter.exceptions.job import JobValidationError
+from taskcrafter.metrics import metrics
+from taskcrafter.tracing import tracer
+from taskcrafter.models.cache import CacheConfig
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.models.scheduler import SchedulerConfig
+from taskcrafter.planner import build_plan
+from taskcrafter.run_store import RUN_STORE_FILE, RunStore
 from taskcrafter.util.validator import validate_hooks, validate_jobs, validate_schema
 from taskcrafter.util.yaml import get_yaml_from_string
 from taskcrafter.wizard import create_file_wizard
@@ -31,8 +56,27 @@ schedulerManager: SchedulerManager = None
     default=JOBS_FILE,
     help="Name of the jobs file (yaml).",
 )
-def cli(file: str = JOBS_FILE):
+@click.option("--log-file", type=click.Path(), help="Path of the log file.")
+@click.option(
+    "--log-level",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+    help="Minimum level of logged messages.",
+)
+@click.option(
+    "--log-format",
+    type=click.Choice(["text", "json"]),
+    help="Format of the log file, json writes one JSON object per line.",
+)
+def cli(
+    file: str = JOBS_FILE,
+    log_file: str = None,
+    log_level: str = None,
+    log_format: str = None,
+):
     """CLI for TaskCrafter."""
+    if log_file or log_level or log_format:
+        configure_logger(log_file=log_file, level=log_level, log_format=log_format)
+
     file_path = pathlib.Path(file)
 
     if not file_path.is_file():
@@ -61,7 +105,7 @@ def help():
     click.echo("   e.g., taskcrafter jobs run --help\n")
 
 
-def validate_and_initialize(show_report: bool = False):
+def validate_and_initialize(show_report: bool = False, **cache_options):
     """Reads file, validates schema, initializes plugins, and sets up managers."""
 
     try:
@@ -70,10 +114,18 @@ def validate_and_initialize(show_report: bool = False):
         validate_schema(yaml)
         init_plugins(yaml)
 
+        app_config.scheduler = SchedulerConfig(**(yaml.get("scheduler") or {}))
+        app_config.cache = CacheConfig(**(yaml.get("cache") or {}))
+        app_config.cache.update(**cache_options)
+        app_config.rate_limits = {
+            name: RateLimit(name=name, **options)
+            for name, options in (yaml.get("rate_limits") or {}).items()
+        }
+
         jobManager = JobManager(file_content)
         hookManager = HookManager(file_content, job_manager=jobManager)
 
-        validate_jobs(jobManager.jobs, show_report=show_report)
+        validate_jobs(jobManager.jobs, app_config.rate_limits, show_report=show_report)
         validate_hooks(hookManager.hooks, show_report=show_report)
     except Exception as e:
         app_logger.error(f"{e.__class__.__name__}: {e}")
@@ -82,16 +134,32 @@ def validate_and_initialize(show_report: bool = False):
     return jobManager, hookManager
 
 
-def run_helper(job_id: str):
+def load_cache_config(**cache_options) -> CacheConfig:
+    """Reads the cache section of the jobs file, without initializing jobs."""
+    yaml = get_yaml_from_string(get_file_content(app_config.jobs_file)) or {}
+
+    config = CacheConfig(**(yaml.get("cache") or {}))
+    config.update(**cache_options)
+
+    return config
+
+
+def run_helper(job_id: str, cache_dir: str = None, **scheduler_options):
     """
     Core logic for running jobs. Can be called programmatically.
     """
     global schedulerManager
 
-    jobManager, hookManager = validate_and_initialize()
+    jobManager, hookManager = validate_and_initialize(dir=cache_dir)
     if jobManager is None or hookManager is None:
         return
 
+    app_logger.info(f"Caching outputs of this run in {jobManager.cache.run_dir}")
+
+    # CLI flags take precedence over the scheduler section of the jobs file
+    app_config.scheduler.update(**scheduler_options)
+    jobManager.start_run()
+
     if job_id:
         try:
             job = jobManager.job_get_by_id(job_id)
@@ -101,13 +169,34 @@ def run_helper(job_id: str):
         jobManager.jobs = [job]
 
     schedulerManager = SchedulerManager(
-        job_manager=jobManager, hook_manager=hookManager
+        job_manager=jobManager,
+        hook_manager=hookManager,
+        config=app_config.scheduler,
+        rate_limits=app_config.rate_limits,
     )
 
+    if app_config.metrics_port:
+        metrics.serve(app_config.metrics_port)
+    if app_config.metrics_file:
+        metrics.start_textfile_writer(app_config.metrics_file)
+    if app_config.trace_file:
+        tracer.enable()
+
+    # skipped jobs get no scheduler entries and pull no images
+    jobManager.prune_jobs()
+    jobManager.prefetch_images()
+
     for job in jobManager.jobs:
         schedulerManager.schedule_job(job)
 
     schedulerManager.start_scheduler()
+    jobManager.images.shutdown()
+
+    if app_config.metrics_file:
+        metrics.stop_textfile_writer(app_config.metrics_file)
+    metrics.shutdown()
+    if app_config.trace_file:
+        tracer.export(app_config.trace_file)
 
     result_table(jobManager.executed_jobs)
 
@@ -119,7 +208,52 @@ def jobs():
 
 @jobs.command()
 @click.option("--job", "-j", "job_id", help="Name of the job.")
-def run(job_id: str):
+@click.option("--pool-size", type=int, help="Number of scheduler worker threads.")
+@click.option(
+    "--max-instances", type=int, help="Max concurrently running instances of a job."
+)
+@click.option(
+    "--misfire-grace-time",
+    type=int,
+    help="Seconds a job may run late before it counts as missed.",
+)
+@click.option(
+    "--coalesce/--no-coalesce",
+    default=None,
+    help="Run missed executions of a job only once.",
+)
+@click.option(
+    "--metrics-port", type=int, help="Serve OpenMetrics on localhost:<port>/metrics."
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(),
+    help="Write OpenMetrics to a file (textfile collector).",
+)
+@click.option(
+    "--trace-file",
+    type=click.Path(),
+    help="Record spans of every run phase and export them as OTLP-JSON.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Profile CPU and memory of every plugin run.",
+)
+@click.option("--cache-dir", type=click.Path(), help="Directory of cached outputs.")
+def run(
+    job_id: str,
+    pool_size: int,
+    max_instances: int,
+    misfire_grace_time: int,
+    coalesce: bool,
+    metrics_port: int,
+    metrics_file: str,
+    trace_file: str,
+    profile: bool,
+    cache_dir: str,
+):
     """
     Runs all jobs from YAML file. If a --job parameter is provided, it runs only that job.
 
@@ -128,9 +262,26 @@ def run(job_id: str):
     \b
         taskcrafter jobs run
         taskcrafter jobs run --job job1
+        taskcrafter jobs run --pool-size 32 --max-instances 2
+        taskcrafter jobs run --metrics-port 9464
+        taskcrafter jobs run --trace-file traces/run.json
+        taskcrafter jobs run --job job1 --profile
+        taskcrafter jobs run --cache-dir /var/cache/taskcrafter
     """
 
-    run_helper(job_id)
+    app_config.metrics_port = metrics_port
+    app_config.metrics_file = metrics_file
+    app_config.trace_file = trace_file
+    app_config.profile = profile
+
+    run_helper(
+        job_id,
+        cache_dir=cache_dir,
+        pool_size=pool_size,
+        max_instances=max_instances,
+        misfire_grace_time=misfire_grace_time,
+        coalesce=coalesce,
+    )
 
 
 @jobs.command()
@@ -151,6 +302,68 @@ def list():
     rich_preview(jobManager.jobs, hookManager.hooks)
 
 
+@jobs.command()
+@click.option(
+    "--default-duration",
+    type=float,
+    default=0,
+    help="Seconds assumed for jobs without a recorded duration.",
+)
+@click.option("--cache-dir", type=click.Path(), help="Directory of cached outputs.")
+def plan(default_duration: float, cache_dir: str):
+    """
+    Shows the execution waves, critical path, max parallel width and the
+    estimated makespan, from durations recorded by previous runs.
+
+    Examples:
+
+    \b
+        taskcrafter jobs plan
+        taskcrafter jobs plan --default-duration 30
+    """
+    jobManager, hookManager = validate_and_initialize(dir=cache_dir)
+    if jobManager is None or hookManager is None:
+        return
+
+    durations = jobManager.run_store.estimates()
+
+    try:
+        execution_plan = build_plan(jobManager.jobs, durations, default_duration)
+    except JobValidationError as e:
+        app_logger.error(str(e))
+        return
+
+    plan_preview(execution_plan, pool_size=app_config.scheduler.pool_size)
+
+
+@jobs.command()
+@click.option("--next", "-n", "count", default=10, help="Number of firings to show.")
+def schedule(count: int):
+    """
+    Forecast the next firings of cron jobs. Jobs with the same cron
+    expression fire together.
+
+    Examples:
+
+    \b
+        taskcrafter jobs schedule
+        taskcrafter jobs schedule --next 50
+    """
+    jobManager, hookManager = validate_and_initialize()
+    if jobManager is None or hookManager is None:
+        return
+
+    engine = TriggerEngine()
+    for job in jobManager.jobs:
+        if job.enabled and job.schedule:
+            engine.add_job(job)
+
+    app_logger.info(
+        f"{engine.get_job_count()} cron jobs in {len(engine.cohorts)} schedules."
+    )
+    schedule_preview(engine.forecast(count))
+
+
 @click.group()
 def plugins():
     """Manage TaskCrafter plugins."""
@@ -198,8 +411,172 @@ def plugin_info(name):
     plugin_info_preview(plugin)
 
 
+@click.group()
+def profile():
+    """Inspect plugin profiles."""
+
+
+@profile.command("show")
+@click.argument("job_id")
+@click.option("--limit", "-n", default=20, help="Number of entries to show.")
+@click.option("--partition", "-p", type=int, help="Partition of a partitioned job.")
+def profile_show(job_id: str, limit: int, partition: int):
+    """
+    Show top functions and allocations of the last profiled run of a job.
+
+    Jobs are profiled with `profile: true` in the jobs file, or with
+    `taskcrafter jobs run --profile`.
+
+    Examples:
+
+    \b
+        taskcrafter profile show job1
+        taskcrafter profile show job1 --limit 50
+        taskcrafter profile show job1 --partition 2
+    """
+    path = find_profile_path(job_id, pathlib.Path(load_cache_config().dir), partition)
+    if path is None:
+        app_logger.error(f"No profile found for job {job_id}.")
+        return
+
+    profile_file = get_profile_file(path, PROFILE_SUFFIX)
+    snapshot_file = get_profile_file(path, SNAPSHOT_SUFFIX)
+
+    profile_preview(
+        job_id,
+        functions=top_functions(profile_file, limit) if profile_file.exists() else None,
+        allocations=(
+            top_allocations(snapshot_file, limit) if snapshot_file.exists() else None
+        ),
+    )
+
+
+@click.group()
+def cache():
+    """Inspect and prune cached job outputs."""
+
+
+@cache.command("stats")
+@click.option("--cache-dir", type=click.Path(), help="Directory of cached outputs.")
+def cache_stats(cache_dir: str):
+    """
+    Show the cached runs and their size.
+
+    Examples:
+
+    \b
+        taskcrafter cache stats
+    """
+    config = load_cache_config(dir=cache_dir)
+    cache_preview(list_runs(pathlib.Path(config.dir)))
+
+
+@cache.command("prune")
+@click.option("--cache-dir", type=click.Path(), help="Directory of cached outputs.")
+@click.option("--max-runs", type=int, help="Number of runs to keep.")
+@click.option("--max-age-days", type=float, help="Remove runs older than this.")
+@click.option("--max-size-mb", type=float, help="Remove the oldest runs above this.")
+def cache_prune(cache_dir: str, max_runs: int, max_age_days: float, max_size_mb: float):
+    """
+    Remove cached runs by the retention policy of the jobs file or the
+    given limits.
+
+    Examples:
+
+    \b
+        taskcrafter cache prune
+        taskcrafter cache prune --max-runs 0
+        taskcrafter cache prune --max-age-days 7 --max-size-mb 500
+    """
+    config = load_cache_config(
+        dir=cache_dir,
+        max_runs=max_runs,
+        max_age_days=max_age_days,
+        max_size_mb=max_size_mb,
+    )
+
+    removed = prune_runs(
+        pathlib.Path(config.dir),
+        max_runs=config.max_runs,
+        max_age_days=config.max_age_days,
+        max_size_mb=config.max_size_mb,
+    )
+
+    cache_preview(removed, title="Removed runs")
+
+
+@cli.command()
+@click.option(
+    "--by",
+    type=click.Choice(["job", "plugin"]),
+    default="job",
+    help="Group the percentiles by job or plugin.",
+)
+@click.option("--job", "-j", "job_id", help="Only runs of this job.")
+@click.option("--since-days", type=float, help="Only runs of the last days.")
+@click.option("--slowest", "-n", default=10, help="Number of slowest runs to show.")
+@click.option("--window", default=5, help="Recent runs compared against the baseline.")
+@click.option("--baseline", default=50, help="Runs before the window.")
+@click.option(
+    "--threshold",
+    default=1.5,
+    help="Slowdown of the recent median which counts as a regression.",
+)
+@click.option(
+    "--export",
+    "export_path",
+    type=click.Path(),
+    help="Write the matching run records to a .csv or .json file.",
+)
+@click.option("--cache-dir", type=click.Path(), help="Directory of cached outputs.")
+def stats(
+    by: str,
+    job_id: str,
+    since_days: float,
+    slowest: int,
+    window: int,
+    baseline: int,
+    threshold: float,
+    export_path: str,
+    cache_dir: str,
+):
+    """
+    Show duration percentiles, the slowest runs and regressions of jobs,
+    from the runs recorded in the cache directory.
+
+    Examples:
+
+    \b
+        taskcrafter stats
+        taskcrafter stats --by plugin --since-days 7
+        taskcrafter stats --job job1 --window 10 --threshold 2
+        taskcrafter stats --export runs.csv
+    """
+    config = load_cache_config(dir=cache_dir)
+    store = RunStore(pathlib.Path(config.dir) / RUN_STORE_FILE)
+    since = time.time() - since_days * 86400 if since_days is not None else None
+
+    if export_path:
+        try:
+            count = store.export(pathlib.Path(export_path), job_id, since)
+        except ValueError as e:
+            app_logger.error(str(e))
+            return
+
+        app_logger.info(f"Exported {count} run records to {export_path}.")
+        return
+
+    stats_preview(store.duration_stats(by, job_id, since), by=by)
+    slowest_preview(store.slowest(slowest, job_id, since))
+    regression_preview(
+        store.regressions(window, baseline, threshold, job_id), threshold
+    )
+
+
 cli.add_command(jobs)
 cli.add_command(plugins)
+cli.add_command(profile)
+cli.add_command(cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import threading
+from typing import Callable
+from taskcrafter.metrics import plugin_batch_size
+from taskcrafter.models.job import Job, ResourceUsage
+
+
+class PluginBatch:
+    """Params of the jobs in one batch and, once it ran, their results."""
+
+    def __init__(self):
+        self.params: list[dict] = []
+        self.results: list = None
+        self.usage = ResourceUsage()
+        self.error: Exception = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class PluginBatcher:
+    """
+    Groups runs of jobs which use the same batch plugin, so the plugin sets
+    up its connections or models once per batch instead of once per job.
+
+    The first job of a batch waits up to `window` seconds for more jobs with
+    the same plugin and timeout, or until the batch has `size` jobs, then
+    runs the whole batch with `execute` in its own worker thread. The other
+    jobs wait for their result in theirs, so a batch holds at most as many
+    jobs as there are free workers.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[str, list[dict], int], tuple[list, ResourceUsage]],
+        window: float = 0.05,
+        size: int = 100,
+    ):
+        self.execute = execute
+        self.window = window
+        self.size = size
+        self.batches: dict[tuple, PluginBatch] = {}
+        self.lock = threading.Lock()
+
+    def run(self, job: Job, params: dict) -> tuple[object, ResourceUsage]:
+        """
+        Runs the params of a job in a batch and returns its result, an
+        exception if only its item failed, and its share of the usage.
+        Raises the error of the batch, e.g. a timeout.
+        """
+        key = (job.plugin, job.timeout)
+
+        with self.lock:
+            batch = self.batches.get(key)
+            is_first = batch is None
+            if is_first:
+                batch = self.batches[key] = PluginBatch()
+
+            index = len(batch.params)
+            batch.params.append(params)
+            if len(batch.params) >= self.size:
+                del self.batches[key]
+                batch.full.set()
+
+        if is_first:
+            batch.full.wait(self.window)
+            with self.lock:
+                # no job joins the batch anymore
+                if self.batches.get(key) is batch:
+                    del self.batches[key]
+
+            self.run_batch(job, batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+        return batch.results[index], batch.usage
+
+    def run_batch(self, job: Job, batch: PluginBatch):
+        plugin_batch_size.observe(len(batch.params), plugin=job.plugin)
+
+        try:
+            results, usage = self.execute(job.plugin, batch.params, job.timeout)
+            batch.results = results
+            batch.usage = usage.split(len(batch.params))
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
@@ -0,0 +1,191 @@
+import os
+import selectors
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+from taskcrafter.exceptions.plugin import (
+    PluginExecutionError,
+    PluginExecutionTimeoutError,
+)
+from taskcrafter.models.job import ResourceUsage
+from taskcrafter.models.plugin import PluginCommand
+from taskcrafter.usage import wait_process
+from taskcrafter.util.codec import to_text
+
+# bytes read from a pipe at once
+READ_SIZE = 64 * 1024
+
+
+@dataclass
+class CommandResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    usage: ResourceUsage = field(default_factory=ResourceUsage)
+
+
+def spawn_command(command: PluginCommand) -> subprocess.Popen:
+    """
+    Starts a command with pipes for stdin, stdout and stderr.
+
+    The executable is resolved to a path and no cwd or preexec_fn is used,
+    so Popen starts it with posix_spawn instead of fork and exec. The
+    environment is passed to the command only, it never changes os.environ.
+    """
+    if not command.args:
+        raise PluginExecutionError("Command is empty.")
+
+    executable = shutil.which(command.args[0])
+    if executable is None:
+        raise PluginExecutionError(f"Command {command.args[0]} not found.")
+
+    env = os.environ.copy()
+    env.update({key: str(value) for key, value in (command.env or {}).items()})
+
+    return subprocess.Popen(
+        [os.path.abspath(executable)] + [str(arg) for arg in command.args[1:]],
+        env=env,
+        stdin=subprocess.PIPE if command.input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+def _input_chunks(input: bytes | Iterable) -> Iterable[bytes]:
+    """Chunks of stdin, an iterable (e.g. a StreamPipe) is read lazily."""
+    if isinstance(input, (bytes, bytearray, memoryview, str)):
+        input = [input]
+
+    for chunk in input:
+        if isinstance(chunk, str):
+            yield chunk.encode()
+        elif isinstance(chunk, (bytes, bytearray, memoryview)):
+            yield chunk
+        else:
+            yield f"{to_text(chunk)}\n".encode()
+
+
+def _write_input(stdin, chunks: Iterable[bytes], errors: list[Exception]):
+    """
+    Writes stdin until the input ends or the command stops reading, then
+    closes it. Errors of the input, e.g. of a failed upstream job, are added
+    to errors.
+    """
+    try:
+        for chunk in chunks:
+            stdin.write(chunk)
+            stdin.flush()
+    except BrokenPipeError:
+        # the command exited or was killed before it read all input
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def wait_command(
+    process: subprocess.Popen,
+    input: bytes | Iterable = None,
+    timeout: float = None,
+    on_output: Callable[[str, str], None] = None,
+    capture: bool = True,
+) -> CommandResult:
+    """
+    Streams the output of a spawned command until it exits.
+
+    Pipes are read without blocking as data arrives, on_output gets every
+    complete line with the name of its stream. Without capture, stdout is
+    only passed to on_output and not kept. The process is killed when the
+    timeout is exceeded.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    output = {"stdout": bytearray(), "stderr": bytearray()}
+    pending = {"stdout": bytearray(), "stderr": bytearray()}
+
+    selector = selectors.DefaultSelector()
+    selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+    selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+
+    # stdin is written by its own thread, so waiting for the input, e.g. a
+    # stream, or for the command to read it never stops reading the output
+    # or checking the timeout
+    input_errors: list[Exception] = []
+    if process.stdin is not None:
+        threading.Thread(
+            target=_write_input,
+            args=(
+                process.stdin,
+                _input_chunks(input if input is not None else b""),
+                input_errors,
+            ),
+            name="command-stdin",
+            daemon=True,
+        ).start()
+
+    def emit(stream: str, final: bool = False):
+        lines = pending[stream].split(b"\n")
+        pending[stream] = bytearray() if final else lines.pop()
+        for line in lines:
+            if on_output is not None and (line or not final):
+                on_output(stream, line.decode(errors="replace"))
+
+    try:
+        while selector.get_map():
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PluginExecutionTimeoutError()
+
+            for key, _ in selector.select(remaining):
+                stream = key.data
+                data = os.read(key.fd, READ_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    emit(stream, final=True)
+                    continue
+
+                if capture or stream == "stderr":
+                    output[stream] += data
+                pending[stream] += data
+                emit(stream)
+
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        try:
+            returncode, usage = wait_process(process, remaining)
+        except subprocess.TimeoutExpired:
+            raise PluginExecutionTimeoutError()
+    finally:
+        selector.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        # stdin is closed by its writer, which may still wait for input
+        for pipe in [process.stdout, process.stderr]:
+            pipe.close()
+
+    if input_errors:
+        raise input_errors[0]
+
+    return CommandResult(
+        returncode=returncode,
+        stdout=output["stdout"].decode(errors="replace"),
+        stderr=output["stderr"].decode(errors="replace"),
+        usage=usage,
+    )
+
+
+def run_command(
+    command: PluginCommand,
+    timeout: float = None,
+    on_output: Callable[[str, str], None] = None,
+) -> CommandResult:
+    process = spawn_command(command)
+    return wait_command(process, command.input, timeout, on_output)
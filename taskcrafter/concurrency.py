@@ -0,0 +1,129 @@
+import threading
+from collections import deque
+from typing import Callable
+from taskcrafter.logger import app_logger
+from taskcrafter.metrics import concurrency_limit
+from taskcrafter.models.scheduler import AdaptiveConcurrencyConfig
+
+# weight of a new run in the average latency of its job
+LATENCY_ALPHA = 0.2
+
+
+class RunFeedback:
+    """
+    Latency and errors of the last finished job runs, recorded by JobManager.
+
+    Jobs differ a lot in their duration, so the latency of a run is taken
+    relative to the moving average of its own job. A ratio above 1 means the
+    job got slower than it used to be.
+    """
+
+    def __init__(self, window: int = 20):
+        self.runs: deque[tuple[float, bool]] = deque(maxlen=window)
+        self.averages: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def record(self, job_id: str, latency: float, error: bool = False):
+        with self.lock:
+            average = self.averages.get(job_id)
+            ratio = latency / average if average else 1.0
+            self.runs.append((ratio, error))
+
+            if not error:
+                self.averages[job_id] = (
+                    latency
+                    if average is None
+                    else average + LATENCY_ALPHA * (latency - average)
+                )
+
+    def get_error_rate(self) -> float:
+        with self.lock:
+            if not self.runs:
+                return 0.0
+            return sum(error for _, error in self.runs) / len(self.runs)
+
+    def get_latency_ratio(self) -> float:
+        """Mean latency ratio of the successful runs in the window."""
+        with self.lock:
+            ratios = [ratio for ratio, error in self.runs if not error]
+            return sum(ratios) / len(ratios) if ratios else 1.0
+
+
+class AdaptiveConcurrency:
+    """
+    Lets at most `limit` jobs run at once and adapts the limit with AIMD.
+
+    Every finished job which leaves the window healthy adds one to the
+    limit, as long as the limit is actually used. A window with too many
+    errors or too slow runs multiplies the limit by backoff, at most once
+    per `limit` finished jobs, so one slow burst is not punished repeatedly.
+    Jobs above the limit wait here, they do not take a worker.
+    """
+
+    def __init__(
+        self,
+        config: AdaptiveConcurrencyConfig,
+        feedback: RunFeedback,
+        max_workers: int,
+    ):
+        self.config = config
+        self.feedback = feedback
+        self.max = config.max if config.max is not None else max_workers
+        self.min = max(1, min(config.min, self.max))
+        self.limit = float(self.min)
+        self.running = 0
+        self.pending: deque[Callable[[], None]] = deque()
+        self.since_backoff = 0
+        self.lock = threading.Lock()
+        concurrency_limit.set(self.get_limit())
+
+    def get_limit(self) -> int:
+        return int(self.limit)
+
+    def submit(self, dispatch: Callable[[], None]):
+        with self.lock:
+            if self.running >= self.get_limit():
+                self.pending.append(dispatch)
+                return
+            self.running += 1
+
+        dispatch()
+
+    def release(self):
+        """Called when a job finished, adapts the limit and starts waiting jobs."""
+        with self.lock:
+            saturated = bool(self.pending) or self.running >= self.get_limit()
+            self.running -= 1
+            self.update(saturated)
+
+            ready = []
+            while self.pending and self.running < self.get_limit():
+                self.running += 1
+                ready.append(self.pending.popleft())
+
+        for dispatch in ready:
+            dispatch()
+
+    def update(self, saturated: bool):
+        previous = self.get_limit()
+        self.since_backoff += 1
+
+        congested = (
+            self.feedback.get_error_rate() > self.config.max_error_rate
+            or self.feedback.get_latency_ratio() > self.config.latency_tolerance
+        )
+
+        if congested:
+            if self.since_backoff >= previous:
+                self.limit = max(self.min, self.limit * self.config.backoff)
+                self.since_backoff = 0
+        elif saturated:
+            self.limit = min(self.max, self.limit + 1)
+
+        if self.get_limit() != previous:
+            app_logger.debug(
+                f"Concurrency limit {previous} -> {self.get_limit()} "
+                f"(error rate {self.feedback.get_error_rate():.2f}, "
+                f"latency ratio {self.feedback.get_latency_ratio():.2f})"
+            )
+            concurrency_limit.set(self.get_limit())
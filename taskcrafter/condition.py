@@ -0,0 +1,144 @@
+import ast
+import os
+from functools import cache
+from typing import Any, Callable
+from taskcrafter.exceptions.job import JobValidationError
+
+# functions a condition can call besides result()
+FUNCTIONS = {
+    "bool": bool,
+    "float": float,
+    "int": int,
+    "len": len,
+    "str": str,
+}
+NAMES = {"env", "params", "result"} | FUNCTIONS.keys()
+
+# no attributes, lambdas or comprehensions, so a condition can only reach
+# the values it is given
+NODES = (
+    ast.Expression,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.BinOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.Mod,
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.Is,
+    ast.IsNot,
+    ast.IfExp,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Subscript,
+    ast.Constant,
+    ast.List,
+    ast.Tuple,
+)
+
+
+class Values(dict):
+    """Env or params of a condition, a missing key is None."""
+
+    def __missing__(self, key):
+        return None
+
+
+class Condition:
+    """
+    A `when` expression of a job, e.g. `env["DEPLOY"] == "1"` or
+    `int(result("count", "total")) > 0`.
+
+    The expression is checked and compiled once, evaluating it only runs the
+    compiled code. result(job, key) reads an output of an upstream job, the
+    job ids are constants, so it is known before a run which results a
+    condition needs.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise JobValidationError(f"Invalid condition '{expression}': {e.msg}")
+
+        self.results: list[str] = []
+        for node in ast.walk(tree):
+            self.check(node)
+
+        self.code = compile(tree, "<when>", "eval")
+
+    def check(self, node: ast.AST):
+        if not isinstance(node, NODES):
+            raise JobValidationError(
+                f"Condition '{self.expression}' uses unsupported syntax: "
+                f"{type(node).__name__}"
+            )
+
+        if isinstance(node, ast.Name) and node.id not in NAMES:
+            raise JobValidationError(
+                f"Condition '{self.expression}' uses an unknown name: {node.id}"
+            )
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise JobValidationError(
+                    f"Condition '{self.expression}' can only call "
+                    f"{', '.join(sorted(NAMES - {'env', 'params'}))}."
+                )
+            if node.func.id == "result":
+                self.check_result(node)
+
+    def check_result(self, node: ast.Call):
+        if not 1 <= len(node.args) <= 2 or not all(
+            isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+            for arg in node.args
+        ):
+            raise JobValidationError(
+                f"Condition '{self.expression}' must call result with a job id "
+                f"and an optional key, both strings."
+            )
+
+        job_id = node.args[0].value
+        if job_id not in self.results:
+            self.results.append(job_id)
+
+    def evaluate(
+        self,
+        params: dict = None,
+        read_result: Callable[[str, str], Any] = None,
+        env: dict = None,
+    ) -> bool:
+        """Evaluates the condition, env defaults to the environment."""
+        names = {
+            "env": Values(os.environ if env is None else env),
+            "params": Values(params or {}),
+            "result": lambda job_id, key=None: (
+                read_result(job_id, key) if read_result else None
+            ),
+            **FUNCTIONS,
+        }
+
+        return bool(eval(self.code, {"__builtins__": {}}, names))
+
+
+@cache
+def get_condition(expression: str) -> Condition:
+    """Compiled condition of an expression, every expression is compiled once."""
+    return Condition(expression)
@@ -1,46 +1,268 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 from taskcrafter.exceptions.container import ContainerError, ContainerExecutionError
-from taskcrafter.models.job import Job
+from taskcrafter.models.job import Job, JobContainer, ResourceUsage
+from taskcrafter.models.result import RESULT_DIR_ENV, ResultHandle
 from taskcrafter.logger import app_logger
+from taskcrafter.tracing import tracer
 import docker
+from docker.types import Mount
+from docker.utils import parse_repository_tag
 
 # constant for docker timeout
 DOCKER_TIMEOUT = 10
+# pulls of large images stream progress for minutes
+PULL_TIMEOUT = 600
+RESULT_KEY = re.compile(r"[\w-]+")
+# seconds to wait for the last stats sample of an exited container
+STATS_TIMEOUT = 2
 
 
-def run_job_in_docker(job: Job, params: dict = None):
+def get_docker_client(
+    container: JobContainer, timeout: int = DOCKER_TIMEOUT
+) -> docker.DockerClient:
+    return docker.DockerClient(
+        base_url=container.get_engine_url(),
+        version="auto",
+        timeout=timeout,
+    )
+
+
+def pull_image(container: JobContainer, docker_client=None) -> float:
+    """Pulls the image of a container if it is missing, returns the seconds."""
+    docker_client = docker_client or get_docker_client(container, PULL_TIMEOUT)
+
     try:
-        docker_client = docker.DockerClient(
-            base_url=job.container.get_engine_url(),
-            version="auto",
-            timeout=DOCKER_TIMEOUT,
-        )
-
-        container = docker_client.containers.run(
-            job.container.image,
-            command=job.container.command,
-            volumes=job.container.volumes or {},
-            environment=params,
-            detach=True,
-            privileged=job.container.privileged,
-            user=job.container.user,
-        )
-
-        container.wait()
-
-        logs = container.logs()
-        print(logs.decode())
+        docker_client.images.get(container.image)
+        return 0.0
+    except docker.errors.ImageNotFound:
+        pass
+
+    start = time.monotonic()
+    with tracer.span("container.pull", image=container.image):
+        repository, tag = parse_repository_tag(container.image)
+        docker_client.images.pull(repository, tag=tag)
+
+    pull_time = time.monotonic() - start
+    app_logger.info(f"Pulled image {container.image} in {pull_time:.3f}s.")
+    return pull_time
+
+
+class ImagePrefetcher:
+    """
+    Pulls container images before the jobs which use them run.
+
+    Images are pulled in the order they are passed, by a bounded number of
+    threads, and every image only once. A job waits for the pull of its
+    image if it is still running, and pulls it itself if it failed.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = workers
+        self.executor = None
+        self.pulls: dict[tuple[str, str], Future] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(container: JobContainer) -> tuple[str, str]:
+        return container.get_engine_url(), container.image
+
+    def prefetch(self, containers: list[JobContainer]):
+        if self.workers < 1:
+            return
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="taskcrafter-pull"
+                )
+
+            for container in containers:
+                key = self.get_key(container)
+                if key not in self.pulls:
+                    self.pulls[key] = self.executor.submit(pull_image, container)
+
+    def wait(self, container: JobContainer, docker_client=None) -> float:
+        """Seconds a job spent on its image, waiting for the prefetch or pulling."""
+        with self.lock:
+            pull = self.pulls.get(self.get_key(container))
+
+        start = time.monotonic()
+        if pull is not None:
+            try:
+                pull.result()
+                return time.monotonic() - start
+            except Exception as e:
+                app_logger.warning(f"Prefetch of image {container.image} failed: {e}")
+
+        return time.monotonic() - start + pull_image(container, docker_client)
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+def parse_stats(sample: dict, max_rss: int = 0) -> ResourceUsage:
+    """Usage from a docker stats sample, the counters are totals since start."""
+    cpu = (sample.get("cpu_stats") or {}).get("cpu_usage") or {}
+    memory = sample.get("memory_stats") or {}
+    io = (sample.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+
+    def io_bytes(op: str) -> int:
+        return sum(entry["value"] for entry in io if entry["op"].lower() == op)
+
+    return ResourceUsage(
+        # nanoseconds
+        user_time=cpu.get("usage_in_usermode", 0) / 1e9,
+        system_time=cpu.get("usage_in_kernelmode", 0) / 1e9,
+        # max_usage is only reported with cgroup v1
+        max_rss=max(max_rss, memory.get("max_usage", 0), memory.get("usage", 0)),
+        read_bytes=io_bytes("read"),
+        write_bytes=io_bytes("write"),
+    )
+
 
-        exit_code = container.wait()["StatusCode"]
+class ContainerStats:
+    """
+    Samples docker stats of a running container, about once a second. The
+    stats are gone once the container exited, so its usage is the last
+    sample. Context switches are not reported by the engines.
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.usage = ResourceUsage()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        try:
+            for sample in self.container.stats(stream=True, decode=True):
+                usage = parse_stats(sample, self.usage.max_rss)
+                # the sample of an exited container is empty
+                if usage.get_cpu_time():
+                    self.usage = usage
+        except Exception as e:
+            app_logger.debug(f"Stats of container {self.container.id} stopped: {e}")
+
+    def stop(self) -> ResourceUsage:
+        self.thread.join(STATS_TIMEOUT)
+        return self.usage
+
+
+def create_result_dir(job: Job, result_dir: Path) -> Path:
+    """A new host directory for the outputs of one container run."""
+    Path(result_dir).mkdir(parents=True, exist_ok=True)
+    directory = Path(tempfile.mkdtemp(prefix=f"{job.id}.", dir=result_dir))
+    # the container may run as any user
+    directory.chmod(0o777)
+    return directory.absolute()
+
+
+def collect_results(directory: Path) -> dict[str, ResultHandle]:
+    """
+    Handles of the files a container wrote, keyed by their name without
+    suffixes, e.g. report.json is the output key report. The files are moved
+    into the cache when the output is written.
+    """
+    results = {}
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        key = entry.name.split(".")[0]
+        if not entry.is_file(follow_symlinks=False) or not RESULT_KEY.fullmatch(key):
+            app_logger.warning(f"Ignoring container result {entry.name}.")
+            continue
+        if key in results:
+            app_logger.warning(
+                f"Ignoring container result {entry.name}, duplicate key."
+            )
+            continue
+
+        results[key] = ResultHandle.from_path(entry.path)
+        results[key].owned = True
+
+    return results
+
+
+def run_job_in_docker(
+    job: Job,
+    params: dict = None,
+    images: ImagePrefetcher = None,
+    result_dir: Path = None,
+):
+    """
+    Runs a job in a container. With a result_dir, a new directory in it is
+    mounted at container.result_dir and the files written there are the
+    outputs of the job; without any, the outputs are the logs.
+    """
+    container = None
+    results = outputs = None
+    mounts = []
+    environment = params
+
+    if result_dir is not None and job.container.result_dir:
+        results = create_result_dir(job, result_dir)
+        mounts.append(Mount(job.container.result_dir, str(results), type="bind"))
+        environment = {**(params or {}), RESULT_DIR_ENV: job.container.result_dir}
+
+    try:
+        with tracer.span("container.connect", engine=job.container.engine):
+            docker_client = get_docker_client(job.container)
+
+        # the pull is timed on its own, so it is not part of the run time
+        if images is not None:
+            job.result.pull_time += images.wait(job.container, docker_client)
+        else:
+            job.result.pull_time += pull_image(job.container, docker_client)
+
+        # creates and starts the container
+        with tracer.span("container.run", image=job.container.image):
+            container = docker_client.containers.run(
+                job.container.image,
+                command=job.container.command,
+                volumes=job.container.volumes or {},
+                environment=environment,
+                mounts=mounts,
+                detach=True,
+                privileged=job.container.privileged,
+                user=job.container.user,
+            )
+
+        stats = ContainerStats(container)
+        stats.start()
+        with tracer.span("container.wait"):
+            exit_code = container.wait()["StatusCode"]
+        job.result.usage += stats.stop()
+
+        with tracer.span("container.logs"):
+            logs = container.logs()
+        print(logs.decode())
 
         if exit_code != 0:
             raise ContainerExecutionError(
                 f"Container execution failed with exit code {exit_code}"
             )
 
-        return logs.decode()
+        if results is not None:
+            outputs = collect_results(results)
+        # logs are only the output of containers which wrote no results
+        return outputs or logs.decode()
     except docker.errors.DockerException as e:
         app_logger.error(f"Container execution failed: {e}")
         raise ContainerError(e)
     finally:
+        # the results of failed runs are dropped
+        if results is not None and not outputs:
+            shutil.rmtree(results, ignore_errors=True)
         if container is not None:
-            container.remove()
+            with tracer.span("container.remove"):
+                container.remove()
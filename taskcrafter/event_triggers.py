@@ -0,0 +1,419 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import json
+import os
+import select
+import stat
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+from taskcrafter.exceptions.job import JobValidationError
+from taskcrafter.logger import app_logger
+from taskcrafter.models.job import Job, JobTrigger, TriggerType
+
+# seconds between checks of the stop flag, and between scans of the
+# polling file watcher
+POLL_INTERVAL = 0.5
+WEBHOOK_HOST = "127.0.0.1"
+# reserved param through which a job gets the events of its run
+EVENTS_PARAM = "_events"
+READ_SIZE = 64 * 1024
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """libc with inotify, or None on systems without it."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+
+    if not hasattr(libc, "inotify_init1"):
+        return None
+
+    return libc
+
+
+_libc = _load_inotify()
+
+
+def _decode(data: bytes):
+    """Event payloads are JSON if they parse, text otherwise."""
+    text = data.decode(errors="replace").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+class Debouncer:
+    """
+    Collects events of a job and fires them as one batch when no event came
+    for `debounce` seconds, or `max_wait` seconds after the first event.
+
+    on_fire returns False if the job could not run, e.g. it is still running;
+    the events are kept and fired again after the next debounce window.
+    """
+
+    def __init__(
+        self,
+        on_fire: Callable[[list], bool],
+        debounce: float,
+        max_wait: float = None,
+    ):
+        self.on_fire = on_fire
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.events = []
+        self.first = None
+        self.last = None
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def add(self, event):
+        with self.condition:
+            now = time.monotonic()
+            self.events.append(event)
+            self.first = self.first or now
+            self.last = now
+            self.condition.notify()
+
+    def get_deadline(self) -> float:
+        deadline = self.last + self.debounce
+        if self.max_wait is not None:
+            deadline = min(deadline, self.first + self.max_wait)
+
+        return deadline
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopped and not self.events:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+
+                remaining = self.get_deadline() - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+                events, self.events = self.events, []
+                first, self.first, self.last = self.first, None, None
+
+            if self.on_fire(events):
+                continue
+
+            with self.condition:
+                self.events[:0] = events
+                self.first = first
+                self.last = time.monotonic()
+
+
+class EventSource(ABC):
+    """
+    Thread which passes events to a callback until it is stopped. on_exit is
+    called when the thread ends before it was stopped, e.g. on an error.
+    """
+
+    def __init__(self, on_event: Callable[[dict], None]):
+        self.on_event = on_event
+        self.on_exit: Callable[[], None] = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def watch(self):
+        try:
+            self.run()
+        except Exception as e:
+            app_logger.error(f"{type(self).__name__} stopped: {e}")
+        finally:
+            if not self.stopped.is_set() and self.on_exit is not None:
+                self.on_exit()
+
+    @abstractmethod
+    def run(self):
+        """Passes events to on_event until stopped is set."""
+        pass
+
+
+class FileWatcher(EventSource):
+    """
+    Emits an event when a file is written and closed, or moved into the
+    watched directory. A watched file is matched by name in its directory,
+    so replacing it atomically is seen as well. Uses inotify where it is
+    available and scans the directory otherwise.
+    """
+
+    def __init__(self, on_event: Callable[[dict], None], path: str, pattern="*"):
+        super().__init__(on_event)
+        path = Path(path)
+
+        if path.is_dir():
+            self.directory, self.pattern = path, pattern
+        else:
+            self.directory, self.pattern = path.parent, path.name
+
+    def emit(self, name: str):
+        if fnmatch.fnmatch(name, self.pattern):
+            self.on_event({"type": "file", "path": str(self.directory / name)})
+
+    def run(self):
+        if not self.directory.is_dir():
+            raise FileNotFoundError(f"Directory {self.directory} does not exist.")
+
+        if _libc is not None:
+            self.run_inotify()
+        else:
+            self.run_polling()
+
+    def run_inotify(self):
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            app_logger.warning("inotify is not available, polling for files.")
+            return self.run_polling()
+
+        try:
+            watch = _libc.inotify_add_watch(
+                fd, str(self.directory).encode(), IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+            if watch < 0:
+                raise OSError(ctypes.get_errno(), f"Can not watch {self.directory}")
+
+            while not self.stopped.is_set():
+                readable, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+                if not readable:
+                    continue
+
+                data = os.read(fd, READ_SIZE)
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    start = offset + INOTIFY_EVENT.size
+                    offset = start + length
+                    name = data[start:offset].rstrip(b"\0")
+                    self.emit(name.decode(errors="replace"))
+        finally:
+            os.close(fd)
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        try:
+            return {
+                entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in os.scandir(self.directory)
+                if entry.is_file()
+            }
+        except OSError:
+            return {}
+
+    def run_polling(self):
+        files = self.scan()
+
+        while not self.stopped.wait(POLL_INTERVAL):
+            current = self.scan()
+            for name, state in current.items():
+                if files.get(name) != state:
+                    self.emit(name)
+            files = current
+
+
+class QueueReader(EventSource):
+    """Emits one event per line written to a FIFO, which is created if needed."""
+
+    def __init__(self, on_event: Callable[[dict], None], path: str):
+        super().__init__(on_event)
+        self.path = Path(path)
+
+    def open(self) -> int:
+        if not self.path.exists():
+            os.mkfifo(self.path)
+        elif not stat.S_ISFIFO(self.path.stat().st_mode):
+            raise ValueError(f"Queue trigger path {self.path} is not a FIFO.")
+
+        # opened for writing too, so the FIFO never reports EOF between writers
+        return os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+
+    def run(self):
+        fd = self.open()
+        pending = b""
+
+        try:
+            while not self.stopped.is_set():
+                readable, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+                if not readable:
+                    continue
+
+                pending += os.read(fd, READ_SIZE)
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        self.on_event({"type": "queue", "data": _decode(line)})
+        finally:
+            os.close(fd)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: "WebhookServer"
+
+    def do_POST(self):
+        on_event = self.server.routes.get(self.path.split("?")[0])
+        if on_event is None:
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        on_event({"type": "webhook", "path": self.path, "data": _decode(body)})
+
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        app_logger.debug(f"webhook: {format % args}")
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """Local HTTP endpoint, every route belongs to one job."""
+
+    daemon_threads = True
+
+    def __init__(self, port: int):
+        super().__init__((WEBHOOK_HOST, port), WebhookHandler)
+        self.routes: dict[str, Callable[[dict], None]] = {}
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+
+        self.shutdown()
+        self.server_close()
+        self.thread = None
+
+
+class EventTriggerManager:
+    """
+    Runs jobs with a `trigger` when their events arrive. Every job has a
+    debouncer, so a burst of events becomes one run which gets all of them
+    in its `_events` param.
+
+    A job whose source stopped, e.g. its directory is missing, gets no more
+    events and is no longer active, on_stopped is called for it.
+    """
+
+    def __init__(
+        self,
+        on_fire: Callable[[Job, list], bool],
+        on_stopped: Callable[[Job], None] = None,
+    ):
+        self.on_fire = on_fire
+        self.on_stopped = on_stopped
+        self.debouncers: dict[str, Debouncer] = {}
+        self.sources: list[EventSource] = []
+        self.servers: dict[int, WebhookServer] = {}
+        # jobs which can still get events
+        self.active: set[str] = set()
+
+    def has_triggers(self) -> bool:
+        return bool(self.active)
+
+    def add_job(self, job: Job):
+        """Adds a job, raises a JobValidationError if its source can not be set up."""
+        trigger: JobTrigger = job.trigger
+        debouncer = Debouncer(
+            lambda events: self.on_fire(job, events),
+            trigger.debounce,
+            trigger.max_wait,
+        )
+
+        source = None
+        match trigger.type:
+            case TriggerType.FILE:
+                source = FileWatcher(debouncer.add, trigger.path, trigger.pattern)
+            case TriggerType.QUEUE:
+                source = QueueReader(debouncer.add, trigger.path)
+            case TriggerType.WEBHOOK:
+                self.add_route(job, debouncer)
+
+        if source is not None:
+            source.on_exit = lambda: self.stop_job(job)
+            self.sources.append(source)
+
+        self.debouncers[job.id] = debouncer
+        self.active.add(job.id)
+        app_logger.info(f"Job {job.id} is triggered by {trigger.type.value} events.")
+
+    def add_route(self, job: Job, debouncer: Debouncer):
+        trigger: JobTrigger = job.trigger
+        if trigger.port not in self.servers:
+            try:
+                self.servers[trigger.port] = WebhookServer(trigger.port)
+            except OSError as e:
+                raise JobValidationError(
+                    f"Webhook trigger of job '{job.id}' can not listen on port "
+                    f"{trigger.port}: {e}"
+                )
+
+        route = trigger.route or f"/{job.id}"
+        self.servers[trigger.port].routes[route] = debouncer.add
+
+    def stop_job(self, job: Job):
+        """Called when the source of a job stopped on its own."""
+        app_logger.error(f"Job {job.id} gets no more {job.trigger.type.value} events.")
+        self.active.discard(job.id)
+
+        if self.on_stopped is not None:
+            self.on_stopped(job)
+
+    def start(self):
+        for component in [
+            *self.debouncers.values(),
+            *self.sources,
+            *self.servers.values(),
+        ]:
+            component.start()
+
+    def stop(self):
+        for component in [
+            *self.servers.values(),
+            *self.sources,
+            *self.debouncers.values(),
+        ]:
+            component.stop()
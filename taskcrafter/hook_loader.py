@@ -1,10 +1,12 @@
 from copy import deepcopy
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from taskcrafter.exceptions.hook import HookError, HookNotFound
+from taskcrafter.exceptions.job import JobError, JobKillSignalError
 from taskcrafter.job_loader import JobManager
 from taskcrafter.models.hook import Hook, HookType
 from taskcrafter.util.yaml import get_yaml_from_string
 from taskcrafter.logger import app_logger
+from taskcrafter.tracing import tracer
 
 
 @dataclass
@@ -12,10 +14,12 @@ class HookManager:
     jobs_file_content: str
     job_manager: JobManager
     hooks: list[Hook] = None
+    hooks_by_type: dict[HookType, Hook] = field(default_factory=dict)
     hooks_yaml = None
 
     def __post_init__(self):
         self.hooks = self.init_hooks(self.jobs_file_content)
+        self.hooks_by_type = {hook.type: hook for hook in self.hooks}
 
     def init_hooks(self, content: str):
 
@@ -40,9 +44,41 @@ class HookManager:
         return hooks
 
     def hook_get_by_type(self, hook_type: HookType):
-        hook = next((h for h in self.hooks if h.type == hook_type), None)
+        hook = self.hooks_by_type.get(hook_type)
 
         if hook is None:
             raise HookNotFound(f"Hook {hook_type} does not exist.")
 
         return hook
+
+    def has_hook(self, hook_type: HookType) -> bool:
+        return hook_type in self.hooks_by_type
+
+    def run_hook(self, hook_type: HookType, parent_job_id: str):
+        """
+        Runs the jobs of a per-job hook inline, in the calling worker.
+
+        Every hook job runs from its own copy, so concurrent parents never
+        share a run record.
+        """
+        hook = self.hooks_by_type.get(hook_type)
+        if hook is None:
+            return None
+
+        stack_entry = f"Hook({hook_type.value};parent={parent_job_id})"
+
+        with tracer.span(f"hook.{hook_type.value}", parent_job=parent_job_id):
+            for hook_job in hook.jobs:
+                job = deepcopy(hook_job)
+                job.enabled = True
+
+                try:
+                    self.job_manager.run_job(job, [stack_entry], force=True)
+                except JobKillSignalError:
+                    raise
+                except JobError as e:
+                    app_logger.error(
+                        f"Hook {hook_type.value} job {job.id} for job {parent_job_id} failed: {e}"
+                    )
+
+        return hook
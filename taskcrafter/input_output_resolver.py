@@ -1,22 +1,145 @@
 import os
+import ast
+import glob
+import json
+import shutil
+import threading
+import time
 from pathlib import Path
 from typing import Any, Optional
 import re
+from taskcrafter.logger import app_logger
+from taskcrafter.metrics import cache_reads
+from taskcrafter.models.cache import CacheConfig, CacheRun
+from taskcrafter.models.result import ResultHandle
+from taskcrafter.util.codec import ResultMeta, decode, encode, to_text
 
 CACHE_DIR = Path(".cache")
-CACHE_DIR.mkdir(exist_ok=True)
+RUNS_DIR = "runs"
 
 
-class CacheManager:
-    def __init__(self, cache_dir: Path = CACHE_DIR):
-        self.cache_dir = cache_dir
+def get_profile_path(job_id: str, run_dir: Path, partition: int = None) -> Path:
+    """
+    Base path of the profiles of a job in a run, see profiler.profile_call.
+    They are kept in the run namespace, so they are pruned with its outputs.
+    Partitions run in parallel, each one has its own profiles.
+    """
+    path = run_dir / "profiles" / job_id
+    return path if partition is None else path / str(partition)
 
-        # clean up old cache files
-        for file in self.cache_dir.glob("*"):
-            if not file.is_file() or not file.name.startswith("."):
-                continue
+
+def find_profile_path(
+    job_id: str, cache_dir: Path = CACHE_DIR, partition: int = None
+) -> Optional[Path]:
+    """Base path of the profiles of the last run which profiled a job."""
+    for run in reversed(list_runs(cache_dir)):
+        path = get_profile_path(job_id, run.path, partition)
+        if any(path.parent.glob(f"{glob.escape(path.name)}.*")):
+            return path
+
+    return None
+
+
+def new_run_id() -> str:
+    """Sortable id of a run, its outputs are stored in .cache/runs/<run_id>."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+
+def list_runs(cache_dir: Path = CACHE_DIR) -> list[CacheRun]:
+    """Returns all runs in the cache, oldest first."""
+    runs_dir = cache_dir / RUNS_DIR
+    if not runs_dir.is_dir():
+        return []
+
+    runs = []
+    for path in runs_dir.iterdir():
+        if not path.is_dir():
+            continue
+
+        run = CacheRun(run_id=path.name, path=path, modified=path.stat().st_mtime)
+        for root, _, files in os.walk(path):
+            for name in files:
+                # links to result files outside of the cache are not counted
+                stat = os.lstat(os.path.join(root, name))
+                run.files += 1
+                run.size += stat.st_size
+                run.modified = max(run.modified, stat.st_mtime)
+        runs.append(run)
+
+    runs.sort(key=lambda run: run.run_id)
+    return runs
+
+
+def prune_runs(
+    cache_dir: Path = CACHE_DIR,
+    max_runs: int = None,
+    max_age_days: float = None,
+    max_size_mb: float = None,
+    keep: list[str] = [],
+) -> list[CacheRun]:
+    """
+    Removes the oldest runs until the cache is within all given limits and
+    returns the removed runs. Runs in keep, e.g. the current one, are never
+    removed.
+    """
+    runs = list_runs(cache_dir)
+    removable = [run for run in runs if run.run_id not in keep]
+    removed = []
+
+    def remove(run: CacheRun):
+        shutil.rmtree(run.path, ignore_errors=True)
+        removable.remove(run)
+        runs.remove(run)
+        removed.append(run)
+
+    if max_age_days is not None:
+        min_modified = time.time() - max_age_days * 24 * 3600
+        for run in [run for run in removable if run.modified < min_modified]:
+            remove(run)
+
+    if max_runs is not None:
+        while removable and len(runs) > max_runs:
+            remove(removable[0])
+
+    if max_size_mb is not None:
+        max_size = max_size_mb * 1024 * 1024
+        while removable and sum(run.size for run in runs) > max_size:
+            remove(removable[0])
+
+    # outputs of versions without run namespaces
+    for file in cache_dir.glob(".*.std*"):
+        if file.is_file() or file.is_symlink():
             file.unlink()
 
+    return removed
+
+
+class CacheManager:
+    def __init__(self, cache_dir: Path = CACHE_DIR, run_id: str = None):
+        self.cache_dir = Path(cache_dir)
+        self.run_id = run_id or new_run_id()
+        self.run_dir = self.cache_dir / RUNS_DIR / self.run_id
+
+    def collect_garbage(self, config: CacheConfig, background: bool = True):
+        """Prunes previous runs by the retention policy of the config."""
+
+        def collect():
+            removed = prune_runs(
+                self.cache_dir,
+                max_runs=config.max_runs,
+                max_age_days=config.max_age_days,
+                max_size_mb=config.max_size_mb,
+                keep=[self.run_id],
+            )
+            if removed:
+                app_logger.debug(f"Removed {len(removed)} runs from the cache.")
+
+        if not background:
+            collect()
+            return
+
+        threading.Thread(target=collect, name="cache-gc", daemon=True).start()
+
     def get_output_file(
         self,
         job_id: str,
@@ -27,7 +150,18 @@ class CacheManager:
         suffix = ".stderr" if is_error else ".stdout"
         key_part = f".{key}" if key else ""
         filename = f".{job_id}.{attempt}{key_part}{suffix}"
-        return self.cache_dir / filename
+        return self.run_dir / filename
+
+    def get_meta_file(self, path: Path) -> Path:
+        """Sidecar file of an output, which records its codec."""
+        return path.parent / f"{path.name}.meta"
+
+    def get_profile_path(self, job_id: str, partition: int = None) -> Path:
+        return get_profile_path(job_id, self.run_dir, partition)
+
+    def get_result_dir(self) -> Path:
+        """Directory where plugins write large results, see ResultHandle."""
+        return self.run_dir / "results"
 
     def read_output(
         self,
@@ -36,29 +170,90 @@ class CacheManager:
         attempt: int = 1,
         is_error: bool = False,
     ) -> Optional[str]:
+        """Reads an output as text, e.g. for substitution into a string."""
+        value = self.read_value(job_id, key, attempt, is_error)
+
+        return to_text(value) if value is not None else None
+
+    def read_value(
+        self,
+        job_id: str,
+        key: Optional[str] = None,
+        attempt: int = 1,
+        is_error: bool = False,
+    ) -> Any:
+        """Reads an output with the type it was written with."""
         path = self.get_output_file(job_id, attempt, key, is_error)
 
+        if not path.exists():
+            cache_reads.inc(result="miss")
+            return None
+
+        cache_reads.inc(result="hit")
+
+        # outputs without meta are text, as written by older versions
+        meta_file = self.get_meta_file(path)
+        meta = ResultMeta()
+        if meta_file.exists():
+            meta = ResultMeta.from_json(meta_file.read_text())
+
+        return decode(path.read_bytes(), meta)
+
+    def read_handle(
+        self, job_id: str, key: Optional[str] = None, attempt: int = 1
+    ) -> Optional[ResultHandle]:
+        """Returns a handle of an output, which can be mapped without copying."""
+        path = self.get_output_file(job_id, attempt, key)
+
         if path.exists():
-            return path.read_text()
+            cache_reads.inc(result="hit")
+            return ResultHandle.from_path(path.resolve())
 
+        cache_reads.inc(result="miss")
         return None
 
     def write_output(
         self,
         job_id: str,
-        value: str | dict,
+        value: str | bytes | dict | ResultHandle,
         attempt: int = 1,
         key: Optional[str] = None,
         is_error: bool = False,
-    ):
+    ) -> int:
+        """Writes an output and returns its size in bytes."""
+        size = 0
         if isinstance(value, dict):
             for key, val in value.items():
                 path = self.get_output_file(job_id, attempt, key, is_error)
-                path.write_text(str(val))
+                size += self._write_value(path, val)
 
         else:
             path = self.get_output_file(job_id, attempt, key, is_error)
-            path.write_text(str(value))
+            size = self._write_value(path, value)
+
+        return size
+
+    def _write_value(self, path: Path, value) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # a previous output may be a link to a result file
+        path.unlink(missing_ok=True)
+        meta_file = self.get_meta_file(path)
+
+        if isinstance(value, ResultHandle):
+            # result files are moved or linked, never copied
+            if value.owned:
+                # a rename, unless the file is on another filesystem
+                shutil.move(value.path, path)
+                value.path = str(path.absolute())
+            else:
+                path.symlink_to(value.path)
+            meta = ResultMeta(codec="raw", size=value.size)
+        else:
+            data, meta = encode(value)
+            path.write_bytes(data)
+
+        meta_file.write_text(meta.to_json())
+        return meta.size
 
 
 class InputResolver:
@@ -69,7 +264,16 @@ class InputResolver:
         if not isinstance(value, str):
             return value
 
-        pattern = re.compile(r"\${(result|env|file):([a-zA-Z0-9-_.:\\/]+)}")
+        pattern = re.compile(r"\${(result|handle|env|file):([a-zA-Z0-9-_.:\\/]+)}")
+
+        # a value which is only a result or handle token keeps its type
+        match = pattern.fullmatch(value)
+        if match and match.group(1) == "handle":
+            return self._resolve_handle(match.group(2))
+        if match and match.group(1) == "result":
+            # a missing result is empty, as within a string
+            resolved = self._resolve_value(match.group(2))
+            return resolved if resolved is not None else ""
 
         def replace_token(match):
             token_type = match.group(1)
@@ -78,6 +282,9 @@ class InputResolver:
 
             if token_type == "result":
                 resolved = self._resolve_result(full_token)
+            elif token_type == "handle":
+                resolved = self._resolve_handle(token_value)
+                resolved = str(resolved) if resolved is not None else None
             elif token_type == "env":
                 resolved = self._resolve_env(full_token)
             elif token_type == "file":
@@ -89,6 +296,32 @@ class InputResolver:
 
         return pattern.sub(replace_token, value)
 
+    def resolve_items(self, value: list | str) -> list:
+        """
+        Resolves a list of items, either a literal list or a ${...} token.
+
+        Resolved strings are parsed as a JSON or Python literal list,
+        otherwise every non-empty line is an item.
+        """
+        if isinstance(value, list):
+            return value
+
+        resolved = self.resolve(value)
+        if isinstance(resolved, (bytes, bytearray)):
+            resolved = to_text(resolved)
+        if not isinstance(resolved, str):
+            return list(resolved or [])
+
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                items = parse(resolved)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(items, (list, tuple)):
+                return list(items)
+
+        return [line for line in resolved.splitlines() if line.strip()]
+
     def _resolve_result(self, value: str) -> Optional[str]:
         # Supports: result:job_id in result:job_id:key
         match = re.match(r"result:([\w-]+)(?::([\w-]+))?", value)
@@ -97,6 +330,22 @@ class InputResolver:
         job_id, key = match.groups()
         return self.cache.read_output(job_id=job_id, key=key, is_error=False)
 
+    def _resolve_value(self, value: str) -> Any:
+        # Supports: result:job_id and result:job_id:key, with the original type
+        match = re.match(r"([\w-]+)(?::([\w-]+))?$", value)
+        if not match:
+            return None
+        job_id, key = match.groups()
+        return self.cache.read_value(job_id=job_id, key=key, is_error=False)
+
+    def _resolve_handle(self, value: str) -> Optional[ResultHandle]:
+        # Supports: handle:job_id and handle:job_id:key
+        match = re.match(r"([\w-]+)(?::([\w-]+))?$", value)
+        if not match:
+            return None
+        job_id, key = match.groups()
+        return self.cache.read_handle(job_id=job_id, key=key)
+
     def _resolve_env(self, value: str) -> Optional[str]:
         _, var_name = value.split(":", 1)
         return os.getenv(var_name)
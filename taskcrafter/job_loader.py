@@ -1,38 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+import os
+from pathlib import Path
+from itertools import batched
+from multiprocessing import Process, Queue
+from multiprocessing.connection import wait
+from queue import Empty
+import sqlite3
+import threading
 import time
 from taskcrafter.exceptions.job import (
+    JobError,
     JobFailedError,
     JobKillSignalError,
     JobNotFoundError,
+    JobValidationError,
 )
 from taskcrafter.exceptions.plugin import (
     PluginExecutionError,
     PluginExecutionTimeoutError,
 )
-from taskcrafter.plugin_loader import plugin_execute
+from taskcrafter.config import app_config
+from taskcrafter.plugin_loader import (
+    plugin_execute,
+    plugin_execute_batch,
+    plugin_lookup,
+)
 from taskcrafter.logger import app_logger
-from taskcrafter.container import run_job_in_docker
+from taskcrafter.batcher import PluginBatcher
+from taskcrafter.container import ImagePrefetcher, run_job_in_docker
+from taskcrafter.command import spawn_command, wait_command
+from taskcrafter.concurrency import RunFeedback
+from taskcrafter.condition import get_condition
+from taskcrafter.event_triggers import EVENTS_PARAM
 from taskcrafter.util.templater import apply_templates_to_params, context
-from taskcrafter.models.job import Job, JobStatus
+from taskcrafter.models.job import Job, JobStatus, ResourceUsage
+from taskcrafter.models.plugin import PluginCommand, PluginEntry
+from taskcrafter.models.result import RESULT_DIR_ENV
+from taskcrafter.models.run_record import RunRecord
+from taskcrafter.models.scheduler import AdaptiveConcurrencyConfig
+from taskcrafter.rate_limiter import RateLimiter
 from taskcrafter.util.yaml import get_yaml_from_string
 from taskcrafter.input_output_resolver import CacheManager, InputResolver
+from taskcrafter.metrics import job_duration, job_retries, job_runs, plugin_spawn_time
+from taskcrafter.planner import build_plan, get_predecessors
+from taskcrafter.run_store import RUN_STORE_FILE, RunStore
+from taskcrafter.tracing import Span, tracer
+from taskcrafter.usage import get_thread_usage
+from taskcrafter.stream import (
+    STREAM_PARAM,
+    StreamPipe,
+    close_streams,
+    feed_streams,
+    strip_streams,
+)
+
+# seconds between checks of running plugin processes
+PROCESS_POLL_INTERVAL = 0.5
 
 
 class JobManager:
     def __init__(self, job_file_content: str):
         self.jobs_yaml = None
-        self.cache = CacheManager()
+        self.cache = CacheManager(Path(app_config.cache.dir))
+        self.run_store = RunStore(Path(app_config.cache.dir) / RUN_STORE_FILE)
+        # set up by start_run
+        self.images: ImagePrefetcher = None
+        self.batcher: PluginBatcher = None
+        # partitions of a job add their usage from several threads
+        self.usage_lock = threading.Lock()
+        # latency and errors of the last runs, for adaptive concurrency
+        adaptive = app_config.scheduler.adaptive or AdaptiveConcurrencyConfig()
+        self.feedback = RunFeedback(adaptive.window)
         self.resolver = InputResolver(self.cache)
         self.jobs: list[Job] = self.load_jobs(job_file_content)
         self.executed_jobs: list[Job] = []
+        # results of finished partitions per job, kept between retries
+        self.partition_results: dict[str, dict[int, object]] = {}
+        # set by the scheduler, jobs submitted to its pool got their tokens
+        # there, on_success, on_failure, on_finish and dependant jobs run
+        # inline and wait for them before they run
+        self.rate_limiter: RateLimiter = None
+
+    def start_run(self):
+        """
+        Prepares running the jobs: prunes previous runs from the cache and
+        sets up the image prefetcher and the plugin batcher. Only a run calls
+        it, commands which only read the jobs have no side effects.
+        """
+        # plugins write result files there, in the cache's filesystem, so
+        # they are moved into the cache and not copied
+        os.environ[RESULT_DIR_ENV] = str(self.cache.get_result_dir().absolute())
+        self.cache.collect_garbage(app_config.cache)
+        self.images = ImagePrefetcher(app_config.scheduler.image_pull_workers)
+        self.batcher = PluginBatcher(
+            self.execute_batch,
+            app_config.scheduler.batch_window,
+            app_config.scheduler.batch_size,
+        )
 
     def get_in_progress(self) -> int:
         return len(
             [
                 job.id
                 for job in self.jobs
-                if not job.result.get_status() == JobStatus.SUCCESS
-                and not job.result.get_status() == JobStatus.ERROR
+                if job.result.get_status()
+                not in [JobStatus.SUCCESS, JobStatus.ERROR, JobStatus.SKIPPED]
                 and job.enabled is not False
             ]
         )
@@ -64,6 +137,10 @@ class JobManager:
                 app_logger.error(f"Error loading job {job['id']}: {e}")
                 continue
 
+            # conditions are compiled once, invalid ones fail the load
+            if job_obj.when:
+                get_condition(job_obj.when)
+
             jobs.append(job_obj)
 
         return jobs
@@ -86,14 +163,43 @@ class JobManager:
 
         return True
 
-    def run_job(self, job: Job, execution_stack: list[str] = [], force: bool = False):
+    def run_job(
+        self,
+        job: Job,
+        execution_stack: list[str] = [],
+        force: bool = False,
+        stream: StreamPipe = None,
+        events: list = None,
+    ):
         """Run a job."""
+        with tracer.span("job", job=job.id, plugin=job.get_plugin_label()):
+            return self._run_job(job, execution_stack, force, stream, events)
+
+    def _run_job(
+        self,
+        job: Job,
+        execution_stack: list[str],
+        force: bool,
+        stream: StreamPipe = None,
+        events: list = None,
+    ):
         execution_stack = execution_stack or []
 
         if not job.enabled and not force:
             app_logger.warning(f"Job {job.id} is disabled. Skipping...")
             return
 
+        if job.result.get_status() == JobStatus.SKIPPED and not force:
+            app_logger.debug(f"Job {job.id} was skipped by a condition.")
+            return
+
+        # stream jobs are started by the job they stream from
+        if job.stream_from and stream is None:
+            if job.result.get_status() is None:
+                job.result.set_status(JobStatus.PENDING)
+            app_logger.debug(f"Job {job.id} waits for its stream {job.stream_from}.")
+            return
+
         if job.id in execution_stack:
             app_logger.error(
                 f"Job {job.id} is already in the execution stack. Skipping..."
@@ -103,6 +209,7 @@ class JobManager:
         execution_stack.append(job.id)
         job.result.execution_stack = execution_stack
         job.result.start()
+        tracer.set_attribute("execution_stack", execution_stack)
 
         is_pending = False
         for dep in job.depends_on:
@@ -115,65 +222,77 @@ class JobManager:
         if is_pending:
             return
 
+        if job.when and not self.check_condition(job):
+            return
+
+        if self.rate_limiter is not None:
+            with tracer.span("rate_limit"):
+                if not self.rate_limiter.acquire(job):
+                    return
+
         # get inputs on runtime
         if job.input:
-            for key, value in job.input.items():
-                resolved_value = self.resolver.resolve(value)
-                if resolved_value is None:
-                    app_logger.warning(
-                        f"Input {value} for job {job.id} is not valid. Skipping..."
-                    )
-                    continue
-
-                job.params[key] = self.resolver.resolve(value)
+            with tracer.span("resolve_inputs", inputs=len(job.input)):
+                self.resolve_inputs(job)
 
         app_logger.info(f"Running job: {job.id} ({' -> '.join(execution_stack)})...")
         job.result.set_status(JobStatus.RUNNING)
         attempt = 0
 
+        # jobs streaming from this one run at the same time
+        consumers = self.start_stream_consumers(job, execution_stack)
+        streams = [pipe for pipe, _ in consumers]
+        self.partition_results.pop(job.id, None)
+        run_start = time.monotonic()
+
         while attempt <= (job.retries.count):
             if attempt > 0:
                 app_logger.info(
                     f"Retrying job {job.id} ({attempt}/{job.retries.count}) in {job.retries.interval} seconds..."
                 )
+                job_retries.inc(job=job.id, plugin=job.get_plugin_label())
                 time.sleep(job.retries.interval)
+            attempt_start = time.monotonic()
             try:
 
-                resolved_params = apply_templates_to_params(job.params, context(job))
+                with tracer.span("apply_templates"):
+                    resolved_params = apply_templates_to_params(
+                        job.params, context(job)
+                    )
+                if stream is not None:
+                    resolved_params[STREAM_PARAM] = stream
+                if events is not None:
+                    resolved_params[EVENTS_PARAM] = events
+                if attempt == 0:
+                    self.warn_unprofiled(job, resolved_params)
 
                 if job.container:
                     app_logger.info(f"Running job {job.id} in container...")
-                    queue_result = run_job_in_docker(job, resolved_params)
+                    with tracer.span("container", image=job.container.image):
+                        queue_result = run_job_in_docker(
+                            job,
+                            resolved_params,
+                            self.images,
+                            self.cache.get_result_dir(),
+                        )
+                    queue_result = feed_streams(queue_result, streams)
+                elif job.foreach:
+                    queue_result = self.run_foreach(job, resolved_params)
+                    queue_result = feed_streams(queue_result, streams)
+                elif job.partitions:
+                    queue_result = self.run_partitions(job, resolved_params)
+                    queue_result = feed_streams(queue_result, streams)
                 else:
-                    from multiprocessing import Process, Queue
-
-                    queue = Queue()
-
-                    process = Process(
-                        target=plugin_execute,
-                        args=(job.plugin, resolved_params, queue),
-                    )
-                    process.start()
-                    if job.timeout and process.is_alive():
-                        process.join(timeout=job.timeout)
-
-                        process.terminate()
-                        raise PluginExecutionTimeoutError()
-                    else:
-                        process.join()
-                        queue_result = queue.get()
-
-                        if job.plugin == "exit":
-                            raise JobKillSignalError(queue_result)
-
-                        if isinstance(queue_result, Exception):
-                            job.result.set_status(JobStatus.ERROR)
-                            raise queue_result
-
-                    process.terminate()
+                    queue_result = self.run_plugin(job, resolved_params, streams)
+                close_streams(streams)
+                job.result.set_run_time(run_start)
+                self.feedback.record(job.id, time.monotonic() - attempt_start)
 
                 app_logger.info(f"Job {job.id} executed successfully.")
-                self.cache.write_output(job.id, queue_result if queue_result else "")
+                with tracer.span("cache.write"):
+                    job.result.output_size = self.cache.write_output(
+                        job.id, queue_result if queue_result else ""
+                    )
                 for on_success in job.on_success:
                     success_job = self.job_get_by_id(on_success)
                     self.run_job(success_job, execution_stack.copy(), force=True)
@@ -187,6 +306,11 @@ class JobManager:
                 break
             except PluginExecutionTimeoutError:
                 app_logger.error(f"Job {job.id} timed out.")
+                job.result.set_run_time(run_start)
+                self.feedback.record(
+                    job.id, time.monotonic() - attempt_start, error=True
+                )
+                close_streams(streams, "timed out")
                 job.result.set_status(JobStatus.ERROR)
                 break
 
@@ -194,10 +318,16 @@ class JobManager:
                 app_logger.error(
                     f"Job {job.id} executed with exception ({type(e)}): {e}"
                 )
+                job.result.set_run_time(run_start)
+                self.feedback.record(
+                    job.id, time.monotonic() - attempt_start, error=True
+                )
+                # a stream can not be replayed, streaming jobs are not retried
+                close_streams(streams, str(e))
                 job.result.retries = attempt
                 self.cache.write_output(job.id, str(e), attempt, is_error=True)
                 attempt += 1
-                if attempt >= job.retries.count:
+                if attempt >= job.retries.count or streams:
                     for on_failure in job.on_failure:
                         app_logger.info(f"Running on_failure jobs: {on_failure}...")
                         failure_job = self.job_get_by_id(on_failure)
@@ -205,6 +335,11 @@ class JobManager:
                         self.run_job(failure_job, execution_stack.copy(), force=True)
 
                     job.result.set_status(JobStatus.ERROR)
+                    if streams:
+                        break
+
+        job.result.attempts = min(attempt + 1, job.retries.count + 1)
+        self.stop_stream_consumers(consumers)
 
         dependant_jobs = [
             j
@@ -235,6 +370,19 @@ class JobManager:
         # giving scheduler feedback
         job.result.stop()
         self.executed_jobs.append(deepcopy(job))
+        self.record_run(job)
+
+        status = job.result.get_status()
+        # the run itself, dependants and triggered jobs ran inline after it
+        if job.result.run_time is not None:
+            job_duration.observe(
+                job.result.run_time, job=job.id, plugin=job.get_plugin_label()
+            )
+        job_runs.inc(
+            job=job.id,
+            plugin=job.get_plugin_label(),
+            status=status.value if status else "none",
+        )
 
         if job.result.get_status() == JobStatus.SUCCESS:
             return job
@@ -244,3 +392,590 @@ class JobManager:
             )
         else:
             return
+
+    def get_downstream(self, job: Job) -> list[Job]:
+        """Jobs which run after a job: dependants, triggered and stream jobs."""
+        predecessors = get_predecessors(self.jobs)
+        found = {job.id}
+        queue = [job.id]
+
+        while queue:
+            job_id = queue.pop()
+            for other in self.jobs:
+                if other.id in found:
+                    continue
+                if job_id in predecessors[other.id] or other.stream_from == job_id:
+                    found.add(other.id)
+                    queue.append(other.id)
+
+        return [other for other in self.jobs if other.id in found and other is not job]
+
+    def skip_job(self, job: Job, reason: str):
+        """Marks a job and every job after it as skipped, none of them runs."""
+        skipped = [job] + [
+            other
+            for other in self.get_downstream(job)
+            if other.enabled and other.result.get_status() in [None, JobStatus.PENDING]
+        ]
+        app_logger.info(
+            f"Skipping {', '.join(other.id for other in skipped)}: {reason}"
+        )
+
+        for other in skipped:
+            if other is not job:
+                # jobs waiting for an upstream job never started
+                other.result.end_time = other.result.start_time
+            other.result.set_status(JobStatus.SKIPPED)
+            self.executed_jobs.append(deepcopy(other))
+            job_runs.inc(
+                job=other.id, plugin=other.get_plugin_label(), status="skipped"
+            )
+
+    def check_condition(self, job: Job) -> bool:
+        """
+        Evaluates the condition of a job before it runs, the job is skipped
+        when it is false. A run of a scheduled or triggered job is skipped
+        alone, the next one evaluates the condition again.
+        """
+        try:
+            with tracer.span("condition"):
+                passed = get_condition(job.when).evaluate(
+                    job.params, self.cache.read_value
+                )
+        except Exception as e:
+            job.result.stop()
+            job.result.set_status(JobStatus.ERROR)
+            self.executed_jobs.append(deepcopy(job))
+            raise JobFailedError(f"Condition of job {job.id} failed: {e}")
+
+        if passed:
+            return True
+
+        if job.schedule or job.trigger:
+            app_logger.info(f"Condition of job {job.id} is false, skipping this run.")
+            job.result.set_status(JobStatus.RUNNING)
+            return False
+
+        job.result.stop()
+        self.skip_job(job, f"condition {job.when} is false")
+        return False
+
+    def prune_jobs(self) -> list[str]:
+        """
+        Evaluates the conditions which need no upstream results before any
+        job is scheduled, so skipped subgraphs never get scheduler entries,
+        image pulls or processes. Returns the ids of the skipped jobs.
+        """
+        for job in self.jobs:
+            if (
+                not job.enabled
+                or not job.when
+                or job.schedule
+                or job.trigger
+                or job.result.get_status() is not None
+            ):
+                continue
+
+            condition = get_condition(job.when)
+            if condition.results:
+                continue
+
+            try:
+                passed = condition.evaluate(job.params)
+            except Exception as e:
+                # reported again when the job runs
+                app_logger.debug(f"Condition of job {job.id} failed: {e}")
+                continue
+
+            if not passed:
+                self.skip_job(job, f"condition {job.when} is false")
+
+        return [
+            job.id for job in self.jobs if job.result.get_status() == JobStatus.SKIPPED
+        ]
+
+    def prefetch_images(self):
+        """Starts pulling the images of container jobs, earliest wave first."""
+        jobs = [
+            job
+            for job in self.jobs
+            if job.enabled
+            and job.container
+            and job.result.get_status() != JobStatus.SKIPPED
+        ]
+        if not jobs:
+            return
+
+        try:
+            waves = {step.job_id: step.wave for step in build_plan(self.jobs).steps}
+        except JobValidationError:
+            waves = {}
+
+        jobs.sort(key=lambda job: waves.get(job.id, 0))
+        self.images.prefetch([job.container for job in jobs])
+
+    def add_usage(self, job: Job, usage: ResourceUsage):
+        with self.usage_lock:
+            job.result.usage += usage
+
+    def record_run(self, job: Job):
+        try:
+            self.run_store.record([RunRecord.from_job(job, self.cache.run_id)])
+        except sqlite3.Error as e:
+            app_logger.warning(f"Run of job {job.id} was not recorded: {e}")
+
+    def resolve_inputs(self, job: Job):
+        for key, value in job.input.items():
+            resolved_value = self.resolver.resolve(value)
+            if resolved_value is None:
+                app_logger.warning(
+                    f"Input {value} for job {job.id} is not valid. Skipping..."
+                )
+                continue
+
+            job.params[key] = resolved_value
+
+    def start_stream_consumers(
+        self, job: Job, execution_stack: list[str]
+    ) -> list[tuple[StreamPipe, threading.Thread]]:
+        """Starts the jobs which stream from a job, each with its own pipe."""
+        consumers = []
+
+        for consumer in self.jobs:
+            if consumer.stream_from != job.id or not consumer.enabled:
+                continue
+
+            pipe = StreamPipe()
+            thread = threading.Thread(
+                target=self.run_stream_consumer,
+                args=(consumer, pipe, execution_stack.copy(), tracer.current_span()),
+                name=f"stream-{consumer.id}",
+                daemon=True,
+            )
+            app_logger.info(f"Streaming job {job.id} into job {consumer.id}...")
+            thread.start()
+            consumers.append((pipe, thread))
+
+        return consumers
+
+    def run_stream_consumer(
+        self,
+        job: Job,
+        stream: StreamPipe,
+        execution_stack: list[str],
+        parent: Span = None,
+    ):
+        try:
+            with tracer.attach(parent):
+                self.run_job(job, execution_stack, stream=stream)
+        except JobError as e:
+            app_logger.error(f"Stream job {job.id} failed: {e}")
+        finally:
+            # unblocks the writing job if this one stopped reading early
+            stream.reader_done.set()
+
+    def stop_stream_consumers(
+        self, consumers: list[tuple[StreamPipe, threading.Thread]]
+    ):
+        for pipe, thread in consumers:
+            pipe.close("upstream job did not finish")
+            thread.join()
+
+    def run_plugin(
+        self,
+        job: Job,
+        params: dict,
+        streams: list[StreamPipe] = None,
+        partition: int = None,
+    ):
+        """
+        Runs the plugin of a job as a native command, in the current thread
+        or in a plugin process, and returns its result.
+        """
+        command = self.build_command(job, params)
+        if command is not None:
+            if command.input is None and STREAM_PARAM in params:
+                command.input = params[STREAM_PARAM]
+            return self.run_command_process(job, command, streams)
+
+        plugin = plugin_lookup(job.plugin)
+        profile = job.profile or app_config.profile
+        if (
+            plugin is not None
+            and plugin.batch
+            and self.batcher.size > 1
+            and not profile
+            and not streams
+            and STREAM_PARAM not in params
+        ):
+            return self.run_plugin_batched(job, params)
+
+        if plugin is not None and plugin.in_process and not profile:
+            return self.run_plugin_in_process(job, plugin, params, streams)
+
+        return self.run_plugin_process(job, params, streams, partition)
+
+    def run_plugin_batched(self, job: Job, params: dict):
+        """Runs the plugin of a job together with other jobs, see PluginBatcher."""
+        with tracer.span("plugin.batch", plugin=job.plugin):
+            result, usage = self.batcher.run(job, params)
+        self.add_usage(job, usage)
+
+        if isinstance(result, Exception):
+            job.result.set_status(JobStatus.ERROR)
+            raise result
+
+        return result
+
+    def execute_batch(
+        self, name: str, batch: list[dict], timeout: int = None
+    ) -> tuple[list, ResourceUsage]:
+        """
+        Runs a batch of params with one run_batch call, in the current thread
+        for in_process plugins, otherwise in one plugin process. A failed
+        item has a PluginExecutionError as its result.
+        """
+        plugin = plugin_lookup(name)
+
+        if plugin.in_process:
+            usage = get_thread_usage()
+            try:
+                results = plugin.run_batch(batch)
+            except Exception as e:
+                raise PluginExecutionError(e)
+
+            return [
+                (
+                    PluginExecutionError(result)
+                    if isinstance(result, Exception)
+                    else result
+                )
+                for result in results
+            ], get_thread_usage() - usage
+
+        queue = Queue()
+        process = Process(target=plugin_execute_batch, args=(name, batch, queue, 0))
+
+        with tracer.span("process.spawn"):
+            spawn_start = time.perf_counter()
+            process.start()
+            plugin_spawn_time.observe(time.perf_counter() - spawn_start, plugin=name)
+
+        try:
+            with tracer.span("plugin.run_batch", plugin=name, jobs=len(batch)):
+                _, results, usage = self.wait_for_result(process, queue, timeout)
+            process.join()
+        finally:
+            process.terminate()
+
+        return results, usage
+
+    def run_plugin_in_process(
+        self,
+        job: Job,
+        plugin: PluginEntry,
+        params: dict,
+        streams: list[StreamPipe] = None,
+    ):
+        """
+        Runs an in_process plugin in the current scheduler thread, so state
+        like connection pools is kept between jobs.
+        """
+        usage = get_thread_usage()
+        with tracer.span("plugin.run", plugin=job.plugin, in_process=True):
+            try:
+                return strip_streams(feed_streams(plugin.run(params), streams))
+            except Exception as e:
+                job.result.set_status(JobStatus.ERROR)
+                raise PluginExecutionError(e)
+            finally:
+                self.add_usage(job, get_thread_usage() - usage)
+
+    def run_plugin_process(
+        self,
+        job: Job,
+        params: dict,
+        streams: list[StreamPipe] = None,
+        partition: int = None,
+    ):
+        """Runs the plugin of a job in a separate process and returns its result."""
+        queue = Queue()
+        profile = job.profile or app_config.profile
+
+        process = Process(
+            target=plugin_execute,
+            args=(job.plugin, params, queue),
+            kwargs={
+                "profile": profile,
+                "profile_path": self.cache.get_profile_path(job.id, partition),
+                "result_dir": self.cache.get_result_dir(),
+                "streams": streams,
+            },
+        )
+
+        with tracer.span("process.spawn"):
+            spawn_start = time.perf_counter()
+            process.start()
+            plugin_spawn_time.observe(
+                time.perf_counter() - spawn_start, plugin=job.plugin
+            )
+
+        try:
+            with tracer.span("plugin.run", plugin=job.plugin):
+                queue_result, usage = self.wait_for_result(process, queue, job.timeout)
+            process.join()
+        finally:
+            process.terminate()
+        self.add_usage(job, usage)
+
+        if job.plugin == "exit":
+            raise JobKillSignalError(queue_result)
+
+        if isinstance(queue_result, Exception):
+            job.result.set_status(JobStatus.ERROR)
+            raise queue_result
+
+        return queue_result
+
+    def warn_unprofiled(self, job: Job, params: dict):
+        """Warns when a job should be profiled, but runs outside of a profiler."""
+        if not (job.profile or app_config.profile):
+            return
+
+        if job.container:
+            where = "in a container"
+        elif job.foreach:
+            where = "in foreach batches"
+        elif self.build_command(job, params) is not None:
+            where = "as a native command"
+        else:
+            return
+
+        app_logger.warning(f"Job {job.id} runs {where} and is not profiled.")
+
+    def build_command(self, job: Job, params: dict) -> PluginCommand:
+        """Returns the native command of a plugin, if it provides one."""
+        plugin = plugin_lookup(job.plugin)
+        if plugin is None:
+            return None
+
+        try:
+            return plugin.build_command(params)
+        except Exception as e:
+            raise PluginExecutionError(e)
+
+    def run_command_process(
+        self, job: Job, command: PluginCommand, streams: list[StreamPipe] = None
+    ) -> str:
+        """
+        Spawns the native command of a plugin directly, without a plugin
+        process in between, and returns its stdout. Output is logged line by
+        line while the command runs. With streams, stdout lines are streamed
+        instead and not kept.
+        """
+
+        def log_output(stream: str, line: str):
+            if streams and stream == "stdout":
+                for pipe in streams:
+                    pipe.put(f"{line}\n")
+                return
+            app_logger.info(f"[{job.id}:{stream}] {line}")
+
+        with tracer.span("process.spawn", command=command.args[0]):
+            spawn_start = time.perf_counter()
+            process = spawn_command(command)
+            plugin_spawn_time.observe(
+                time.perf_counter() - spawn_start, plugin=job.plugin
+            )
+
+        with tracer.span("plugin.run", plugin=job.plugin):
+            result = wait_command(
+                process, command.input, job.timeout, log_output, capture=not streams
+            )
+        tracer.set_attribute("exit_code", result.returncode)
+        self.add_usage(job, result.usage)
+
+        if result.returncode != 0:
+            job.result.set_status(JobStatus.ERROR)
+            raise PluginExecutionError(
+                f"Command exited with {result.returncode}: {result.stderr.strip()}"
+            )
+
+        return result.stdout
+
+    def wait_for_result(self, process: Process, queue: Queue, timeout: int = None):
+        """
+        Waits for the result of a plugin process.
+
+        The result is read before the process is joined, a process which
+        put a large result on the queue only exits once it has been read.
+        """
+        deadline = time.time() + timeout if timeout else None
+
+        while True:
+            # wakes up as soon as the result arrives or the process exits
+            wait([queue._reader, process.sentinel], timeout=PROCESS_POLL_INTERVAL)
+
+            if not queue.empty():
+                # only the transfer of the result, not the run before it
+                with tracer.span("queue.get"):
+                    return queue.get()
+
+            if deadline is not None and time.time() > deadline:
+                raise PluginExecutionTimeoutError()
+
+            if not process.is_alive():
+                raise PluginExecutionError(
+                    f"Plugin process exited with {process.exitcode} without a result"
+                )
+
+    def run_foreach(self, job: Job, params: dict) -> list:
+        """
+        Runs the plugin once per foreach item and returns all results in item
+        order. Items are split in batches, every batch runs in one process.
+        """
+        foreach = job.foreach
+        items = self.resolver.resolve_items(foreach.items)
+        batch_size = max(1, foreach.batch_size)
+
+        item_params = [
+            apply_templates_to_params(params, {"item": item, "item_index": index})
+            | {foreach.key: item}
+            for index, item in enumerate(items)
+        ]
+        batches = [list(batch) for batch in batched(item_params, batch_size)]
+
+        app_logger.info(
+            f"Running job {job.id} for {len(items)} items in {len(batches)} batches..."
+        )
+
+        with tracer.span("foreach", items=len(items), batches=len(batches)):
+            batch_results = self.run_plugin_batches(job, batches, foreach.workers)
+
+        results = [result for batch in batch_results for result in batch]
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise PluginExecutionError(
+                f"{len(errors)} of {len(items)} items failed, first error: {errors[0]}"
+            )
+
+        return results
+
+    def run_partitions(self, job: Job, params: dict):
+        """
+        Runs the plugin once per partition, in parallel, and returns the
+        outputs merged in partition order. Results of partitions which
+        succeeded are kept, so a retry of the job only runs failed ones.
+        """
+        count = job.partitions
+        done = self.partition_results.setdefault(job.id, {})
+        pending = [index for index in range(count) if index not in done]
+        parent: Span = None
+
+        def run_partition(index: int):
+            partition_params = apply_templates_to_params(
+                params, {"partition_index": index, "partition_count": count}
+            )
+            try:
+                with tracer.attach(parent), tracer.span("partition", index=index):
+                    done[index] = self.run_plugin(
+                        job, partition_params, partition=index
+                    )
+            except (PluginExecutionError, PluginExecutionTimeoutError) as e:
+                return e
+
+        app_logger.info(
+            f"Running {len(pending)} of {count} partitions of job {job.id}..."
+        )
+
+        workers = min(len(pending), app_config.scheduler.pool_size) or 1
+        # partitions run in their own threads, their spans nest in this one
+        with tracer.span(
+            "partitions", partitions=count, pending=len(pending)
+        ) as parent:
+            with ThreadPoolExecutor(workers, f"partition-{job.id}") as executor:
+                errors = [e for e in executor.map(run_partition, pending) if e]
+
+        if any(isinstance(e, PluginExecutionTimeoutError) for e in errors):
+            raise PluginExecutionTimeoutError()
+        if errors:
+            raise PluginExecutionError(
+                f"{len(errors)} of {count} partitions failed, first error: {errors[0]}"
+            )
+
+        return merge_partitions([done[index] for index in range(count)])
+
+    def run_plugin_batches(
+        self, job: Job, batches: list[list[dict]], workers: int = 1
+    ) -> list[list]:
+        """
+        Runs batches of params in up to `workers` parallel plugin processes
+        and returns the results per batch.
+        """
+        queue = Queue()
+        pending = list(enumerate(batches))
+        running: dict[int, Process] = {}
+        results: list[list] = [None] * len(batches)
+        deadline = time.time() + job.timeout if job.timeout else None
+
+        try:
+            while pending or running:
+                while pending and len(running) < max(1, workers):
+                    index, batch = pending.pop(0)
+                    process = Process(
+                        target=plugin_execute_batch,
+                        args=(job.plugin, batch, queue, index),
+                    )
+                    spawn_start = time.perf_counter()
+                    process.start()
+                    plugin_spawn_time.observe(
+                        time.perf_counter() - spawn_start, plugin=job.plugin
+                    )
+                    running[index] = process
+
+                try:
+                    index, batch_results, usage = queue.get(
+                        timeout=PROCESS_POLL_INTERVAL
+                    )
+                except Empty:
+                    if deadline is not None and time.time() > deadline:
+                        raise PluginExecutionTimeoutError()
+
+                    # a process which died without a result fails its batch
+                    for index, process in list(running.items()):
+                        if not process.is_alive() and process.exitcode != 0:
+                            del running[index]
+                            results[index] = [
+                                PluginExecutionError(
+                                    f"Plugin process exited with {process.exitcode}"
+                                )
+                            ] * len(batches[index])
+                    continue
+
+                running.pop(index).join()
+                results[index] = batch_results
+                self.add_usage(job, usage)
+        finally:
+            for process in running.values():
+                process.terminate()
+
+        return results
+
+
+def merge_partitions(results: list):
+    """
+    Concatenates str or bytes outputs, other outputs become a list. Keyed
+    (dict) outputs are merged key by key, so ${result:job:key} still works.
+    """
+    if results and all(isinstance(result, dict) for result in results):
+        keys = dict.fromkeys(key for result in results for key in result)
+        return {
+            key: merge_partitions([result[key] for result in results if key in result])
+            for key in keys
+        }
+    if all(isinstance(result, str) for result in results):
+        return "".join(results)
+    if all(isinstance(result, bytes) for result in results):
+        return b"".join(results)
+
+    return results
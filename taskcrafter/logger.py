@@ -1,19 +1,112 @@
 import os
+import json
+import atexit
 import logging
-
+import multiprocessing
+from datetime import datetime
+from logging.handlers import (
+    MemoryHandler,
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
 
 LOG_FILE: str = "logs/taskcrafter.log"
 LOG_LEVEL = logging.INFO
+LOG_FORMAT = "text"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_BATCH_SIZE = 100
+
+_listeners: dict[str, QueueListener] = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "function": record.funcName,
+            "process": record.processName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class BatchingHandler(MemoryHandler):
+    """
+    Buffers records and writes them to the target handler in batches.
+
+    A batch is written when it is full, when an error is logged, or as soon
+    as the log queue is drained, so records are never held back while idle.
+    """
+
+    def __init__(self, capacity: int, target: logging.Handler, queue):
+        super().__init__(capacity, flushLevel=logging.ERROR, target=target)
+        self.queue = queue
+
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        return super().shouldFlush(record) or self.queue.empty()
+
+
+def _file_handler(
+    log_file: str, formatter: logging.Formatter, max_bytes: int, backup_count: int
+) -> logging.Handler:
+    directory = os.path.dirname(log_file)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    file_handler = RotatingFileHandler(
+        log_file, mode="a", maxBytes=max_bytes, backupCount=backup_count
+    )
+    file_handler.setFormatter(formatter)
+
+    return file_handler
+
+
+def _stop_listener(name: str):
+    listener = _listeners.pop(name, None)
+    if listener is None:
+        return
+
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
 
 
-def _setup(name: str, log_file: str, level: str | int):
+def _shutdown():
+    for name in list(_listeners):
+        _stop_listener(name)
+
+
+def _setup(
+    name: str,
+    log_file: str,
+    level: str | int,
+    log_format: str = LOG_FORMAT,
+    max_bytes: int = LOG_MAX_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+):
     """
     Setup a logger with the given name and level.
+
+    The logger only puts records on a queue, console and file writes are
+    done by a listener thread. The queue is a multiprocessing queue, so
+    records of forked plugin processes end up in the same listener and
+    never write to the log file themselves.
     """
 
     formatter = logging.Formatter(
         "[%(asctime)s] [%(levelname)s] [%(module)s:%(funcName)s] %(message)s"
     )
+    file_formatter = JsonFormatter() if log_format == "json" else formatter
 
     logger = logging.getLogger(name)
 
@@ -21,21 +114,47 @@ def _setup(name: str, log_file: str, level: str | int):
         level = logging.getLevelNamesMapping().get(level.upper())
 
     logger.setLevel(level)
+
+    # re-running setup replaces the previous pipeline
+    _stop_listener(name)
+    for handler in [h for h in logger.handlers if isinstance(h, QueueHandler)]:
+        logger.removeHandler(handler)
+
+    queue = multiprocessing.Queue()
+
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    directory = os.path.dirname(log_file)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    file_handler = BatchingHandler(
+        LOG_BATCH_SIZE,
+        target=_file_handler(log_file, file_formatter, max_bytes, backup_count),
+        queue=queue,
+    )
 
-    file_handler = logging.FileHandler(log_file, mode="a")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    listener = QueueListener(queue, console_handler, file_handler)
+    listener.start()
+    _listeners[name] = listener
+
+    logger.addHandler(QueueHandler(queue))
+
+    # atexit handlers run in reverse order, the listeners have to stop
+    # before multiprocessing closes the queue
+    atexit.unregister(_shutdown)
+    atexit.register(_shutdown)
 
     return logger
 
 
+def configure(log_file: str = None, level: str | int = None, log_format: str = None):
+    """Reconfigures app_logger, e.g. from CLI flags."""
+    return _setup(
+        app_logger.name,
+        log_file=log_file or LOG_FILE,
+        level=level or LOG_LEVEL,
+        log_format=log_format or LOG_FORMAT,
+    )
+
+
 app_logger: logging.Logger = _setup(
     "taskcrafter", log_file=LOG_FILE, level=logging.INFO
 )
@@ -0,0 +1,295 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from taskcrafter.logger import app_logger
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+    900,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value))
+
+
+class Metric(ABC):
+    type: str = "unknown"
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> list[str]:
+        """OpenMetrics lines of the values, called with the lock held."""
+        pass
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# TYPE {self.name} {self.type}",
+            f"# HELP {self.name} {self.description}",
+        ]
+        with self._lock:
+            lines.extend(self.samples())
+
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def get_count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def get_sum(self, **labels) -> float:
+        _, total = self._values.get(self._key(labels), ([0], 0.0))
+        return total
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self.server: ThreadingHTTPServer = None
+        self._writer_stop = threading.Event()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(
+        self, name: str, description: str, labels: tuple = (), **kwargs
+    ) -> Histogram:
+        return self.register(Histogram(name, description, labels, **kwargs))
+
+    def render(self) -> str:
+        """Renders all metrics in the OpenMetrics text format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """Writes metrics atomically, e.g. for the node_exporter textfile collector."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_textfile_writer(self, path: str, interval: float = 5):
+        """Periodically writes metrics to the textfile in a daemon thread."""
+
+        def writer():
+            while not self._writer_stop.wait(interval):
+                self.write_textfile(path)
+
+        self._writer_stop.clear()
+        threading.Thread(target=writer, name="metrics-writer", daemon=True).start()
+        app_logger.info(f"Writing metrics to {path} every {interval}s.")
+
+    def stop_textfile_writer(self, path: str):
+        self._writer_stop.set()
+        self.write_textfile(path)
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serves metrics on http://<host>:<port>/metrics in a daemon thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ["/", "/metrics"]:
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                app_logger.debug(f"metrics: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        app_logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+metrics = MetricsRegistry()
+
+job_duration = metrics.histogram(
+    "taskcrafter_job_duration_seconds",
+    "Duration of a job run, including retries, without triggered jobs.",
+    ("job", "plugin"),
+)
+job_runs = metrics.counter(
+    "taskcrafter_job_runs", "Finished job runs by status.", ("job", "plugin", "status")
+)
+job_retries = metrics.counter(
+    "taskcrafter_job_retries", "Retried job attempts.", ("job", "plugin")
+)
+job_queue_wait = metrics.histogram(
+    "taskcrafter_job_queue_wait_seconds",
+    "Time a job waited in the executor queue for a free worker.",
+    ("job",),
+)
+rate_limit_wait = metrics.histogram(
+    "taskcrafter_rate_limit_wait_seconds",
+    "Time a job waited for the tokens of its rate limits.",
+    ("limit",),
+)
+jobs_in_progress = metrics.gauge(
+    "taskcrafter_jobs_in_progress", "Jobs which are not finished yet."
+)
+cache_reads = metrics.counter(
+    "taskcrafter_cache_reads", "Result cache reads by outcome.", ("result",)
+)
+plugin_spawn_time = metrics.histogram(
+    "taskcrafter_plugin_spawn_seconds",
+    "Time to start a plugin process.",
+    ("plugin",),
+)
+plugin_batch_size = metrics.histogram(
+    "taskcrafter_plugin_batch_size",
+    "Jobs run by one run_batch call of a plugin.",
+    ("plugin",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+scheduler_event_lag = metrics.histogram(
+    "taskcrafter_scheduler_event_lag_seconds",
+    "Delay between the scheduled run time and the submission to the executor.",
+)
+executor_queue_depth = metrics.gauge(
+    "taskcrafter_executor_queue_depth", "Jobs waiting for a free executor worker."
+)
+concurrency_limit = metrics.gauge(
+    "taskcrafter_concurrency_limit", "Jobs which may run at once in adaptive mode."
+)
+executor_running = metrics.gauge(
+    "taskcrafter_executor_running", "Jobs running in executor workers."
+)
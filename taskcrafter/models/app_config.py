@@ -1,6 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from taskcrafter.models.cache import CacheConfig
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.models.scheduler import SchedulerConfig
 
 
 @dataclass
 class AppConfig:
     jobs_file: str = None
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    rate_limits: dict[str, RateLimit] = field(default_factory=dict)
+    metrics_port: int = None
+    metrics_file: str = None
+    trace_file: str = None
+    profile: bool = False
@@ -0,0 +1,30 @@
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+
+@dataclass
+class CacheConfig:
+    dir: str = ".cache"
+    # retention of previous runs, None disables a limit
+    max_runs: int = 10
+    max_age_days: float = None
+    max_size_mb: float = None
+
+    def update(self, **kwargs):
+        """Overrides values which are set (not None), e.g. from CLI flags."""
+        names = [f.name for f in fields(self)]
+
+        for key, value in kwargs.items():
+            if key in names and value is not None:
+                setattr(self, key, value)
+
+
+@dataclass
+class CacheRun:
+    """Outputs of one run, stored in their own namespace of the cache."""
+
+    run_id: str
+    path: Path
+    files: int = 0
+    size: int = 0
+    modified: float = 0
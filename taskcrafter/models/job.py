@@ -10,6 +10,7 @@ class JobStatus(Enum):
     RUNNING = "running"
     PENDING = "pending"
     ERROR = "error"
+    SKIPPED = "skipped"
 
 
 @dataclass
@@ -27,6 +28,9 @@ class JobContainer:
     engine: str = "docker"
     privileged: bool = False
     user: str = None
+    # files written to this directory become the keyed outputs of the job,
+    # None does not mount it
+    result_dir: str = "/taskcrafter/results"
 
     def get_engine_url(self):
         if self.engine == "docker":
@@ -35,6 +39,109 @@ class JobContainer:
             return "unix://run/user/1000/podman/podman.sock"
 
 
+@dataclass
+class JobForeach:
+    """Runs the plugin of a job once per item, in batches per worker process."""
+
+    items: list | str
+    batch_size: int = 1
+    workers: int = 1
+    key: str = "item"
+
+
+class TriggerType(Enum):
+    FILE = "file"
+    WEBHOOK = "webhook"
+    QUEUE = "queue"
+
+
+@dataclass
+class JobTrigger:
+    """Runs a job on events, a burst of events is collected into one run."""
+
+    type: TriggerType
+    # watched file or directory (file), FIFO (queue)
+    path: str = None
+    # glob of watched file names (file)
+    pattern: str = "*"
+    # local port and route of the endpoint (webhook)
+    port: int = None
+    route: str = None
+    # seconds without events before the job runs
+    debounce: float = 0.2
+    # seconds after the first event the job runs at the latest
+    max_wait: float = None
+
+    def __post_init__(self):
+        self.type = TriggerType(self.type)
+
+
+@dataclass
+class ResourceUsage:
+    """CPU time, memory, block I/O and context switches of a job."""
+
+    user_time: float = 0
+    system_time: float = 0
+    # bytes, the largest of all processes of the job
+    max_rss: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+
+    @classmethod
+    def from_rusage(cls, usage) -> "ResourceUsage":
+        """From a resource.struct_rusage, as returned by getrusage and wait4."""
+        return cls(
+            user_time=usage.ru_utime,
+            system_time=usage.ru_stime,
+            # kilobytes on Linux, blocks of 512 bytes
+            max_rss=usage.ru_maxrss * 1024,
+            read_bytes=usage.ru_inblock * 512,
+            write_bytes=usage.ru_oublock * 512,
+            voluntary_switches=usage.ru_nvcsw,
+            involuntary_switches=usage.ru_nivcsw,
+        )
+
+    def get_cpu_time(self) -> float:
+        return self.user_time + self.system_time
+
+    def __add__(self, other: "ResourceUsage") -> "ResourceUsage":
+        return ResourceUsage(
+            user_time=self.user_time + other.user_time,
+            system_time=self.system_time + other.system_time,
+            max_rss=max(self.max_rss, other.max_rss),
+            read_bytes=self.read_bytes + other.read_bytes,
+            write_bytes=self.write_bytes + other.write_bytes,
+            voluntary_switches=self.voluntary_switches + other.voluntary_switches,
+            involuntary_switches=self.involuntary_switches + other.involuntary_switches,
+        )
+
+    def split(self, count: int) -> "ResourceUsage":
+        """Even share of count jobs which ran in one process, max_rss is kept."""
+        return ResourceUsage(
+            user_time=self.user_time / count,
+            system_time=self.system_time / count,
+            max_rss=self.max_rss,
+            read_bytes=self.read_bytes // count,
+            write_bytes=self.write_bytes // count,
+            voluntary_switches=self.voluntary_switches // count,
+            involuntary_switches=self.involuntary_switches // count,
+        )
+
+    def __sub__(self, other: "ResourceUsage") -> "ResourceUsage":
+        """Usage between two readings, max_rss is a peak and is kept."""
+        return ResourceUsage(
+            user_time=self.user_time - other.user_time,
+            system_time=self.system_time - other.system_time,
+            max_rss=self.max_rss,
+            read_bytes=self.read_bytes - other.read_bytes,
+            write_bytes=self.write_bytes - other.write_bytes,
+            voluntary_switches=self.voluntary_switches - other.voluntary_switches,
+            involuntary_switches=self.involuntary_switches - other.involuntary_switches,
+        )
+
+
 @dataclass
 class JobResult:
     retries: int = 0
@@ -42,6 +149,17 @@ class JobResult:
     end_time: int = 0
     status: JobStatus = None
     execution_stack: list[str] = field(default_factory=list)
+    # seconds the job itself ran, without the jobs it triggered
+    run_time: float = None
+    # seconds spent on pulling the container image, not part of run_time
+    pull_time: float = 0
+    attempts: int = 0
+    # seconds the job waited for a scheduler worker
+    queue_wait: float = 0
+    # bytes of the cached output
+    output_size: int = 0
+    # of all attempts, partitions and foreach batches
+    usage: ResourceUsage = field(default_factory=ResourceUsage)
 
     def get_elapsed_time(self) -> int:
         """Returns elapsed time in miliseconds"""
@@ -49,6 +167,14 @@ class JobResult:
 
     def start(self):
         self.start_time = time.time()
+        self.run_time = None
+        self.pull_time = 0
+        self.output_size = 0
+        self.usage = ResourceUsage()
+
+    def set_run_time(self, started: float):
+        """Sets the seconds since started (time.monotonic), without the pull."""
+        self.run_time = time.monotonic() - started - self.pull_time
 
     def stop(self):
         self.end_time = time.time()
@@ -77,15 +203,42 @@ class Job:
     container: JobContainer = None
     result: JobResult = field(default_factory=JobResult)
     input: dict[str, str] = field(default_factory=dict)
+    max_instances: int = None
+    misfire_grace_time: int = None
+    coalesce: bool = None
+    profile: bool | str = False
+    foreach: JobForeach | list | str | dict = None
+    # job whose output is streamed into the `_stream` param while both run
+    stream_from: str = None
+    # parallel instances, see ${PARTITION_INDEX} and ${PARTITION_COUNT}
+    partitions: int = None
+    # events which run the job, instead of a schedule
+    trigger: JobTrigger | dict = None
+    # names of rate limits, every run waits for a token of each of them
+    rate_limit: list[str] | str = field(default_factory=list)
+    # condition, the job and the jobs after it are skipped when it is false
+    when: str = None
 
     def __post_init__(self):
         if isinstance(self.retries, dict):
             self.retries = JobRetry(**self.retries)
         if self.container is not None:
             self.container = JobContainer(**self.container)
+        if isinstance(self.foreach, dict):
+            self.foreach = JobForeach(**self.foreach)
+        elif self.foreach is not None and not isinstance(self.foreach, JobForeach):
+            self.foreach = JobForeach(items=self.foreach)
+        if isinstance(self.trigger, dict):
+            self.trigger = JobTrigger(**self.trigger)
+        if isinstance(self.rate_limit, str):
+            self.rate_limit = [self.rate_limit]
 
         if self.plugin is not None and self.plugin.startswith("file:"):
             file_name = self.plugin.split(":")[1]
             plugin_path = pathlib.Path(file_name)
 
             self.plugin = plugin_path.stem
+
+    def get_plugin_label(self) -> str:
+        """Plugin name, or "container" for container jobs."""
+        return self.plugin or ("container" if self.container else "")
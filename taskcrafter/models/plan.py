@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PlanStep:
+    job_id: str
+    wave: int
+    start: float = 0
+    duration: float = 0
+    # True when there is no recorded duration and the default is used
+    estimated: bool = True
+    # parallel instances of the job, e.g. partitions
+    width: int = 1
+    depends_on: list[str] = field(default_factory=list)
+    # run started by on_success or on_finish of another job
+    triggered: bool = False
+
+    def get_finish(self) -> float:
+        return self.start + self.duration
+
+
+@dataclass
+class ExecutionPlan:
+    steps: list[PlanStep] = field(default_factory=list)
+    critical_path: list[str] = field(default_factory=list)
+    makespan: float = 0
+    # jobs which never run, e.g. they depend on a disabled job
+    blocked: list[str] = field(default_factory=list)
+
+    def get_waves(self) -> list[list[PlanStep]]:
+        waves = {}
+        for step in self.steps:
+            waves.setdefault(step.wave, []).append(step)
+
+        return [waves[wave] for wave in sorted(waves)]
+
+    def get_max_width(self) -> int:
+        """Most job instances of one wave, i.e. workers needed to not queue."""
+        return max(
+            (sum(step.width for step in wave) for wave in self.get_waves()), default=0
+        )
+
+    def get_total_duration(self) -> float:
+        """Makespan of the plan if every job ran one after another."""
+        return sum(step.duration for step in self.steps)
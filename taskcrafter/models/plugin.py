@@ -4,6 +4,16 @@ from dataclasses import dataclass, field
 from taskcrafter.logger import app_logger
 
 
+@dataclass
+class PluginCommand:
+    """A native command, which is executed without a plugin process."""
+
+    args: list[str]
+    env: dict[str, str] = None
+    # stdin of the command, if any
+    input: bytes = None
+
+
 @dataclass
 class PluginEntry:
     instance: object
@@ -12,11 +22,19 @@ class PluginEntry:
     name: str = field(init=False)
     description: str = field(init=False)
     output: Optional[Union[dict, str]] = None
+    in_process: bool = field(init=False)
+    # implements run_batch, runs of several jobs are grouped
+    batch: bool = field(init=False)
 
     def __post_init__(self):
         self.name = self.instance.name
         self.description = self.instance.description
         self.id = self.instance.__module__.split(".")[-1]
+        self.in_process = getattr(self.instance, "in_process", False)
+        self.batch = getattr(type(self.instance), "run_batch", None) not in [
+            None,
+            PluginInterface.run_batch,
+        ]
 
         output = getattr(self.instance, "output", None)
         if output is not None:
@@ -29,6 +47,27 @@ class PluginEntry:
             app_logger.error(f"Plugin {self.name} does not have a run function.")
             raise AttributeError(f"Plugin {self.name} does not have a run function.")
 
+    def run_batch(self, batch: list[dict]) -> list:
+        """Results of a batch of params in order, a failed item is an exception."""
+        if not self.batch:
+            return PluginInterface.run_batch(self.instance, batch)
+
+        results = self.instance.run_batch(batch)
+        if len(results) != len(batch):
+            raise ValueError(
+                f"Plugin {self.name} returned {len(results)} results "
+                f"for a batch of {len(batch)}."
+            )
+
+        return results
+
+    def build_command(self, params) -> Optional[PluginCommand]:
+        build_command = getattr(self.instance, "build_command", None)
+        if build_command is None:
+            return None
+
+        return build_command(params)
+
 
 class PluginInterface(ABC):
     """
@@ -39,11 +78,19 @@ class PluginInterface(ABC):
     - `description`: Description of the plugin
     - `run(params: dict)`: Main function of the plugin
     - `output` (optional): Output of the plugin (dict or str)
+    - `build_command(params: dict)` (optional): Native command to execute
+      instead of run(), see PluginCommand
+    - `run_batch(batch: list[dict])` (optional): Runs several jobs at once,
+      so setup like connections or models is shared by all of them
+    - `in_process` (optional): Run in a scheduler thread instead of a plugin
+      process, for thread-safe I/O plugins which keep state between jobs,
+      e.g. connection pools. Such plugins enforce their own timeouts.
     """
 
     name: str
     description: str
     output: Optional[Union[dict, str]] = None
+    in_process: bool = False
 
     @abstractmethod
     def run(self, params: dict) -> Optional[Union[dict, str]]:
@@ -59,3 +106,31 @@ class PluginInterface(ABC):
                                     as input for other jobs.
         """
         pass
+
+    def build_command(self, params: dict) -> Optional[PluginCommand]:
+        """
+        Returns a native command for plugins which only start a binary.
+
+        The command is spawned directly by the job manager instead of a
+        plugin process which then starts the binary, its stdout is the
+        result. Plugins which return None are executed with run().
+        """
+        return None
+
+    def run_batch(self, batch: list[dict]) -> list:
+        """
+        Executes the plugin for a batch of params and returns the results in
+        the same order. An exception in the results fails only its item.
+
+        Plugins which override it get runs of several jobs grouped into one
+        call, see the batch_window and batch_size scheduler settings. The
+        default runs run() for every params.
+        """
+        results = []
+        for params in batch:
+            try:
+                results.append(self.run(params))
+            except Exception as e:
+                results.append(e)
+
+        return results
@@ -0,0 +1,27 @@
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+from taskcrafter.models.job import Job
+
+
+@dataclass
+class RateLimit:
+    """A token bucket, declared in the rate_limits section of the jobs file."""
+
+    name: str
+    # tokens added per second, every run of a job takes one
+    rate: float
+    # tokens the bucket holds, i.e. runs which can start at once after a pause
+    burst: int = 1
+    # jobs of these plugins, or with a url param on these hosts, use the
+    # limit without referencing it
+    plugins: list[str] = field(default_factory=list)
+    hosts: list[str] = field(default_factory=list)
+
+    def applies_to(self, job: Job) -> bool:
+        if self.name in job.rate_limit:
+            return True
+        if job.plugin in self.plugins:
+            return True
+
+        url = job.params.get("url")
+        return bool(self.hosts) and urlparse(str(url)).hostname in self.hosts
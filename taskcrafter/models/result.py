@@ -0,0 +1,63 @@
+import mmap
+import os
+import secrets
+from dataclasses import dataclass
+from pathlib import Path
+
+# bytes results from this size on are passed as a handle instead of a copy
+HANDLE_THRESHOLD = 1024 * 1024
+# directory of the run where plugins and containers write result files
+RESULT_DIR_ENV = "TASKCRAFTER_RESULT_DIR"
+
+
+@dataclass
+class ResultHandle:
+    """
+    A large result which lives in a file instead of being copied around.
+
+    Only the path is pickled between processes. Readers map the file into
+    memory with buffer(), so the data is shared through the page cache and
+    never copied. Plugins can return a handle for a file they wrote
+    themselves (from_path) or for bytes they produced (from_bytes).
+    """
+
+    path: str
+    size: int = 0
+    # owned files were created for the result and can be moved into the cache
+    owned: bool = False
+
+    @classmethod
+    def from_path(cls, path: str | Path) -> "ResultHandle":
+        path = Path(path).absolute()
+        return cls(path=str(path), size=path.stat().st_size)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview, directory: str | Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / f".result.{os.getpid()}.{secrets.token_hex(4)}"
+        with open(path, "wb") as f:
+            f.write(data)
+
+        return cls(path=str(path.absolute()), size=len(data), owned=True)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def buffer(self) -> memoryview:
+        """Maps the file read-only into memory."""
+        if self.size == 0:
+            return memoryview(b"")
+
+        with open(self.path, "rb") as f:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def read_bytes(self) -> bytes:
+        return Path(self.path).read_bytes()
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def __str__(self) -> str:
+        return self.path
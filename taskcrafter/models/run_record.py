@@ -0,0 +1,76 @@
+from dataclasses import asdict, dataclass
+from taskcrafter.models.job import Job, JobStatus
+
+
+@dataclass
+class RunRecord:
+    """One execution of a job, as persisted in the run store."""
+
+    run_id: str
+    job_id: str
+    plugin: str
+    attempt: int
+    status: str
+    started_at: float
+    # seconds the job waited for a scheduler worker
+    queue_wait: float
+    # seconds the job itself ran, without the jobs it triggered
+    elapsed: float
+    output_size: int
+    # seconds spent on pulling the container image, not part of elapsed
+    pull_time: float = 0
+    # resource usage, see ResourceUsage
+    user_time: float = 0
+    system_time: float = 0
+    max_rss: int = 0
+    read_bytes: int = 0
+    write_bytes: int = 0
+    voluntary_switches: int = 0
+    involuntary_switches: int = 0
+
+    @classmethod
+    def from_job(cls, job: Job, run_id: str) -> "RunRecord":
+        result = job.result
+        # scheduled jobs stay RUNNING after a successful execution
+        status = "error" if result.get_status() == JobStatus.ERROR else "success"
+
+        return cls(
+            run_id=run_id,
+            job_id=job.id,
+            plugin=job.get_plugin_label(),
+            attempt=result.attempts,
+            status=status,
+            started_at=result.start_time,
+            queue_wait=result.queue_wait,
+            elapsed=(
+                result.run_time
+                if result.run_time is not None
+                else result.get_elapsed_time()
+            ),
+            output_size=result.output_size,
+            pull_time=result.pull_time,
+            **asdict(result.usage),
+        )
+
+
+@dataclass
+class DurationStats:
+    name: str
+    runs: int
+    errors: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+@dataclass
+class Regression:
+    job_id: str
+    # medians of the recent runs and the runs before them
+    baseline: float
+    recent: float
+
+    def get_ratio(self) -> float:
+        return self.recent / self.baseline if self.baseline else float("inf")
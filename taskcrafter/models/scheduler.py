@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from taskcrafter.models.job import Job
+
+
+@dataclass
+class AdaptiveConcurrencyConfig:
+    """
+    Bounds and signals of the AIMD concurrency limit. The limit grows by one
+    per healthy run and is multiplied by backoff when the error rate or the
+    latency (relative to the usual latency of each job) of the last window
+    runs is too high.
+    """
+
+    min: int = 1
+    # defaults to pool_size
+    max: int = None
+    window: int = 20
+    max_error_rate: float = 0.1
+    # latency of a run relative to the average of its job
+    latency_tolerance: float = 2.0
+    backoff: float = 0.9
+
+
+@dataclass
+class SchedulerConfig:
+    pool_size: int = 10
+    max_instances: int = 1
+    misfire_grace_time: int = 1
+    coalesce: bool = False
+    # threads pulling container images ahead of the jobs, 0 disables it
+    image_pull_workers: int = 4
+    # adjusts the number of running jobs between its bounds, None is static
+    adaptive: AdaptiveConcurrencyConfig | dict = None
+    # seconds jobs of a batch plugin wait for more jobs to share a batch
+    batch_window: float = 0.05
+    # jobs in one batch, 1 disables batching
+    batch_size: int = 100
+
+    def __post_init__(self):
+        if isinstance(self.adaptive, dict):
+            self.adaptive = AdaptiveConcurrencyConfig(**self.adaptive)
+
+    def get_max_workers(self) -> int:
+        if self.adaptive is not None and self.adaptive.max is not None:
+            return self.adaptive.max
+        return self.pool_size
+
+    def update(self, **kwargs):
+        """Overrides values which are set (not None), e.g. from CLI flags."""
+        names = [f.name for f in fields(self)]
+
+        for key, value in kwargs.items():
+            if key in names and value is not None:
+                setattr(self, key, value)
+
+    def get_job_defaults(self) -> dict:
+        return {
+            "max_instances": self.max_instances,
+            "misfire_grace_time": self.misfire_grace_time,
+            "coalesce": self.coalesce,
+        }
+
+
+@dataclass
+class ExecutorStats:
+    pool_size: int = 0
+    submitted: int = 0
+    completed: int = 0
+    missed: int = 0
+    peak_queue_depth: int = 0
+
+    def get_in_flight(self) -> int:
+        return self.submitted - self.completed
+
+    def get_running(self) -> int:
+        return min(self.get_in_flight(), self.pool_size)
+
+    def get_queue_depth(self) -> int:
+        """Jobs which are submitted to the executor but wait for a free worker."""
+        return max(0, self.get_in_flight() - self.pool_size)
+
+    def job_submitted(self):
+        self.submitted += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.get_queue_depth())
+
+    def job_completed(self):
+        self.completed += 1
+
+
+@dataclass
+class Firing:
+    """Jobs of all cron schedules which fire at the same time."""
+
+    time: datetime
+    schedules: list[str] = field(default_factory=list)
+    jobs: list[Job] = field(default_factory=list)
+    # ids of jobs whose next tick is already due too, coalescing jobs only
+    # run the last one
+    superseded: set[str] = field(default_factory=set)
@@ -0,0 +1,188 @@
+from taskcrafter.exceptions.job import JobValidationError
+from taskcrafter.models.job import Job
+from taskcrafter.models.plan import ExecutionPlan, PlanStep
+
+
+def get_job_width(job: Job) -> int:
+    """Instances of a job which run at the same time."""
+    if job.partitions:
+        return job.partitions
+    if job.foreach:
+        return job.foreach.workers
+
+    return 1
+
+
+def get_triggers(jobs: list[Job]) -> dict[str, list[str]]:
+    """Jobs which run a job with on_success or on_finish, per triggered job."""
+    triggers = {}
+    # on_failure jobs are not part of a run which succeeds
+    for job in jobs:
+        for target in job.on_success + job.on_finish:
+            if job.id not in triggers.setdefault(target, []):
+                triggers[target].append(job.id)
+
+    return triggers
+
+
+def get_runnable_jobs(jobs: list[Job]) -> tuple[list[Job], list[str]]:
+    """
+    Splits jobs into those which run and those which never do, because they
+    are disabled or wait for a job which never runs. A disabled job runs when
+    a job which runs triggers it.
+    """
+    triggers = get_triggers(jobs)
+    runnable = {job.id: job for job in jobs if job.enabled or job.id in triggers}
+
+    changed = True
+    while changed:
+        changed = False
+        for job in list(runnable.values()):
+            upstream = job.depends_on + ([job.stream_from] if job.stream_from else [])
+            is_triggered = any(
+                trigger in runnable for trigger in triggers.get(job.id, [])
+            )
+            if any(dep not in runnable for dep in upstream) or not (
+                job.enabled or is_triggered
+            ):
+                del runnable[job.id]
+                changed = True
+
+    enabled = {job.id for job in jobs if job.enabled}
+    blocked = [
+        job.id
+        for job in jobs
+        if job.id not in runnable
+        and (job.enabled or any(t in enabled for t in triggers.get(job.id, [])))
+    ]
+    return list(runnable.values()), blocked
+
+
+def get_predecessors(jobs: list[Job]) -> dict[str, list[str]]:
+    """Jobs which have to finish before a job starts: depends_on and triggers."""
+    predecessors = {job.id: list(job.depends_on) for job in jobs}
+
+    for target, triggers in get_triggers(jobs).items():
+        if target in predecessors:
+            predecessors[target] += [
+                t
+                for t in triggers
+                if t in predecessors and t not in predecessors[target]
+            ]
+
+    return predecessors
+
+
+def build_plan(
+    jobs: list[Job], durations: dict[str, float] = {}, default_duration: float = 0
+) -> ExecutionPlan:
+    """
+    Computes how a run executes: jobs are grouped in waves of jobs which run
+    at the same time, a job starts when the last of its predecessors has
+    finished. A job which streams from another job starts together with it.
+    An enabled job which another job triggers is scheduled on its own as well,
+    so it runs twice: once after its depends_on and once after its triggers.
+    Durations are estimates, e.g. recorded durations of previous runs, jobs
+    without one take default_duration.
+    """
+    runnable, blocked = get_runnable_jobs(jobs)
+    by_id = {job.id: job for job in runnable}
+    predecessors = get_predecessors(runnable)
+    triggers = get_triggers(runnable)
+
+    # topological order, stream jobs are placed after the job they stream from
+    edges = {
+        job.id: predecessors[job.id] + ([job.stream_from] if job.stream_from else [])
+        for job in runnable
+    }
+    order = []
+    remaining = dict(edges)
+    while remaining:
+        ready = [
+            job_id
+            for job_id, deps in remaining.items()
+            if all(dep not in remaining for dep in deps)
+        ]
+        if not ready:
+            raise JobValidationError(
+                f"Jobs {', '.join(sorted(remaining))} trigger each other in a cycle."
+            )
+        for job_id in ready:
+            order.append(job_id)
+            del remaining[job_id]
+
+    steps: dict[str, PlanStep] = {}
+    # predecessor which determines the start of a job, for the critical path
+    critical: dict[str, str] = {}
+
+    for job_id in order:
+        job = by_id[job_id]
+        step = PlanStep(
+            job_id=job_id,
+            wave=0,
+            duration=durations.get(job_id, default_duration),
+            estimated=job_id not in durations,
+            width=get_job_width(job),
+            depends_on=predecessors[job_id],
+            triggered=job_id in triggers,
+        )
+
+        if job.stream_from:
+            upstream = steps[job.stream_from]
+            step.wave = upstream.wave
+            step.start = upstream.start
+            critical[job_id] = job.stream_from
+        elif step.depends_on:
+            critical[job_id] = place_after(step, steps)
+
+        steps[job_id] = step
+
+    # runs of enabled trigger targets which the scheduler starts on its own
+    scheduled = []
+    for job_id in order:
+        job = by_id[job_id]
+        if job_id not in triggers or not job.enabled or job.stream_from:
+            continue
+
+        step = PlanStep(
+            job_id=job_id,
+            wave=0,
+            duration=steps[job_id].duration,
+            estimated=steps[job_id].estimated,
+            width=steps[job_id].width,
+            depends_on=list(job.depends_on),
+        )
+        last = place_after(step, steps) if step.depends_on else None
+        scheduled.append((step, last))
+
+    plan = ExecutionPlan(
+        steps=list(steps.values()) + [step for step, _ in scheduled],
+        blocked=blocked,
+    )
+    if not steps:
+        return plan
+
+    end, job_id = max(
+        [(step, critical.get(step.job_id)) for step in steps.values()] + scheduled,
+        key=lambda item: item[0].get_finish(),
+    )
+    plan.makespan = end.get_finish()
+
+    plan.critical_path.insert(0, end.job_id)
+    while job_id is not None:
+        plan.critical_path.insert(0, job_id)
+        job_id = critical.get(job_id)
+
+    return plan
+
+
+def place_after(step: PlanStep, steps: dict[str, PlanStep]) -> str:
+    """
+    Starts a step when the last of its predecessors has finished, returns
+    that predecessor.
+    """
+    last = max(step.depends_on, key=lambda dep: steps[dep].get_finish())
+    step.wave = max(steps[dep].wave for dep in step.depends_on) + 1
+    step.start = steps[last].get_finish()
+
+    return last
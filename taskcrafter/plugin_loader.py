@@ -5,6 +5,10 @@ from multiprocessing import Queue
 from types import ModuleType
 from taskcrafter.logger import app_logger
 from taskcrafter.models.plugin import PluginEntry, PluginInterface
+from taskcrafter.models.result import HANDLE_THRESHOLD, ResultHandle
+from taskcrafter.profiler import profile_call
+from taskcrafter.stream import StreamPipe, feed_streams, strip_streams
+from taskcrafter.usage import get_process_usage
 from taskcrafter.exceptions.plugin import (
     PluginExecutionError,
     PluginExternalError,
@@ -76,19 +80,76 @@ def plugin_lookup(id: str) -> PluginEntry:
     return registry.get(id)
 
 
-def plugin_execute(name: str, params: dict, queue: Queue) -> PluginEntry:
-    """Execute a plugin."""
+def plugin_execute(
+    name: str,
+    params: dict,
+    queue: Queue,
+    profile: bool | str = False,
+    profile_path: pathlib.Path = None,
+    result_dir: pathlib.Path = None,
+    streams: list[StreamPipe] = None,
+) -> PluginEntry:
+    """
+    Execute a plugin.
+
+    Puts (result, usage) on the queue, usage is the resource usage of the
+    plugin process. Large bytes results are written to result_dir and only
+    their ResultHandle is put on the queue, so they are not pickled. With
+    streams, the result is streamed to the jobs which stream from it.
+    """
     if name not in registry:
         raise PluginNotFoundError(f"Plugin {name} not found.")
 
     plugin = registry[name]
 
     try:
-        res = plugin.run(params)
-        queue.put(res)
+        if profile and profile_path is not None:
+            res = profile_call(plugin.run, (params,), profile_path, profile)
+        else:
+            res = plugin.run(params)
+        res = strip_streams(feed_streams(res, streams))
+        queue.put((wrap_large_result(res, result_dir), get_process_usage()))
         return plugin
     except Exception as e:
-        queue.put(PluginExecutionError(e))
+        queue.put((PluginExecutionError(e), get_process_usage()))
+
+
+def wrap_large_result(result, result_dir: pathlib.Path = None):
+    """Replaces large bytes results, also in a dict, by a ResultHandle."""
+    if result_dir is None:
+        return result
+
+    if isinstance(result, dict):
+        return {key: wrap_large_result(val, result_dir) for key, val in result.items()}
+
+    if (
+        isinstance(result, (bytes, bytearray, memoryview))
+        and len(result) >= HANDLE_THRESHOLD
+    ):
+        return ResultHandle.from_bytes(result, result_dir)
+
+    return result
+
+
+def plugin_execute_batch(name: str, batch: list[dict], queue: Queue, index: int):
+    """
+    Execute a plugin for a batch of params, with one run_batch call.
+
+    Puts (index, results, usage) on the queue, a failed item has a
+    PluginExecutionError as its result.
+    """
+    try:
+        if name not in registry:
+            raise PluginNotFoundError(f"Plugin {name} not found.")
+
+        results = [
+            PluginExecutionError(result) if isinstance(result, Exception) else result
+            for result in registry[name].run_batch(batch)
+        ]
+    except Exception as e:
+        results = [PluginExecutionError(e)] * len(batch)
+
+    queue.put((index, results, get_process_usage()))
 
 
 def validate_plugin(instance) -> bool:
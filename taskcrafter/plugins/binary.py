@@ -5,48 +5,47 @@ Args:
     params (dict): A dictionary of parameters containing:
         - command (str): The path to the binary file.
         - args (list[str]): A list of arguments to pass to the binary file.
-        - env (dict[str, str]): A dictionary of environment variables to set before executing the binary.
+        - env (dict[str, str]): A dictionary of environment variables to set for the binary.
 
 Returns:
     str: The output of the executed binary as a string.
 
 Raises:
     ValueError: If the 'path' parameter is missing.
-    subprocess.CalledProcessError: If the binary execution fails.
+    PluginExecutionError: If the binary execution fails.
+
+The binary is spawned directly by the job manager (see build_command),
+run() is only used where a plugin process is required, e.g. foreach jobs.
 """
 
-import os
-import subprocess
+from taskcrafter.command import run_command
+from taskcrafter.exceptions.plugin import PluginExecutionError
 from taskcrafter.logger import app_logger
-from taskcrafter.models.plugin import PluginInterface
+from taskcrafter.models.plugin import PluginCommand, PluginInterface
 
 
 class Plugin(PluginInterface):
     name = "Binary"
     description = "Executes a binary file with arguments. 🐧"
 
-    def run(self, params: dict):
-
+    def build_command(self, params: dict) -> PluginCommand:
         path = params.get("command")
         if not path:
             raise ValueError("Missing 'path' parameter for binary plugin.")
 
-        args = params.get("args", [])
-        env = os.environ.copy()
-        env.update(params.get("env", {}))
-        os.environ.update(env)
-
-        try:
-            result = subprocess.run(
-                [path] + args,
-                env=env,
-                capture_output=True,
-                shell=False,
-                text=True,
-                check=True,
+        return PluginCommand(
+            args=[path] + params.get("args", []),
+            env=params.get("env", {}),
+        )
+
+    def run(self, params: dict):
+        result = run_command(self.build_command(params))
+
+        if result.returncode != 0:
+            app_logger.error(f"[binary] Execution failed: {result.stderr}")
+            raise PluginExecutionError(
+                f"Command exited with {result.returncode}: {result.stderr}"
             )
-            app_logger.info(f"[binary] Output:\n{result.stdout}")
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            app_logger.error(f"[binary] Execution failed: {e.stderr}")
-            raise
+
+        app_logger.info(f"[binary] Output:\n{result.stdout}")
+        return result.stdout
@@ -1,13 +1,88 @@
+"""
+URL Plugin 🌐
+
+Sends HTTP requests with a pooled client, connections (and TLS sessions)
+to a host are kept alive and reused by all url jobs of a run.
+
+Parameters:
+  - url: URL to request.
+  - method: HTTP method, defaults to GET.
+  - headers: Request headers.
+  - body: Request body.
+  - timeout: Timeout per request in seconds, defaults to 10. The plugin runs
+    in process, so the job `timeout` does not apply, only this one.
+  - retries: Retries per request, defaults to 3.
+  - pool_size: Connections kept alive per host, defaults to 10.
+  - stream: Stream the response to a file in the result directory of the
+    run instead of memory and return a ResultHandle, defaults to false.
+  - requests: List of requests (url, method, headers, body) which are sent
+    concurrently instead of a single url.
+  - concurrency: Requests of a batch in flight at once, defaults to pool_size.
+
+Returns:
+  - The response body as bytes, or a list of the bodies in batch mode.
+
+Example:
+  plugin: url
+  params:
+    requests:
+      - url: "https://api.example.com/items/1"
+      - url: "https://api.example.com/items/2"
+    concurrency: 8
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from taskcrafter.logger import app_logger
 from taskcrafter.models.plugin import PluginInterface
+from taskcrafter.models.result import RESULT_DIR_ENV, ResultHandle
+
+DEFAULT_POOL_SIZE = 10
+# hosts of which connections are kept
+NUM_POOLS = 50
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool_manager(pool_size: int = DEFAULT_POOL_SIZE):
+    """Returns the shared PoolManager for a pool size, created on first use."""
+    import urllib3
+
+    with _pools_lock:
+        if pool_size not in _pools:
+            _pools[pool_size] = urllib3.PoolManager(
+                num_pools=NUM_POOLS, maxsize=pool_size
+            )
+
+        return _pools[pool_size]
 
 
 class Plugin(PluginInterface):
     name = "URL"
-    description = "Opens a URL in the default web browser."
+    description = "Sends HTTP requests with a pooled client. 🌐"
+    # runs in a scheduler thread, so the pool is reused between jobs
+    in_process = True
 
     def run(self, params: dict):
-        import urllib3
+        pool_size = params.get("pool_size", DEFAULT_POOL_SIZE)
+        pool = get_pool_manager(pool_size)
+
+        requests = params.get("requests")
+        if requests is None:
+            return self.request(pool, params, stream=params.get("stream", False))
 
+        concurrency = params.get("concurrency", pool_size)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            responses = executor.map(
+                lambda request: self.request(pool, params | request), requests
+            )
+            return list(responses)
+
+    def request(self, pool, params: dict, stream: bool = False):
         url = params.get("url")
         method = params.get("method", "GET").upper()
         headers = params.get("headers", {})
@@ -18,17 +93,42 @@ class Plugin(PluginInterface):
         if not url:
             raise ValueError("URL is required.")
 
-        resp = urllib3.request(
+        resp = pool.request(
             method,
             url,
             headers=headers,
             body=body,
             timeout=timeout,
             retries=retries,
+            preload_content=not stream,
         )
-        if resp.status != 200:
-            raise RuntimeError(f"Failed to open URL: {resp.status} {resp.reason}")
+        try:
+            if resp.status != 200:
+                # an unread body keeps the connection from being reused
+                resp.drain_conn()
+                raise RuntimeError(f"Failed to open URL: {resp.status} {resp.reason}")
+
+            app_logger.debug(f"Opened URL: {url} - Status: {resp.status}")
+
+            if stream:
+                return self.stream_to_file(resp)
+
+            return resp.data
+        finally:
+            resp.release_conn()
+
+    def stream_to_file(self, resp) -> ResultHandle:
+        # next to the cache, so the file is moved into it instead of copied
+        directory = os.environ.get(RESULT_DIR_ENV)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        fd, path = tempfile.mkstemp(prefix=".result.", dir=directory)
+        size = 0
 
-        print(f"Opened URL: {url} - Status: {resp.status}")
+        with os.fdopen(fd, "wb") as f:
+            for chunk in resp.stream(STREAM_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
 
-        return resp.data
+        return ResultHandle(path=path, size=size, owned=True)
@@ -1,10 +1,16 @@
+from datetime import datetime
 from rich.tree import Tree
 from rich.table import Table
 from rich.console import Console
 from rich.text import Text
+from taskcrafter.models.cache import CacheRun
 from taskcrafter.models.job import Job, JobStatus
+from taskcrafter.models.plan import ExecutionPlan
+from taskcrafter.models.scheduler import Firing
+from taskcrafter.models.run_record import DurationStats, Regression, RunRecord
 from taskcrafter.models.hook import Hook
 from taskcrafter.models.plugin import PluginEntry
+from taskcrafter.profiler import AllocationEntry, ProfileEntry
 
 console = Console()
 
@@ -25,6 +31,10 @@ def rich_preview(jobs: list[Job], hooks: list[Hook] = []):
         if job.schedule:
             job_branch.add(f"Schedule: [blue]{job.schedule}[/]")
 
+        if job.trigger:
+            source = job.trigger.path or f"127.0.0.1:{job.trigger.port}"
+            job_branch.add(f"Trigger: [blue]{job.trigger.type.value}[/] {source}")
+
         if job.timeout:
             job_branch.add(f"Timeout: {job.timeout}s")
 
@@ -68,6 +78,10 @@ def result_table(jobs: list[Job]):
     table.add_column("Retries", style="bold")
     table.add_column("Stack", style="bold")
     table.add_column("Duration", style="bold")
+    table.add_column("CPU usr/sys", justify="right")
+    table.add_column("Max RSS", justify="right")
+    table.add_column("I/O r/w", justify="right")
+    table.add_column("Ctx sw vol/inv", justify="right")
 
     # sort by result.start_time
     jobs = sorted(jobs, key=lambda x: x.result.start_time)
@@ -78,9 +92,12 @@ def result_table(jobs: list[Job]):
                 status = Text(job.result.get_status().value, "red")
             case JobStatus.SUCCESS:
                 status = Text(job.result.get_status().value, "green")
+            case JobStatus.SKIPPED:
+                status = Text(job.result.get_status().value, "dim")
             case _:
                 status = Text("n/a", "yellow")
 
+        usage = job.result.usage
         table.add_row(
             str(job.id),
             job.name,
@@ -88,6 +105,10 @@ def result_table(jobs: list[Job]):
             str(job.result.retries),
             " > ".join(job.result.execution_stack),
             f"{job.result.get_elapsed_time():.3f}s",
+            f"{usage.user_time:.2f}/{usage.system_time:.2f}s",
+            f"{usage.max_rss / 1024 / 1024:.0f} MiB",
+            f"{usage.read_bytes / 1024:.0f}/{usage.write_bytes / 1024:.0f} KiB",
+            f"{usage.voluntary_switches}/{usage.involuntary_switches}",
         )
 
     console.print(table)
@@ -124,3 +145,244 @@ def plugin_info_preview(plugin: PluginEntry):
         docgen = plugin.docgen
 
     console.print(f"\n{docgen}")
+
+
+def profile_preview(
+    job_id: str,
+    functions: list[ProfileEntry] = None,
+    allocations: list[AllocationEntry] = None,
+):
+    console = Console()
+
+    if functions is not None:
+        table = Table(title=f"Top functions - {job_id}")
+
+        table.add_column("Function", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total", justify="right")
+        table.add_column("Cumulative", justify="right", style="bold")
+
+        for entry in functions:
+            table.add_row(
+                entry.location,
+                str(entry.calls),
+                f"{entry.total_time:.3f}s",
+                f"{entry.cumulative_time:.3f}s",
+            )
+
+        console.print(table)
+
+    if allocations is not None:
+        table = Table(title=f"Top allocations - {job_id}")
+
+        table.add_column("Location", style="cyan")
+        table.add_column("Size", justify="right", style="bold")
+        table.add_column("Count", justify="right")
+
+        for entry in allocations:
+            table.add_row(
+                entry.location, f"{entry.size / 1024:.1f} KiB", str(entry.count)
+            )
+
+        console.print(table)
+
+
+def cache_preview(runs: list[CacheRun], title: str = "Cached runs"):
+    console = Console()
+
+    table = Table(title=title)
+
+    table.add_column("Run", style="cyan")
+    table.add_column("Files", justify="right")
+    table.add_column("Size", justify="right", style="bold")
+    table.add_column("Modified")
+
+    for run in runs:
+        table.add_row(
+            run.run_id,
+            str(run.files),
+            f"{run.size / 1024 / 1024:.2f} MiB",
+            datetime.fromtimestamp(run.modified).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+    console.print(table)
+    console.print(
+        f"{len(runs)} runs, {sum(run.size for run in runs) / 1024 / 1024:.2f} MiB"
+    )
+
+
+def plan_preview(plan: ExecutionPlan, pool_size: int = None):
+    console = Console()
+
+    table = Table(title="Execution Plan")
+
+    table.add_column("Wave", justify="right", style="bold")
+    table.add_column("Job", style="cyan")
+    table.add_column("Width", justify="right")
+    table.add_column("Start", justify="right")
+    table.add_column("Duration", justify="right")
+    table.add_column("After")
+
+    critical_path = set(plan.critical_path)
+
+    for wave in plan.get_waves():
+        for step in wave:
+            job_label = step.job_id
+            if step.job_id in critical_path:
+                job_label = f"[bold red]{step.job_id}[/]"
+            if step.triggered:
+                job_label += " [dim](triggered)[/]"
+
+            duration = f"{step.duration:.3f}s"
+            if step.estimated:
+                duration = f"[dim]{duration}?[/]"
+
+            table.add_row(
+                str(step.wave + 1),
+                job_label,
+                str(step.width),
+                f"{step.start:.3f}s",
+                duration,
+                ", ".join(step.depends_on),
+            )
+
+    console.print(table)
+
+    max_width = plan.get_max_width()
+    console.print(f"Waves: [bold]{len(plan.get_waves())}[/]")
+    console.print(f"Max parallel width: [bold]{max_width}[/]")
+    console.print(
+        f"Critical path: [bold red]{' -> '.join(plan.critical_path) or '-'}[/]"
+    )
+    console.print(
+        f"Estimated makespan: [bold]{plan.makespan:.3f}s[/] "
+        f"(serial {plan.get_total_duration():.3f}s)"
+    )
+
+    if any(step.estimated for step in plan.steps):
+        console.print("[dim]? no recorded duration, the default is used[/]")
+    if plan.blocked:
+        console.print(
+            f"[yellow]Never run (disabled dependency): {', '.join(plan.blocked)}[/]"
+        )
+    if pool_size is not None and max_width > pool_size:
+        console.print(
+            f"[yellow]Max parallel width {max_width} exceeds the pool size "
+            f"{pool_size}, jobs will queue.[/]"
+        )
+
+
+def stats_preview(stats: list[DurationStats], by: str = "job"):
+    console = Console()
+
+    table = Table(title=f"Durations per {by}")
+
+    table.add_column(by.capitalize(), style="cyan")
+    table.add_column("Runs", justify="right")
+    table.add_column("Errors", justify="right", style="red")
+    table.add_column("Mean", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right", style="bold")
+    table.add_column("p99", justify="right")
+    table.add_column("Max", justify="right")
+
+    for entry in stats:
+        table.add_row(
+            entry.name,
+            str(entry.runs),
+            str(entry.errors),
+            f"{entry.mean:.3f}s",
+            f"{entry.p50:.3f}s",
+            f"{entry.p95:.3f}s",
+            f"{entry.p99:.3f}s",
+            f"{entry.max:.3f}s",
+        )
+
+    console.print(table)
+
+
+def slowest_preview(records: list[RunRecord]):
+    console = Console()
+
+    table = Table(title="Slowest runs")
+
+    table.add_column("Job", style="cyan")
+    table.add_column("Plugin")
+    table.add_column("Run")
+    table.add_column("Started")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Status")
+    table.add_column("Queue wait", justify="right")
+    table.add_column("Pull", justify="right")
+    table.add_column("Elapsed", justify="right", style="bold")
+    table.add_column("CPU", justify="right")
+    table.add_column("Max RSS", justify="right")
+    table.add_column("Output", justify="right")
+
+    for record in records:
+        table.add_row(
+            record.job_id,
+            record.plugin,
+            record.run_id,
+            datetime.fromtimestamp(record.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+            str(record.attempt),
+            Text(record.status, "green" if record.status == "success" else "red"),
+            f"{record.queue_wait:.3f}s",
+            f"{record.pull_time:.3f}s",
+            f"{record.elapsed:.3f}s",
+            f"{record.user_time + record.system_time:.3f}s",
+            f"{record.max_rss / 1024 / 1024:.1f} MiB",
+            f"{record.output_size / 1024:.1f} KiB",
+        )
+
+    console.print(table)
+
+
+def regression_preview(regressions: list[Regression], threshold: float):
+    console = Console()
+
+    if not regressions:
+        console.print(f"[green]No job is {threshold}x slower than its baseline.[/]")
+        return
+
+    table = Table(title="Regressions")
+
+    table.add_column("Job", style="cyan")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Recent", justify="right")
+    table.add_column("Slowdown", justify="right", style="bold red")
+
+    for regression in regressions:
+        table.add_row(
+            regression.job_id,
+            f"{regression.baseline:.3f}s",
+            f"{regression.recent:.3f}s",
+            f"{regression.get_ratio():.2f}x",
+        )
+
+    console.print(table)
+
+
+def schedule_preview(firings: list[Firing], max_jobs: int = 5):
+    console = Console()
+
+    table = Table(title="Upcoming firings")
+
+    table.add_column("Time", style="cyan")
+    table.add_column("Schedules")
+    table.add_column("Jobs", justify="right", style="bold")
+    table.add_column("Job IDs")
+
+    for firing in firings:
+        job_ids = ", ".join(job.id for job in firing.jobs[:max_jobs])
+        if len(firing.jobs) > max_jobs:
+            job_ids += f" (+{len(firing.jobs) - max_jobs})"
+
+        table.add_row(
+            firing.time.strftime("%Y-%m-%d %H:%M:%S %Z"),
+            "\n".join(firing.schedules),
+            str(len(firing.jobs)),
+            job_ids,
+        )
+
+    console.print(table)
@@ -0,0 +1,101 @@
+import cProfile
+import pstats
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+PROFILE_SUFFIX = ".prof"
+SNAPSHOT_SUFFIX = ".tracemalloc"
+
+
+@dataclass
+class ProfileEntry:
+    location: str
+    calls: int
+    total_time: float
+    cumulative_time: float
+
+
+@dataclass
+class AllocationEntry:
+    location: str
+    size: int
+    count: int
+
+
+def get_profile_file(path: Path, suffix: str) -> Path:
+    return path.parent / f"{path.name}{suffix}"
+
+
+def profile_modes(profile: bool | str) -> tuple[bool, bool]:
+    """Returns (cpu, memory) for a profile option: true, "cpu" or "memory"."""
+    if profile is True:
+        return True, True
+
+    return profile == "cpu", profile == "memory"
+
+
+def profile_call(func: Callable, args: tuple, path: Path, profile: bool | str = True):
+    """
+    Runs func(*args) with cProfile and/or tracemalloc enabled and writes
+    <path>.prof and <path>.tracemalloc.
+    """
+    cpu, memory = profile_modes(profile)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    profiler = cProfile.Profile() if cpu else None
+    if memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        return func(*args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(str(get_profile_file(path, SNAPSHOT_SUFFIX)))
+        if profiler is not None:
+            profiler.dump_stats(get_profile_file(path, PROFILE_SUFFIX))
+
+
+def top_functions(path: Path, limit: int = 20) -> list[ProfileEntry]:
+    stats = pstats.Stats(str(path))
+    entries = []
+
+    for (file, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        entries.append(
+            ProfileEntry(
+                location=f"{file}:{line}({function})",
+                calls=calls,
+                total_time=total,
+                cumulative_time=cumulative,
+            )
+        )
+
+    entries.sort(key=lambda entry: entry.cumulative_time, reverse=True)
+    return entries[:limit]
+
+
+def top_allocations(path: Path, limit: int = 20) -> list[AllocationEntry]:
+    # hide allocations of the profiling machinery itself
+    snapshot = tracemalloc.Snapshot.load(str(path)).filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+    )
+
+    return [
+        AllocationEntry(
+            location=str(stat.traceback),
+            size=stat.size,
+            count=stat.count,
+        )
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
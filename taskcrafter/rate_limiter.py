@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+from taskcrafter.logger import app_logger
+from taskcrafter.metrics import rate_limit_wait
+from taskcrafter.models.job import Job
+from taskcrafter.models.rate_limit import RateLimit
+
+
+class TokenBucket:
+    """Holds up to burst tokens and refills them at rate tokens per second."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def get_wait(self, now: float) -> float:
+        """Seconds until a token is available, 0 if there is one."""
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    Dispatches jobs to the worker pool once every rate limit which applies to
+    them has a token, so a throttled job never occupies a worker.
+
+    Jobs with the same limits wait in one queue and are dispatched in the
+    order they were submitted, a job only waits for jobs which compete for
+    the same tokens. One thread dispatches all queues and only wakes up when
+    the next token is due.
+
+    Jobs which run inline in a worker, e.g. on_success jobs, wait for their
+    tokens with acquire and queue up with the submitted ones.
+    """
+
+    def __init__(self, limits: dict[str, RateLimit] = None):
+        self.limits = limits or {}
+        self.buckets = {
+            name: TokenBucket(limit.rate, limit.burst)
+            for name, limit in self.limits.items()
+        }
+        self.queues: dict[tuple[str, ...], deque] = {}
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+        # waiting acquire calls, woken up on stop
+        self.waiters: set[threading.Event] = set()
+        # job which got its tokens when it was submitted, per worker thread
+        self.local = threading.local()
+
+    def get_limits(self, job: Job) -> tuple[str, ...]:
+        return tuple(
+            sorted(name for name, limit in self.limits.items() if limit.applies_to(job))
+        )
+
+    def get_pending(self) -> int:
+        with self.condition:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def submit(self, job: Job, dispatch: Callable[[], None]):
+        """Calls dispatch now, or from the dispatcher thread once tokens are free."""
+        names = self.get_limits(job)
+        if not names:
+            dispatch()
+            return
+
+        with self.condition:
+            if self.stopped:
+                app_logger.warning(f"Rate limiter is stopped, job {job.id} is dropped.")
+                return
+
+            self.queues.setdefault(names, deque()).append(
+                (job, dispatch, time.monotonic())
+            )
+            self.condition.notify()
+
+        self.start()
+
+    def acquire(self, job: Job) -> bool:
+        """
+        Blocks until every rate limit of a job has a token. Returns at once
+        for the job the calling worker was admitted with by submit, and False
+        if the limiter is stopped before the job got its tokens.
+        """
+        names = self.get_limits(job)
+        if not names or getattr(self.local, "job", None) is job:
+            return True
+
+        granted = threading.Event()
+        woken = threading.Event()
+
+        def grant():
+            granted.set()
+            woken.set()
+
+        with self.condition:
+            if self.stopped:
+                app_logger.warning(f"Rate limiter is stopped, job {job.id} is dropped.")
+                return False
+
+            self.queues.setdefault(names, deque()).append(
+                (job, grant, time.monotonic())
+            )
+            self.waiters.add(woken)
+            self.condition.notify()
+
+        self.start()
+        woken.wait()
+        with self.condition:
+            self.waiters.discard(woken)
+
+        if not granted.is_set():
+            app_logger.warning(f"Rate limiter is stopped, job {job.id} is dropped.")
+        return granted.is_set()
+
+    @contextmanager
+    def admitted(self, job: Job):
+        """Marks a job as holding its tokens while it runs in this thread."""
+        self.local.job = job
+        try:
+            yield
+        finally:
+            self.local.job = None
+
+    def take_ready(self, now: float) -> tuple[list, float]:
+        """
+        Takes tokens for every queued job which can run now. Returns the jobs
+        and the seconds until the next token is due, or None.
+        """
+        ready = []
+        wait = None
+
+        for names, queue in self.queues.items():
+            buckets = [self.buckets[name] for name in names]
+            while queue:
+                delay = max(bucket.get_wait(now) for bucket in buckets)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    break
+
+                for bucket in buckets:
+                    bucket.take()
+                ready.append((names, *queue.popleft()))
+
+        return ready, wait
+
+    def start(self):
+        with self.condition:
+            if self.thread is not None or self.stopped:
+                return
+
+            self.thread = threading.Thread(
+                target=self.run, name="taskcrafter-rate-limiter", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            pending = sum(len(queue) for queue in self.queues.values())
+            self.queues.clear()
+            for waiter in self.waiters:
+                waiter.set()
+            self.condition.notify()
+
+        if pending:
+            app_logger.warning(f"{pending} rate limited jobs were not dispatched.")
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+
+                now = time.monotonic()
+                ready, wait = self.take_ready(now)
+                if not ready:
+                    self.condition.wait(wait)
+                    continue
+
+            # dispatched outside of the lock, jobs can be submitted meanwhile
+            for names, job, dispatch, queued in ready:
+                rate_limit_wait.observe(now - queued, limit=",".join(names))
+                try:
+                    dispatch()
+                except Exception as e:
+                    app_logger.error(f"Dispatch of job {job.id} failed: {e}")
@@ -0,0 +1,285 @@
+import csv
+import json
+import sqlite3
+import statistics
+import threading
+from dataclasses import asdict, astuple, fields
+from pathlib import Path
+from typing import Iterator
+from taskcrafter.models.run_record import DurationStats, Regression, RunRecord
+
+RUN_STORE_FILE = "runs.db"
+# runs of which the median is the estimated duration of a job
+ESTIMATE_RUNS = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    plugin TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    queue_wait REAL NOT NULL,
+    elapsed REAL NOT NULL,
+    output_size INTEGER NOT NULL,
+    pull_time REAL NOT NULL DEFAULT 0,
+    user_time REAL NOT NULL DEFAULT 0,
+    system_time REAL NOT NULL DEFAULT 0,
+    max_rss INTEGER NOT NULL DEFAULT 0,
+    read_bytes INTEGER NOT NULL DEFAULT 0,
+    write_bytes INTEGER NOT NULL DEFAULT 0,
+    voluntary_switches INTEGER NOT NULL DEFAULT 0,
+    involuntary_switches INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS job_runs_job_started ON job_runs (job_id, started_at);
+CREATE INDEX IF NOT EXISTS job_runs_job_elapsed
+    ON job_runs (job_id, elapsed, started_at, status);
+CREATE INDEX IF NOT EXISTS job_runs_plugin_elapsed
+    ON job_runs (plugin, elapsed, started_at, status);
+CREATE INDEX IF NOT EXISTS job_runs_elapsed ON job_runs (elapsed);
+"""
+
+# the job_id indexes cover it, so jobs are found without reading records
+DISTINCT_JOBS = "SELECT DISTINCT job_id FROM job_runs"
+
+COLUMNS = [f.name for f in fields(RunRecord)]
+# columns added after the first version of the store
+MIGRATIONS = {
+    "pull_time": "REAL NOT NULL DEFAULT 0",
+    "user_time": "REAL NOT NULL DEFAULT 0",
+    "system_time": "REAL NOT NULL DEFAULT 0",
+    "max_rss": "INTEGER NOT NULL DEFAULT 0",
+    "read_bytes": "INTEGER NOT NULL DEFAULT 0",
+    "write_bytes": "INTEGER NOT NULL DEFAULT 0",
+    "voluntary_switches": "INTEGER NOT NULL DEFAULT 0",
+    "involuntary_switches": "INTEGER NOT NULL DEFAULT 0",
+}
+GROUPS = {"job": "job_id", "plugin": "plugin"}
+
+
+class RunStore:
+    """
+    Run records in a SQLite database in the cache directory, next to the run
+    namespaces, so prune never removes them.
+
+    Aggregations run in SQL over the indexes and only their results are
+    loaded, so the store stays fast with millions of records.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # jobs finish in scheduler threads, writes are serialized by the lock
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+            self.migrate()
+
+        return self.connection
+
+    def migrate(self):
+        existing = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(job_runs)")
+        ]
+        for column, definition in MIGRATIONS.items():
+            if column not in existing:
+                self.connection.execute(
+                    f"ALTER TABLE job_runs ADD COLUMN {column} {definition}"
+                )
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def record(self, records: list[RunRecord]):
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO job_runs ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [astuple(record) for record in records],
+                )
+
+    def _query(self, sql: str, params: list = []) -> list[tuple]:
+        with self.lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _filter(job_id: str = None, since: float = None) -> tuple[str, list]:
+        conditions, params = ["1 = 1"], []
+        if job_id is not None:
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+
+        return " AND ".join(conditions), params
+
+    def duration_stats(
+        self, by: str = "job", job_id: str = None, since: float = None
+    ) -> list[DurationStats]:
+        """
+        p50/p95/p99 (nearest rank) of the elapsed time per job or plugin,
+        slowest p95 first.
+        """
+        group = GROUPS[by]
+        where, params = self._filter(job_id, since)
+
+        rows = self._query(
+            f"SELECT {group}, COUNT(*), SUM(status = 'error'), AVG(elapsed), "
+            f"MAX(elapsed) FROM job_runs WHERE {where} GROUP BY {group}",
+            params,
+        )
+
+        def percentile(name: str, runs: int, percent: int) -> float:
+            # read at its rank from the index, the runs are never sorted
+            rank = max(1, -(-runs * percent // 100))
+            return self._query(
+                f"SELECT elapsed FROM job_runs WHERE {where} AND {group} = ? "
+                f"ORDER BY elapsed LIMIT 1 OFFSET ?",
+                params + [name, rank - 1],
+            )[0][0]
+
+        stats = [
+            DurationStats(
+                name=name,
+                runs=runs,
+                errors=errors,
+                mean=mean,
+                p50=percentile(name, runs, 50),
+                p95=percentile(name, runs, 95),
+                p99=percentile(name, runs, 99),
+                max=maximum,
+            )
+            for name, runs, errors, mean, maximum in rows
+        ]
+
+        return sorted(stats, key=lambda entry: entry.p95, reverse=True)
+
+    def slowest(
+        self, limit: int = 10, job_id: str = None, since: float = None
+    ) -> list[RunRecord]:
+        where, params = self._filter(job_id, since)
+        rows = self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM job_runs WHERE {where} "
+            f"ORDER BY elapsed DESC LIMIT ?",
+            params + [limit],
+        )
+
+        return [RunRecord(*row) for row in rows]
+
+    def _recent_durations(self, limit: int, job_id: str = None) -> dict:
+        """Elapsed times of the last successful runs per job, newest first."""
+        if job_id is not None:
+            job_ids = [job_id]
+        else:
+            job_ids = [row[0] for row in self._query(DISTINCT_JOBS)]
+
+        durations = {}
+        for job in job_ids:
+            rows = self._query(
+                "SELECT elapsed FROM job_runs WHERE job_id = ? AND status = 'success' "
+                "ORDER BY started_at DESC LIMIT ?",
+                [job, limit],
+            )
+            if rows:
+                durations[job] = [row[0] for row in rows]
+
+        return durations
+
+    def regressions(
+        self,
+        window: int = 5,
+        baseline: int = 50,
+        threshold: float = 1.5,
+        job_id: str = None,
+    ) -> list[Regression]:
+        """
+        Jobs whose median of the last `window` successful runs is at least
+        `threshold` times the median of the `baseline` runs before them.
+        """
+        result = []
+
+        for job, durations in self._recent_durations(window + baseline, job_id).items():
+            recent, previous = durations[:window], durations[window:]
+            # a baseline needs as many runs as the window to be meaningful
+            if len(recent) < window or len(previous) < window:
+                continue
+
+            regression = Regression(
+                job_id=job,
+                baseline=statistics.median(previous),
+                recent=statistics.median(recent),
+            )
+            if regression.get_ratio() >= threshold:
+                result.append(regression)
+
+        return sorted(result, key=lambda r: r.get_ratio(), reverse=True)
+
+    def estimates(self, limit: int = ESTIMATE_RUNS) -> dict[str, float]:
+        """Median duration of the last successful runs per job."""
+        return {
+            job_id: statistics.median(durations)
+            for job_id, durations in self._recent_durations(limit).items()
+        }
+
+    def iter_records(
+        self, job_id: str = None, since: float = None
+    ) -> Iterator[RunRecord]:
+        """All matching records in the order they were recorded, read in chunks."""
+        where, params = self._filter(job_id, since)
+
+        with self.lock:
+            self.connect()
+            # a separate connection, so a long export does not hold the lock
+            cursor = sqlite3.connect(self.path).execute(
+                f"SELECT {', '.join(COLUMNS)} FROM job_runs WHERE {where} "
+                f"ORDER BY id",
+                params,
+            )
+
+        try:
+            while rows := cursor.fetchmany(1000):
+                for row in rows:
+                    yield RunRecord(*row)
+        finally:
+            cursor.connection.close()
+
+    def export(self, path: Path, job_id: str = None, since: float = None) -> int:
+        """Writes records to a .csv or .json file and returns their count."""
+        path = Path(path)
+        if path.suffix not in [".csv", ".json"]:
+            raise ValueError(f"Unsupported export format {path.suffix}.")
+
+        records = self.iter_records(job_id, since)
+        count = 0
+
+        with path.open("w", newline="") as f:
+            if path.suffix == ".csv":
+                writer = csv.writer(f)
+                writer.writerow(COLUMNS)
+                for record in records:
+                    writer.writerow(asdict(record).values())
+                    count += 1
+            else:
+                # streamed, one record per line inside the array
+                f.write("[")
+                for record in records:
+                    f.write(",\n" if count else "\n")
+                    f.write(json.dumps(asdict(record)))
+                    count += 1
+                f.write("\n]\n")
+
+        return count
@@ -1,29 +1,165 @@
 import time
 import threading
+import concurrent.futures
 from datetime import datetime
+from apscheduler.executors.pool import BasePoolExecutor, ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.events import (
     EVENT_ALL,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
     JobExecutionEvent,
     JobSubmissionEvent,
     JobEvent,
 )
-from taskcrafter.exceptions.hook import HookNotFound
-from taskcrafter.exceptions.job import JobKillSignalError
+from taskcrafter.concurrency import AdaptiveConcurrency
+from taskcrafter.event_triggers import EventTriggerManager
+from taskcrafter.exceptions.job import JobKillSignalError, JobValidationError
 from taskcrafter.logger import app_logger
 from taskcrafter.job_loader import JobManager
 from taskcrafter.hook_loader import HookManager
+from taskcrafter.metrics import (
+    executor_queue_depth,
+    executor_running,
+    job_queue_wait,
+    jobs_in_progress,
+    scheduler_event_lag,
+)
+from taskcrafter.tracing import tracer
 from taskcrafter.models.hook import Hook, HookType
+from taskcrafter.models.job import Job, JobStatus
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.models.scheduler import ExecutorStats, Firing, SchedulerConfig
+from taskcrafter.rate_limiter import RateLimiter
+from taskcrafter.trigger_engine import TriggerEngine
+
+
+class TimedThreadPool(concurrent.futures.ThreadPoolExecutor):
+    """
+    Thread pool which records how long scheduler jobs wait for a worker.
+
+    With a rate limiter, jobs are only put into the pool once they got their
+    tokens, and with adaptive concurrency once they are within its limit.
+    The returned future completes with the future of the pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        rate_limiter: RateLimiter = None,
+        concurrency: AdaptiveConcurrency = None,
+    ):
+        super().__init__(max_workers)
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+
+    def submit(self, fn, job, *args, **kwargs):
+        # cron jobs are submitted as they are, other jobs are the first
+        # argument of a scheduler job
+        task = job if isinstance(job, Job) else (job.args or [None])[0]
+        if not isinstance(task, Job) or (
+            self.rate_limiter is None and self.concurrency is None
+        ):
+            return self.submit_timed(task, fn, job, *args, **kwargs)
+
+        future = concurrent.futures.Future()
+
+        def forward(pool_future: concurrent.futures.Future):
+            if self.concurrency is not None:
+                self.concurrency.release()
+
+            if pool_future.cancelled():
+                future.set_exception(concurrent.futures.CancelledError())
+            elif pool_future.exception() is not None:
+                future.set_exception(pool_future.exception())
+            else:
+                future.set_result(pool_future.result())
+
+        def admitted_fn(*args, **kwargs):
+            # the job got its tokens already, only inline jobs acquire them
+            if self.rate_limiter is None:
+                return fn(*args, **kwargs)
+            with self.rate_limiter.admitted(task):
+                return fn(*args, **kwargs)
+
+        def dispatch():
+            if future.set_running_or_notify_cancel():
+                pool_future = self.submit_timed(task, admitted_fn, job, *args, **kwargs)
+                pool_future.add_done_callback(forward)
+            elif self.concurrency is not None:
+                self.concurrency.release()
+
+        def admit():
+            if self.concurrency is not None:
+                self.concurrency.submit(dispatch)
+            else:
+                dispatch()
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.submit(task, admit)
+        else:
+            admit()
+        return future
+
+    def submit_timed(self, task: Job, fn, job, *args, **kwargs):
+        submitted = time.time()
+
+        def timed_fn(job, *args, **kwargs):
+            queue_wait = time.time() - submitted
+            job_queue_wait.observe(queue_wait, job=job.id)
+            if isinstance(task, Job):
+                task.result.queue_wait = queue_wait
+            return fn(job, *args, **kwargs)
+
+        return super().submit(timed_fn, job, *args, **kwargs)
+
+
+class TimedThreadPoolExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers=10, pool: TimedThreadPool = None):
+        BasePoolExecutor.__init__(self, pool or TimedThreadPool(int(max_workers)))
 
 
 class SchedulerManager:
-    def __init__(self, job_manager: JobManager, hook_manager: HookManager):
-        self.scheduler = BackgroundScheduler()
+    def __init__(
+        self,
+        job_manager: JobManager,
+        hook_manager: HookManager,
+        config: SchedulerConfig = None,
+        rate_limits: dict[str, RateLimit] = None,
+    ):
+        self.config = config or SchedulerConfig()
+        self.rate_limiter = RateLimiter(rate_limits)
+        self.concurrency = None
+        if self.config.adaptive is not None:
+            self.concurrency = AdaptiveConcurrency(
+                self.config.adaptive,
+                job_manager.feedback,
+                self.config.get_max_workers(),
+            )
+        # shared by the scheduler and the cron jobs of the trigger engine
+        self.pool = TimedThreadPool(
+            self.config.get_max_workers(), self.rate_limiter, self.concurrency
+        )
+        self.scheduler = BackgroundScheduler(
+            executors={"default": TimedThreadPoolExecutor(pool=self.pool)},
+            job_defaults=self.config.get_job_defaults(),
+        )
+        self.trigger_engine = TriggerEngine(on_fire=self.fire_cron_jobs)
+        self.event_triggers = EventTriggerManager(
+            on_fire=self.fire_event_job, on_stopped=self.stop_event_job
+        )
+        # running executions of jobs submitted to the pool, for max_instances
+        self.running: dict[str, int] = {}
         self.job_manager = job_manager
+        # jobs run inline by other jobs wait for the same tokens
+        self.job_manager.rate_limiter = self.rate_limiter
         self.hook_manager = hook_manager
-        self.executed_hooks: list[Hook] = []
+        self.executor_stats = ExecutorStats(pool_size=self.config.get_max_workers())
+        self._stats_lock = threading.Lock()
+        self.executed_hooks: set[HookType] = set()
+        self._hook_lock = threading.Lock()
         self._event = threading.Event()
 
     def start_scheduler(self):
@@ -36,11 +172,15 @@ class SchedulerManager:
 
         self.scheduler.add_listener(self.event_listener_job, EVENT_ALL)
         self.scheduler.start()
+        self.trigger_engine.start()
+        self.event_triggers.start()
 
         app_logger.debug("Scheduler started.")
 
         # check and execute BEFORE_ALL hook
         self.schedule_hook_jobs(HookType.BEFORE_ALL)
+        # every job may have been skipped, then no job finishes to stop it
+        self.stop_when_finished()
 
         # Add a shutdown hook to stop the scheduler when the application exits
         try:
@@ -50,13 +190,46 @@ class SchedulerManager:
             self.stop_scheduler()
             app_logger.debug("Scheduler stopped.")
 
+        self.trigger_engine.stop()
+        self.event_triggers.stop()
+        self.rate_limiter.stop()
+
+        stats = self.executor_stats
+        app_logger.info(
+            f"Executor stats: {stats.submitted} submitted, {stats.missed} missed, "
+            f"peak queue depth {stats.peak_queue_depth} (pool size {stats.pool_size})"
+        )
+
+    def update_executor_stats(self, event):
+        with self._stats_lock:
+            if isinstance(event, JobSubmissionEvent):
+                if event.code == EVENT_JOB_SUBMITTED:
+                    self.executor_stats.job_submitted()
+                    scheduler_event_lag.observe(
+                        max(0.0, time.time() - event.scheduled_run_times[0].timestamp())
+                    )
+            elif isinstance(event, JobExecutionEvent):
+                if event.code == EVENT_JOB_MISSED:
+                    self.executor_stats.missed += 1
+                else:
+                    self.executor_stats.job_completed()
+
+            executor_queue_depth.set(self.executor_stats.get_queue_depth())
+            executor_running.set(self.executor_stats.get_running())
+
+        app_logger.debug(
+            f"Executor queue depth: {self.executor_stats.get_queue_depth()}, "
+            f"running: {self.executor_stats.get_running()}"
+        )
+
     def event_listener_job(self, event):
         if isinstance(event, JobEvent):
             job_id = self.get_job_id_from_schedule_id(event.job_id)
+            self.update_executor_stats(event)
+
+        if isinstance(event, JobExecutionEvent):
+            jobs_in_progress.set(self.job_manager.get_in_progress())
 
-        if isinstance(event, JobSubmissionEvent):
-            self.schedule_hook_jobs(HookType.BEFORE_JOB, event)
-        elif isinstance(event, JobExecutionEvent):
             if event.exception:
                 if isinstance(event.exception, JobKillSignalError):
                     app_logger.warning(
@@ -65,7 +238,6 @@ class SchedulerManager:
                     self._event.set()
                     return
 
-                self.schedule_hook_jobs(HookType.ON_ERROR, event)
                 app_logger.error(
                     f"scheduler: {event.job_id} failed with exception: {event.exception}"
                 )
@@ -79,15 +251,111 @@ class SchedulerManager:
                 )
                 return
 
-            self.schedule_hook_jobs(HookType.AFTER_JOB, event)
+            self.stop_when_finished()
+
+    def stop_when_finished(self):
+        """Stops the scheduler once no job is left, after the AFTER_ALL hook."""
+        if self.trigger_engine.has_schedules() or self.event_triggers.has_triggers():
+            app_logger.debug(
+                "Cron or event triggered jobs are scheduled. "
+                "Scheduler wont be stopped."
+            )
+            return
 
-            if self.job_manager.get_in_progress() == 0:
-                hook_executed = self.schedule_hook_jobs(HookType.AFTER_ALL, event)
+        if self.job_manager.get_in_progress() == 0:
+            hook_executed = self.schedule_hook_jobs(HookType.AFTER_ALL)
 
-                # stop only when hook was executed or is None
-                if hook_executed is None:
-                    app_logger.info("No more jobs in progress.")
-                    self._event.set()
+            # stop only when hook was executed or is None
+            if hook_executed is None:
+                app_logger.info("No more jobs in progress.")
+                self._event.set()
+
+    def submit_job(self, job: Job, events: list = None) -> bool:
+        """
+        Submits a cron or event triggered job to the worker pool, unless it
+        is already running max_instances times.
+        """
+        max_instances = job.max_instances or self.config.max_instances
+
+        with self._stats_lock:
+            if self.running.get(job.id, 0) >= max_instances:
+                app_logger.warning(
+                    f"Job {job.id} is still running, skipping this execution."
+                )
+                return False
+
+            self.running[job.id] = self.running.get(job.id, 0) + 1
+            self.executor_stats.job_submitted()
+            executor_queue_depth.set(self.executor_stats.get_queue_depth())
+            executor_running.set(self.executor_stats.get_running())
+
+        future = self.pool.submit(self.run_job_with_hooks, job, events=events)
+        future.add_done_callback(lambda future: self.job_done(job, future))
+        return True
+
+    def job_done(self, job: Job, future: concurrent.futures.Future):
+        with self._stats_lock:
+            self.running[job.id] -= 1
+            self.executor_stats.job_completed()
+            executor_queue_depth.set(self.executor_stats.get_queue_depth())
+            executor_running.set(self.executor_stats.get_running())
+
+        jobs_in_progress.set(self.job_manager.get_in_progress())
+
+        exception = future.exception()
+        if isinstance(exception, JobKillSignalError):
+            app_logger.warning(f"Job {job.id} is exit job, scheduler will be stopped.")
+            self._event.set()
+        elif exception is not None:
+            app_logger.error(f"scheduler: {job.id} failed with exception: {exception}")
+
+    def fire_cron_jobs(self, firing: Firing):
+        """
+        Submits all jobs of a cron firing to the worker pool in one batch.
+
+        A job which is still running max_instances times, or whose firing is
+        later than its misfire_grace_time, is skipped until the next firing.
+        A coalescing job skips missed ticks when a later tick is due as well,
+        so it runs once for all of them.
+        """
+        lag = max(0.0, time.time() - firing.time.timestamp())
+        scheduler_event_lag.observe(lag)
+        app_logger.debug(
+            f"Firing {len(firing.jobs)} jobs of {', '.join(firing.schedules)}."
+        )
+
+        for job in firing.jobs:
+            coalesce = job.coalesce
+            if coalesce is None:
+                coalesce = self.config.coalesce
+            if coalesce and job.id in firing.superseded:
+                continue
+
+            grace = job.misfire_grace_time
+            if grace is None:
+                grace = self.config.misfire_grace_time
+
+            if lag > grace:
+                with self._stats_lock:
+                    self.executor_stats.missed += 1
+                app_logger.warning(f"Job {job.id} missed its run by {lag:.3f}s.")
+                continue
+
+            self.submit_job(job)
+
+    def fire_event_job(self, job: Job, events: list) -> bool:
+        app_logger.info(f"Job {job.id} is triggered by {len(events)} events.")
+        return self.submit_job(job, events=events)
+
+    def stop_event_job(self, job: Job):
+        """
+        The event source of a job stopped, a job which never ran failed, and
+        the run can finish without it.
+        """
+        if job.result.get_status() is None:
+            job.result.set_status(JobStatus.ERROR)
+
+        self.stop_when_finished()
 
     def get_job_id_from_schedule_id(self, schedule_id) -> str:
         # if schedule_id is "Hook(<hookType>)__<jobId>"
@@ -96,66 +364,68 @@ class SchedulerManager:
 
         return schedule_id
 
-    def schedule_hook_jobs(self, hookType: HookType, event=None):
-        # things can get messy here so:
-        # the hook can get executed if:
-        # - current event job isnt hook job
-        # - hookType before_all or hookType after_all can get executed only once
-        # - all other hookTypes can get executed several times
-        try:
-            hook = self.hook_manager.hook_get_by_type(hookType) or None
+    def run_job_with_hooks(
+        self,
+        job: Job,
+        execution_stack: list[str] = [],
+        force: bool = False,
+        events: list = None,
+    ):
+        """
+        Runs a job together with its per-job hooks.
 
-            # before_all and after_all dont have any parent.
-            if (
-                not hookType == HookType.BEFORE_ALL
-                and not hookType == HookType.AFTER_ALL
-            ):
-                hook.parent_job = event.job_id
+        before_job, on_error and after_job hooks are pre/post stages of the
+        job itself and run inline in the same worker.
+        """
+        with tracer.span("dispatch", job=job.id):
+            self.hook_manager.run_hook(HookType.BEFORE_JOB, job.id)
 
-            if hook is None:
-                app_logger.debug(f"Hook {hookType} does not exist.")
-                return None
-            elif hook.is_hook_job():
-                app_logger.debug(
-                    f"Job {event.job_id} is hook job. Hook {hookType} will not be executed."
+            try:
+                result = self.job_manager.run_job(
+                    job, execution_stack, force=force, events=events
                 )
+            except JobKillSignalError:
+                raise
+            except Exception:
+                self.hook_manager.run_hook(HookType.ON_ERROR, job.id)
+                self.hook_manager.run_hook(HookType.AFTER_JOB, job.id)
+                raise
+
+            self.hook_manager.run_hook(HookType.AFTER_JOB, job.id)
+
+        return result
+
+    def schedule_hook_jobs(self, hookType: HookType):
+        # before_all and after_all hooks get executed only once per run,
+        # all per-job hooks are executed inline by run_job_with_hooks
+        with self._hook_lock:
+            if hookType in self.executed_hooks:
+                app_logger.debug(f"Hook already executed: {hookType}")
                 return None
-            elif hook in self.executed_hooks and hook.type in [
-                HookType.BEFORE_ALL,
-                HookType.AFTER_ALL,
-            ]:
-                app_logger.debug(f"Hook already executed: {hook.type}")
+
+            if not self.hook_manager.has_hook(hookType):
+                app_logger.debug(f"Hook {hookType} does not exist.")
                 return None
 
-            self.executed_hooks.append(hook)
+            hook = self.hook_manager.hook_get_by_type(hookType)
+            self.executed_hooks.add(hookType)
 
-        except HookNotFound as e:
-            app_logger.debug(e)
-            return None
+        for job in hook.jobs:
+            # enable it
+            job.enabled = True
+            # add job to stack
+            self.job_manager.add_job_to_stack(job)
 
-        try:
-            for job in hook.jobs:
-                # enable it
-                job.enabled = True
-                # add job to stack
-                self.job_manager.add_job_to_stack(job)
-
-                # if no event.job_id, then also no parent
-                parent_str = ""
-                if hook.parent_job is not None:
-                    parent_str = f";parent={hook.parent_job}"
-
-                schedule_job_id = f"Hook({hookType.value}{parent_str})__{job.id}"
-
-                self.schedule_job(
-                    job,
-                    force=True,
-                    hook=hook,
-                    schedule_job_id=schedule_job_id,
-                )
-            return hook
-        except ValueError:
-            pass
+            schedule_job_id = f"Hook({hookType.value})__{job.id}"
+
+            self.schedule_job(
+                job,
+                force=True,
+                hook=hook,
+                schedule_job_id=schedule_job_id,
+            )
+
+        return hook
 
     def schedule_job(self, job, schedule_job_id=None, hook: Hook = None, force=False):
         cron_schedule = job.schedule
@@ -168,17 +438,56 @@ class SchedulerManager:
             app_logger.debug(f"Job {job_id} is disabled and won't be executed.")
             return
 
+        if job.result.get_status() == JobStatus.SKIPPED and not force:
+            app_logger.debug(f"Job {job_id} is skipped and won't be scheduled.")
+            return
+
+        # event triggered jobs only run on their events
+        if job.trigger is not None and hook is None:
+            try:
+                self.event_triggers.add_job(job)
+            except JobValidationError as e:
+                app_logger.error(str(e))
+                job.result.set_status(JobStatus.ERROR)
+            return
+
+        # cron jobs are fired by the trigger engine, hooks by APScheduler
+        if cron_schedule and hook is None:
+            self.trigger_engine.add_job(job)
+            app_logger.debug(f"Scheduled job {job_id} with cron {cron_schedule}")
+            return
+
         if not cron_schedule:
             trigger = DateTrigger(datetime.now())
         else:
             trigger = CronTrigger.from_crontab(cron_schedule)
 
+        # hook jobs never trigger per-job hooks themselves
+        func = self.run_job_with_hooks
         execution_stack = []
         if hook is not None:
+            func = self.job_manager.run_job
             execution_stack = [schedule_job_id]
 
+        # per-job executor settings override the scheduler job_defaults
+        job_options = {
+            key: value
+            for key, value in {
+                "max_instances": job.max_instances,
+                "misfire_grace_time": job.misfire_grace_time,
+                "coalesce": job.coalesce,
+            }.items()
+            if value is not None
+        }
+        # a job which waits for tokens or a slot would be missed after the
+        # grace time
+        if not cron_schedule and (
+            self.concurrency is not None or self.rate_limiter.get_limits(job)
+        ):
+            job_options.setdefault("misfire_grace_time", None)
+
         self.scheduler.add_job(
-            self.job_manager.run_job,
+            func,
             trigger=trigger,
             args=[job],
             kwargs={
@@ -186,6 +495,7 @@ class SchedulerManager:
                 "execution_stack": execution_stack,
             },
             id=job_id,
+            **job_options,
         )
 
         app_logger.info(
@@ -196,6 +506,10 @@ class SchedulerManager:
         """
         Stop the APScheduler.
         """
+        self.trigger_engine.stop()
+        self.event_triggers.stop()
+        self.rate_limiter.stop()
+
         if self.scheduler.running:
             self.scheduler.shutdown(wait=False)
             self.scheduler = None
@@ -0,0 +1,115 @@
+import multiprocessing
+from collections.abc import Iterator
+from dataclasses import dataclass
+from queue import Full
+from taskcrafter.exceptions.plugin import PluginExecutionError
+
+# chunks buffered between two jobs before the upstream job blocks
+STREAM_BUFFER = 64
+# seconds between checks whether the downstream job stopped reading
+STREAM_POLL_INTERVAL = 0.5
+# reserved param through which a python plugin reads its stream
+STREAM_PARAM = "_stream"
+
+
+@dataclass
+class StreamEnd:
+    error: str = None
+
+
+class StreamClosedError(PluginExecutionError):
+    pass
+
+
+class StreamPipe:
+    """
+    Bounded queue between a job and the job which streams from it.
+
+    put() blocks while the queue is full, so a fast upstream job is slowed
+    down to the pace of the downstream job and memory stays constant. The
+    queue is a multiprocessing queue, so both ends can be plugin processes.
+    Iterating the pipe yields chunks until the upstream job closes it.
+    """
+
+    def __init__(self, maxsize: int = STREAM_BUFFER):
+        self.queue = multiprocessing.Queue(maxsize)
+        # set when the downstream job stopped reading, e.g. it failed
+        self.reader_done = multiprocessing.Event()
+        self.closed = False
+
+    def put(self, chunk):
+        while True:
+            if self.reader_done.is_set():
+                raise StreamClosedError("Downstream job stopped reading the stream.")
+            try:
+                self.queue.put(chunk, timeout=STREAM_POLL_INTERVAL)
+                return
+            except Full:
+                continue
+
+    def close(self, error: str = None):
+        """Ends the stream, only the first call of the writing side counts."""
+        if self.closed:
+            return
+
+        self.closed = True
+        try:
+            self.put(StreamEnd(error))
+        except StreamClosedError:
+            pass
+
+    def __iter__(self):
+        while True:
+            chunk = self.queue.get()
+            if isinstance(chunk, StreamEnd):
+                if chunk.error is not None:
+                    raise PluginExecutionError(f"Upstream job failed: {chunk.error}")
+                return
+            yield chunk
+
+
+def strip_streams(result):
+    """
+    Removes pipes from a dict result, e.g. of a plugin which returns its
+    params. A pipe can not be pickled or cached, it is not part of a result.
+    """
+    if isinstance(result, dict):
+        return {
+            key: value
+            for key, value in result.items()
+            if not isinstance(value, StreamPipe)
+        }
+
+    return result
+
+
+def feed_streams(result, streams: list[StreamPipe]):
+    """
+    Puts a result on the streams and returns the result of the job.
+
+    A generator or iterator is streamed chunk by chunk and the job result
+    is its return value, so chunks are never collected. Any other value is
+    put on the streams as one chunk. Without streams, the chunks of an
+    iterator are the result.
+    """
+    if not streams:
+        return list(result) if isinstance(result, Iterator) else result
+
+    if not isinstance(result, Iterator):
+        for stream in streams:
+            stream.put(result)
+        return result
+
+    while True:
+        try:
+            chunk = next(result)
+        except StopIteration as stop:
+            return stop.value
+
+        for stream in streams:
+            stream.put(chunk)
+
+
+def close_streams(streams: list[StreamPipe], error: str = None):
+    for stream in streams:
+        stream.close(error)
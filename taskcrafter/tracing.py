@@ -0,0 +1,183 @@
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from taskcrafter.logger import app_logger
+
+# OTLP status codes and span kinds
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+SPAN_KIND_INTERNAL = 1
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    parent_id: str = None
+    start_time: int = field(default_factory=time.time_ns)
+    end_time: int = None
+    attributes: dict = field(default_factory=dict)
+    error: str = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_time = time.time_ns()
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or self.start_time),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": STATUS_CODE_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """
+    Records spans of a run and exports them as OTLP-JSON.
+
+    Spans nest per thread, so a job started from within another job (e.g.
+    on_success or depends_on) becomes a child of it, following the
+    execution stack. A thread started for a job, e.g. a partition, continues
+    the span of its job with attach(). When tracing is disabled, span() is a
+    no-op.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_id: str = None
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self):
+        self.enabled = True
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+
+    def _stack(self) -> list[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+
+        return self._local.stack
+
+    def current_span(self) -> Span:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def set_attribute(self, key: str, value):
+        """Sets an attribute on the current span, if any."""
+        span = self.current_span()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            yield None
+            return
+
+        parent = self.current_span()
+        span = Span(
+            name=name,
+            trace_id=self.trace_id,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{e.__class__.__name__}: {e}"
+            raise
+        finally:
+            span.end()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    @contextmanager
+    def attach(self, span: Span):
+        """
+        Makes a span of another thread the current span of this one, spans
+        started meanwhile become its children.
+        """
+        if span is None:
+            yield
+            return
+
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def to_otlp(self) -> dict:
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": "taskcrafter"},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [{"scope": {"name": "taskcrafter"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, path: str):
+        """Writes all recorded spans to an OTLP-JSON file."""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(), f)
+
+        app_logger.info(f"Exported {len(self.spans)} spans to {path}")
+
+
+tracer = Tracer()
@@ -0,0 +1,194 @@
+import heapq
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+from apscheduler.triggers.cron import CronTrigger
+from taskcrafter.logger import app_logger
+from taskcrafter.models.job import Job
+from taskcrafter.models.scheduler import Firing
+
+
+@dataclass
+class CronCohort:
+    """All jobs with the same cron expression, they always fire together."""
+
+    expression: str
+    trigger: CronTrigger
+    jobs: list[Job] = field(default_factory=list)
+    next_fire: datetime = None
+
+
+def normalize_expression(expression: str) -> str:
+    return " ".join(expression.split())
+
+
+class TriggerEngine:
+    """
+    Fires cron jobs from a min-heap of next fire times.
+
+    Jobs are grouped into one cohort per distinct cron expression, so only
+    one trigger is evaluated per expression and tick, however many jobs
+    share it. Cohorts which are due at the same time are fired as a single
+    batch. A wakeup happens only when the earliest cohort is due.
+    """
+
+    def __init__(self, on_fire: Callable[[Firing], None] = None, timezone=None):
+        self.on_fire = on_fire
+        # local timezone by default
+        self.timezone = timezone
+        self.cohorts: dict[str, CronCohort] = {}
+        # (timestamp, expression), the expression is unique per entry
+        self.heap: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_job(self, job: Job, now: datetime = None):
+        expression = normalize_expression(job.schedule)
+
+        with self._lock:
+            cohort = self.cohorts.get(expression)
+            if cohort is None:
+                trigger = CronTrigger.from_crontab(expression, self.timezone)
+                now = now or datetime.now(trigger.timezone)
+                cohort = CronCohort(
+                    expression=expression,
+                    trigger=trigger,
+                    next_fire=trigger.get_next_fire_time(None, now),
+                )
+                self.cohorts[expression] = cohort
+                if cohort.next_fire is not None:
+                    heapq.heappush(
+                        self.heap, (cohort.next_fire.timestamp(), expression)
+                    )
+
+            cohort.jobs.append(job)
+
+        self._wakeup.set()
+
+    def has_schedules(self) -> bool:
+        return bool(self.heap)
+
+    def get_job_count(self) -> int:
+        return sum(len(cohort.jobs) for cohort in self.cohorts.values())
+
+    def pop_due(self, now: float) -> Firing:
+        """
+        Removes the cohorts of the earliest due tick and pushes their next
+        fire time. Missed ticks are fired one by one, the jobs decide with
+        coalesce and misfire_grace_time which of them run.
+        """
+        firing = None
+
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                timestamp, expression = self.heap[0]
+                if firing is not None and timestamp != firing.time.timestamp():
+                    break
+
+                heapq.heappop(self.heap)
+                cohort = self.cohorts[expression]
+
+                if firing is None:
+                    firing = Firing(time=cohort.next_fire)
+                firing.schedules.append(expression)
+                firing.jobs.extend(cohort.jobs)
+
+                cohort.next_fire = cohort.trigger.get_next_fire_time(
+                    None, cohort.next_fire + timedelta(microseconds=1)
+                )
+                if cohort.next_fire is None:
+                    continue
+
+                if cohort.next_fire.timestamp() <= now:
+                    firing.superseded.update(job.id for job in cohort.jobs)
+                heapq.heappush(self.heap, (cohort.next_fire.timestamp(), expression))
+
+        return firing
+
+    def forecast(self, count: int) -> list[Firing]:
+        """
+        The next count firings, without changing the engine. Only the cohorts
+        which fire are advanced, so the cost depends on count, not on the
+        number of jobs.
+        """
+        with self._lock:
+            heap = list(self.heap)
+            next_fires = {
+                expression: cohort.next_fire
+                for expression, cohort in self.cohorts.items()
+            }
+
+        firings: list[Firing] = []
+        while heap and len(firings) < count:
+            timestamp, expression = heapq.heappop(heap)
+            cohort = self.cohorts[expression]
+            fire_time = next_fires[expression]
+
+            if firings and firings[-1].time.timestamp() == timestamp:
+                firing = firings[-1]
+            else:
+                firing = Firing(time=fire_time)
+                firings.append(firing)
+            firing.schedules.append(expression)
+            firing.jobs.extend(cohort.jobs)
+
+            next_fires[expression] = cohort.trigger.get_next_fire_time(
+                fire_time, fire_time
+            )
+            if next_fires[expression] is not None:
+                heapq.heappush(heap, (next_fires[expression].timestamp(), expression))
+
+        # the last firing may miss cohorts which fire at the same time
+        while heap and firings and heap[0][0] == firings[-1].time.timestamp():
+            _, expression = heapq.heappop(heap)
+            firings[-1].schedules.append(expression)
+            firings[-1].jobs.extend(self.cohorts[expression].jobs)
+
+        return firings
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="taskcrafter-triggers", daemon=True
+        )
+        self._thread.start()
+
+        if self.cohorts:
+            app_logger.info(
+                f"Trigger engine started with {len(self.cohorts)} cron schedules "
+                f"for {self.get_job_count()} jobs."
+            )
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                delay = self.heap[0][0] - time.time() if self.heap else None
+
+            if delay is None or delay > 0:
+                # sleeps until the earliest cohort is due or a job is added
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            firing = self.pop_due(time.time())
+            if firing is None or self.on_fire is None:
+                continue
+
+            try:
+                self.on_fire(firing)
+            except Exception as e:
+                app_logger.error(f"Firing of {', '.join(firing.schedules)} failed: {e}")
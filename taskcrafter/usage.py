@@ -0,0 +1,56 @@
+import os
+import resource
+import subprocess
+import time
+from taskcrafter.models.job import ResourceUsage
+
+# seconds between checks of a process which is waited for with a timeout
+WAIT_INTERVAL = 0.01
+
+
+def get_process_usage() -> ResourceUsage:
+    """
+    Usage of the current process and the children it waited for, e.g. a
+    plugin process at its end.
+    """
+    return ResourceUsage.from_rusage(
+        resource.getrusage(resource.RUSAGE_SELF)
+    ) + ResourceUsage.from_rusage(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+
+def get_thread_usage() -> ResourceUsage:
+    """
+    Usage of the current thread, for plugins which run in a scheduler
+    thread. The max RSS is only known per process and left out.
+    """
+    if not hasattr(resource, "RUSAGE_THREAD"):
+        return ResourceUsage()
+
+    usage = ResourceUsage.from_rusage(resource.getrusage(resource.RUSAGE_THREAD))
+    usage.max_rss = 0
+    return usage
+
+
+def wait_process(
+    process: subprocess.Popen, timeout: float = None
+) -> tuple[int, ResourceUsage]:
+    """
+    Reaps a process with wait4 and returns its exit code and usage, which
+    Popen.wait does not return. Raises subprocess.TimeoutExpired.
+    """
+    if not hasattr(os, "wait4"):
+        return process.wait(timeout), ResourceUsage()
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    while True:
+        flags = os.WNOHANG if deadline is not None else 0
+        pid, status, rusage = os.wait4(process.pid, flags)
+        if pid:
+            # Popen must not wait for the reaped process again
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, ResourceUsage.from_rusage(rusage)
+
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(process.args, timeout)
+        time.sleep(WAIT_INTERVAL)
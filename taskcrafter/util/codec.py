@@ -0,0 +1,125 @@
+import json
+import zlib
+from dataclasses import asdict, dataclass
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# encoded values from this size on are compressed
+COMPRESS_THRESHOLD = 64 * 1024
+
+
+@dataclass
+class ResultMeta:
+    """Describes how a cached output is stored, written next to the output."""
+
+    codec: str = "text"
+    compression: str = None
+    size: int = 0
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, content: str) -> "ResultMeta":
+        return cls(**json.loads(content))
+
+
+def get_compression() -> str:
+    """The best available compression, zstd and lz4 are optional."""
+    if zstandard is not None:
+        return "zstd"
+    if lz4 is not None:
+        return "lz4"
+
+    return "zlib"
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    if compression == "lz4":
+        return lz4.frame.compress(data)
+    if compression == "zlib":
+        return zlib.compress(data, 1)
+
+    return data
+
+
+def decompress(data: bytes, compression: str = None) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if compression == "lz4":
+        return lz4.frame.decompress(data)
+    if compression == "zlib":
+        return zlib.decompress(data)
+
+    return data
+
+
+def encode(value) -> tuple[bytes, ResultMeta]:
+    """
+    Encodes a result with the codec of its type: str as text, bytes as raw,
+    anything else as msgpack (if installed) or JSON. Values which are not
+    serializable are stored as text. Large values are compressed, except
+    raw bytes, which stay mappable by a ResultHandle.
+    """
+    if isinstance(value, str):
+        codec, data = "text", value.encode()
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        codec, data = "raw", bytes(value)
+    else:
+        try:
+            if msgpack is not None:
+                codec, data = "msgpack", msgpack.packb(value)
+            else:
+                codec, data = "json", json.dumps(value).encode()
+        except (TypeError, ValueError):
+            codec, data = "text", str(value).encode()
+
+    meta = ResultMeta(codec=codec, size=len(data))
+    if codec != "raw" and len(data) >= COMPRESS_THRESHOLD:
+        meta.compression = get_compression()
+        data = compress(data, meta.compression)
+
+    return data, meta
+
+
+def decode(data: bytes, meta: ResultMeta):
+    data = decompress(data, meta.compression)
+
+    if meta.codec == "raw":
+        return data
+    if meta.codec == "json":
+        return json.loads(data)
+    if meta.codec == "msgpack":
+        if msgpack is None:
+            raise ImportError("msgpack is required to read this result")
+        return msgpack.unpackb(data)
+
+    return data.decode(errors="replace")
+
+
+def to_text(value) -> str:
+    """Formats a decoded result for substitution into a string."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode(errors="replace")
+
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return str(value)
@@ -4,10 +4,12 @@ from jsonschema import ValidationError, validate
 from taskcrafter.exceptions.hook import HookValidationError
 from taskcrafter.exceptions.job import JobValidationError
 from taskcrafter.exceptions.yaml import InvalidSchemaError
+from taskcrafter.condition import get_condition
 from taskcrafter.plugin_loader import plugin_lookup
 from taskcrafter.logger import app_logger
-from taskcrafter.models.job import Job
+from taskcrafter.models.job import Job, TriggerType
 from taskcrafter.models.hook import Hook, HookType
+from taskcrafter.models.rate_limit import RateLimit
 from typing import List, Dict
 
 
@@ -35,12 +37,22 @@ def _validate_job_plugin_and_params(job: Job):
         )
 
     if job.container is not None:
+        for option in ["foreach", "stream_from", "partitions"]:
+            if getattr(job, option) is not None:
+                raise JobValidationError(
+                    f"Job '{job.id}' uses {option}, which is only supported for plugins."
+                )
         return
 
     plugin = plugin_lookup(job.plugin)
     if not plugin:
         raise JobValidationError(f"Plugin '{job.plugin}' in job '{job.id}' not found.")
 
+    if job.partitions is not None and job.foreach is not None:
+        raise JobValidationError(
+            f"Job '{job.id}' uses foreach and partitions, only one is supported."
+        )
+
     for key, value in job.input.items():
         if value.startswith("result:"):
             parts = value.split(":")
@@ -51,7 +63,55 @@ def _validate_job_plugin_and_params(job: Job):
             # No validation yet here; needs full job output context
 
 
-def validate_jobs(jobs: List[Job], show_report: bool = False):
+def _validate_job_trigger(job: Job):
+    trigger = job.trigger
+    if trigger is None:
+        return
+
+    if job.schedule or job.stream_from:
+        raise JobValidationError(
+            f"Job '{job.id}' has a trigger, it can not have a schedule or stream_from."
+        )
+
+    if trigger.type == TriggerType.WEBHOOK:
+        if not trigger.port:
+            raise JobValidationError(f"Webhook trigger of job '{job.id}' needs a port.")
+    elif not trigger.path:
+        raise JobValidationError(
+            f"{trigger.type.value} trigger of job '{job.id}' needs a path."
+        )
+
+
+def _validate_job_rate_limit(job: Job, rate_limits: Dict[str, RateLimit]):
+    for name in job.rate_limit:
+        if name not in rate_limits:
+            raise JobValidationError(
+                f"Job '{job.id}' uses an unknown rate limit: {name}"
+            )
+
+
+def _validate_job_when(job: Job):
+    if not job.when:
+        return
+
+    if job.stream_from:
+        raise JobValidationError(
+            f"Job '{job.id}' streams from a job, it can not have a condition."
+        )
+
+    for job_id in get_condition(job.when).results:
+        if job_id not in job.depends_on:
+            raise JobValidationError(
+                f"Job '{job.id}' reads the result of '{job_id}' in its condition, "
+                f"it has to depend on it."
+            )
+
+
+def validate_jobs(
+    jobs: List[Job],
+    rate_limits: Dict[str, RateLimit] = {},
+    show_report: bool = False,
+):
     ids = set()
     id_to_job: Dict[str, Job] = {}
 
@@ -73,10 +133,28 @@ def validate_jobs(jobs: List[Job], show_report: bool = False):
                     f"Job '{job.id}' has invalid reference in '{field}': {ref_id}"
                 )
 
+    def check_stream(job: Job):
+        streams = [job.id]
+        while job.stream_from is not None:
+            if job.stream_from not in ids:
+                raise JobValidationError(
+                    f"Job '{streams[0]}' streams from an unknown job: {job.stream_from}"
+                )
+            if job.stream_from in streams:
+                raise JobValidationError(
+                    f"Circular stream detected involving job '{job.stream_from}'"
+                )
+            streams.append(job.stream_from)
+            job = id_to_job[job.stream_from]
+
     for job in jobs:
         for field in ["depends_on", "on_success", "on_failure", "on_finish"]:
             check_refs(job, field)
 
+        check_stream(job)
+        _validate_job_trigger(job)
+        _validate_job_rate_limit(job, rate_limits)
+        _validate_job_when(job)
         _validate_job_plugin_and_params(job)
 
     # Detect circular dependencies using DFS for depends_on
@@ -1,9 +1,12 @@
 import yaml
 from taskcrafter.exceptions.yaml import YamlParseError
 
+# the libyaml loader is much faster on large generated job files
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 def get_yaml_from_string(yaml_string: str) -> dict:
     try:
-        return yaml.safe_load(yaml_string)
+        return yaml.load(yaml_string, Loader=SafeLoader)
     except yaml.YAMLError as e:
         raise YamlParseError(f"Error parsing YAML string: {e}")
@@ -13,6 +13,8 @@ TEMPLATE_MAP: list[WizardEntry] = [
     WizardEntry("external_plugin", "Using external plugin"),
     WizardEntry("desktop_example", "Desktop notifications example"),
     WizardEntry("inputs_outputs", "Using inputs/outputs"),
+    WizardEntry("foreach", "Using foreach (map) jobs"),
+    WizardEntry("streaming", "Streaming between jobs"),
     WizardEntry("test_build_and_deploy", "Test build and deploy"),
     WizardEntry("everything", "Everything together"),
     WizardEntry("empty_file", "Empty file"),
@@ -0,0 +1,67 @@
+import threading
+from taskcrafter.batcher import PluginBatcher
+from taskcrafter.exceptions.plugin import PluginExecutionError
+from taskcrafter.models.job import Job, ResourceUsage
+
+
+def run_jobs(batcher: PluginBatcher, jobs: list[Job]) -> dict:
+    results = {}
+
+    def run(job: Job):
+        try:
+            results[job.id] = batcher.run(job, {"id": job.id})
+        except Exception as e:
+            results[job.id] = e
+
+    threads = [threading.Thread(target=run, args=(job,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_batcher_groups_jobs():
+    calls = []
+
+    def execute(name: str, batch: list[dict], timeout: int):
+        calls.append((name, [params["id"] for params in batch]))
+        results = [
+            PluginExecutionError("b failed") if params["id"] == "b" else params["id"]
+            for params in batch
+        ]
+        return results, ResourceUsage(user_time=len(batch), max_rss=100)
+
+    batcher = PluginBatcher(execute, window=1, size=3)
+    jobs = [Job(id=job_id, name=job_id, plugin="db") for job_id in "abc"]
+    results = run_jobs(batcher, jobs)
+
+    # the batch is full before the window ends
+    assert len(calls) == 1 and sorted(calls[0][1]) == ["a", "b", "c"]
+    assert results["a"][0] == "a" and results["c"][0] == "c"
+    assert isinstance(results["b"][0], PluginExecutionError)
+    # every job gets its share of the usage
+    assert results["a"][1] == ResourceUsage(user_time=1, max_rss=100)
+
+
+def test_batcher_separates_plugins_and_errors():
+    calls = []
+
+    def execute(name: str, batch: list[dict], timeout: int):
+        calls.append(name)
+        if name == "broken":
+            raise PluginExecutionError("process died")
+        return [params["id"] for params in batch], ResourceUsage()
+
+    batcher = PluginBatcher(execute, window=0.05, size=10)
+    jobs = [
+        Job(id="a", name="A", plugin="db"),
+        Job(id="b", name="B", plugin="broken"),
+    ]
+    results = run_jobs(batcher, jobs)
+
+    assert sorted(calls) == ["broken", "db"]
+    assert results["a"][0] == "a"
+    # an error of the whole batch fails every job of it
+    assert isinstance(results["b"], PluginExecutionError)
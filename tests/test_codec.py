@@ -0,0 +1,35 @@
+from taskcrafter.util.codec import (
+    COMPRESS_THRESHOLD,
+    ResultMeta,
+    decode,
+    encode,
+    to_text,
+)
+
+
+def test_encode_keeps_type():
+    for value in ["text", b"\x00\xff", {"a": [1, 2.5, None]}, [1, "two"], 3, True]:
+        data, meta = encode(value)
+        assert decode(data, ResultMeta.from_json(meta.to_json())) == value
+
+    data, meta = encode(object())
+    assert meta.codec == "text"
+
+
+def test_encode_compresses_large_values():
+    value = {"rows": ["a,b,c"] * COMPRESS_THRESHOLD}
+    data, meta = encode(value)
+
+    assert meta.compression is not None
+    assert len(data) < meta.size
+    assert decode(data, meta) == value
+
+    raw = b"x" * COMPRESS_THRESHOLD
+    data, meta = encode(raw)
+    assert meta.compression is None and data == raw
+
+
+def test_to_text():
+    assert to_text("a") == "a"
+    assert to_text(b"a") == "a"
+    assert to_text({"a": 1}) == '{"a": 1}'
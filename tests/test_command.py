@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+import time
+import pytest
+from taskcrafter.command import run_command
+from taskcrafter.exceptions.plugin import (
+    PluginExecutionError,
+    PluginExecutionTimeoutError,
+)
+from taskcrafter.models.plugin import PluginCommand
+from taskcrafter.stream import StreamPipe
+
+
+def test_run_command_streams_output():
+    lines = []
+    command = PluginCommand(
+        args=["sh", "-c", 'echo "$FOO"; echo err >&2; cat'],
+        env={"FOO": "bar"},
+        input=b"from stdin\n" * 10000,
+    )
+
+    result = run_command(command, on_output=lambda *line: lines.append(line))
+
+    assert result.returncode == 0
+    assert result.stdout == "bar\n" + "from stdin\n" * 10000
+    assert result.stderr == "err\n"
+    assert ("stderr", "err") in lines
+    assert lines.count(("stdout", "from stdin")) == 10000
+    assert "FOO" not in os.environ
+
+
+def test_run_command_timeout():
+    with pytest.raises(PluginExecutionTimeoutError):
+        run_command(PluginCommand(args=["sleep", "5"]), timeout=0.2)
+
+
+def test_run_command_stream_input():
+    pipe = StreamPipe()
+
+    def write():
+        for index in range(3):
+            time.sleep(0.05)
+            pipe.put(f"line {index}\n")
+        pipe.close()
+
+    threading.Thread(target=write).start()
+    # output is read while the command waits for the next chunk
+    command = PluginCommand(args=["sh", "-c", "head -c 200000 /dev/zero; cat"])
+    command.input = pipe
+    result = run_command(command, timeout=10)
+
+    assert result.stdout.endswith("line 0\nline 1\nline 2\n")
+    assert len(result.stdout) == 200000 + 21
+
+
+def test_run_command_stream_input_timeout():
+    pipe = StreamPipe()
+
+    start = time.monotonic()
+    with pytest.raises(PluginExecutionTimeoutError):
+        run_command(PluginCommand(args=["cat"], input=pipe), timeout=0.2)
+    assert time.monotonic() - start < 2
+    pipe.close()
+
+
+def test_run_command_not_found():
+    with pytest.raises(PluginExecutionError):
+        run_command(PluginCommand(args=["taskcrafter-missing-binary"]))
+
+
+def test_run_command_usage():
+    # python allocates and burns CPU, so both are above the shell's usage
+    command = PluginCommand(
+        args=[
+            sys.executable,
+            "-c",
+            "data = bytearray(64 * 1024 * 1024); sum(range(3_000_000))",
+        ]
+    )
+
+    result = run_command(command, timeout=30)
+
+    assert result.returncode == 0
+    assert result.usage.get_cpu_time() > 0
+    assert result.usage.max_rss >= 64 * 1024 * 1024
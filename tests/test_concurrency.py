@@ -0,0 +1,48 @@
+from taskcrafter.concurrency import AdaptiveConcurrency, RunFeedback
+from taskcrafter.models.scheduler import AdaptiveConcurrencyConfig
+
+
+def test_run_feedback():
+    feedback = RunFeedback(window=4)
+
+    feedback.record("fast", 0.1)
+    feedback.record("slow", 10)
+    # relative to their own job, neither of them got slower
+    feedback.record("fast", 0.1)
+    feedback.record("slow", 10)
+    assert feedback.get_latency_ratio() == 1.0
+
+    feedback.record("fast", 0.4)
+    feedback.record("fast", 1, error=True)
+    assert feedback.get_latency_ratio() == 2.0
+    assert feedback.get_error_rate() == 0.25
+
+
+def test_adaptive_concurrency():
+    feedback = RunFeedback(window=10)
+    concurrency = AdaptiveConcurrency(
+        AdaptiveConcurrencyConfig(min=2, max=4, backoff=0.5), feedback, 10
+    )
+    dispatched = []
+
+    for index in range(6):
+        concurrency.submit(lambda index=index: dispatched.append(index))
+
+    # only min jobs run at first, the others wait for a slot
+    assert dispatched == [0, 1]
+
+    feedback.record("job", 1)
+    concurrency.release()
+    # the limit was used and the runs are healthy, so it grows by one
+    assert concurrency.get_limit() == 3
+    assert dispatched == [0, 1, 2, 3]
+
+    for _ in range(3):
+        feedback.record("job", 1, error=True)
+    concurrency.release()
+    concurrency.release()
+    concurrency.release()
+    # errors halve the limit once per limit finished jobs
+    assert concurrency.get_limit() == 2
+    assert concurrency.running == 2
+    assert dispatched == [0, 1, 2, 3, 4, 5]
@@ -0,0 +1,42 @@
+import pytest
+from taskcrafter.condition import Condition, get_condition
+from taskcrafter.exceptions.job import JobValidationError
+
+
+def test_evaluate_env_and_params():
+    condition = Condition('env["DEPLOY"] == "1" and int(params["count"]) > 2')
+
+    assert condition.evaluate({"count": "3"}, env={"DEPLOY": "1"})
+    assert not condition.evaluate({"count": "3"}, env={})
+    assert not condition.evaluate({"count": "1"}, env={"DEPLOY": "1"})
+    assert condition.results == []
+
+
+def test_evaluate_results():
+    condition = Condition('result("check") == "ok" or result("count", "n") > 0')
+    outputs = {("check", None): "no", ("count", "n"): 2}
+
+    assert condition.results == ["check", "count"]
+    assert condition.evaluate(read_result=lambda *key: outputs.get(key), env={})
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "params.__class__",
+        "__import__('os')",
+        "open('/etc/passwd')",
+        "[x for x in params]",
+        "lambda: 1",
+        'result(params["job"])',
+        'int(x="1")',
+        "env ==",
+    ],
+)
+def test_rejects_unsafe_expressions(expression):
+    with pytest.raises(JobValidationError):
+        Condition(expression)
+
+
+def test_compiled_once():
+    assert get_condition("True") is get_condition("True")
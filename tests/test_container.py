@@ -1,7 +1,15 @@
-from taskcrafter.container import run_job_in_docker
+from taskcrafter.container import (
+    ImagePrefetcher,
+    parse_stats,
+    pull_image,
+    run_job_in_docker,
+)
 from taskcrafter.models.job import Job
 from unittest.mock import patch, MagicMock
 from docker import DockerClient
+from docker.errors import ImageNotFound
+from pathlib import Path
+from taskcrafter.input_output_resolver import CacheManager
 from docker.models.containers import Container
 
 
@@ -49,6 +57,7 @@ def test_run_job_in_docker(mock_docker_client):
         command=job.container.command,
         volumes=job.container.volumes,
         environment=job.params,
+        mounts=[],
         detach=True,
         privileged=job.container.privileged,
         user=job.container.user,
@@ -59,3 +68,102 @@ def test_run_job_in_docker(mock_docker_client):
     mock_container_instance.logs.assert_called_once()
 
     assert logs == "Hello World"
+
+
+def make_container(image="alpine"):
+    return Job(
+        id="pull", name="Pull", container={"image": image, "command": "true"}
+    ).container
+
+
+@patch("taskcrafter.container.get_docker_client")
+def test_pull_image_only_missing(mock_get_client):
+    client = mock_get_client.return_value
+    container = make_container("registry.local:5000/tools:1.2")
+
+    assert pull_image(container) == 0.0
+    client.images.pull.assert_not_called()
+
+    client.images.get.side_effect = ImageNotFound("missing")
+    pull_image(container)
+    client.images.pull.assert_called_once_with("registry.local:5000/tools", tag="1.2")
+
+
+@patch("taskcrafter.container.pull_image")
+def test_image_prefetcher(mock_pull_image):
+    images = ImagePrefetcher(workers=2)
+    alpine, busybox = make_container(), make_container("busybox")
+
+    images.prefetch([alpine, busybox, make_container()])
+    images.wait(alpine)
+    images.wait(busybox)
+    images.shutdown()
+
+    # every image is pulled once, the job does not pull it again
+    assert mock_pull_image.call_count == 2
+
+    # a job whose image was not prefetched pulls it itself
+    images.wait(make_container("ubuntu"), docker_client="client")
+    mock_pull_image.assert_called_with(make_container("ubuntu"), "client")
+
+
+@patch("taskcrafter.container.get_docker_client")
+def test_run_job_in_docker_results(mock_get_client, tmp_path):
+    job = Job(
+        id="report",
+        name="Report",
+        container={"image": "alpine", "command": "true", "result_dir": "/out"},
+    )
+    client = mock_get_client.return_value
+
+    def run(image, mounts, environment, **kwargs):
+        # the container writes its outputs to the mounted directory
+        source = Path(mounts[0]["Source"])
+        (source / "summary.json").write_text('{"rows": 3}')
+        (source / "data.csv").write_text("a,b\n")
+        assert mounts[0]["Target"] == environment["TASKCRAFTER_RESULT_DIR"] == "/out"
+        container = MagicMock(spec=Container)
+        container.wait.return_value = {"StatusCode": 0}
+        container.logs.return_value = b"log line"
+        return container
+
+    client.containers.run.side_effect = run
+
+    results = run_job_in_docker(job, {}, result_dir=tmp_path / "results")
+
+    assert sorted(results) == ["data", "summary"]
+    source = Path(results["data"].path).parent
+
+    cache = CacheManager(tmp_path, run_id="run1")
+    cache.write_output(job.id, results)
+    # the files are moved into the cache, not copied
+    assert cache.read_output(job.id, "summary") == '{"rows": 3}'
+    assert list(source.iterdir()) == []
+
+
+def test_parse_stats():
+    sample = {
+        "cpu_stats": {
+            "cpu_usage": {
+                "total_usage": 3_000_000_000,
+                "usage_in_usermode": 2_500_000_000,
+                "usage_in_kernelmode": 500_000_000,
+            }
+        },
+        "memory_stats": {"usage": 50 * 1024 * 1024},
+        "blkio_stats": {
+            "io_service_bytes_recursive": [
+                {"major": 8, "minor": 0, "op": "read", "value": 4096},
+                {"major": 8, "minor": 0, "op": "write", "value": 8192},
+                {"major": 8, "minor": 16, "op": "Read", "value": 1024},
+            ]
+        },
+    }
+
+    usage = parse_stats(sample, max_rss=80 * 1024 * 1024)
+
+    assert (usage.user_time, usage.system_time) == (2.5, 0.5)
+    # the peak of earlier samples is kept
+    assert usage.max_rss == 80 * 1024 * 1024
+    assert (usage.read_bytes, usage.write_bytes) == (5120, 8192)
+    assert parse_stats({"cpu_stats": None, "blkio_stats": None}).get_cpu_time() == 0
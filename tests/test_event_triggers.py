@@ -0,0 +1,168 @@
+import os
+import queue
+import socket
+import time
+import urllib.request
+import pytest
+from taskcrafter import event_triggers
+from taskcrafter.event_triggers import (
+    Debouncer,
+    EventTriggerManager,
+    FileWatcher,
+    QueueReader,
+)
+from taskcrafter.exceptions.job import JobValidationError
+from taskcrafter.models.job import Job
+from taskcrafter.util.validator import _validate_job_trigger
+
+
+def collect(source_class, *args):
+    events = queue.Queue()
+    source = source_class(events.put, *args)
+    source.start()
+    # the watch is registered once the thread runs
+    time.sleep(0.1)
+    return source, events
+
+
+def test_debouncer_collapses_bursts():
+    fired = queue.Queue()
+    debouncer = Debouncer(lambda events: fired.put(events) or True, debounce=0.1)
+    debouncer.start()
+
+    for i in range(20):
+        debouncer.add(i)
+
+    assert fired.get(timeout=2) == list(range(20))
+    debouncer.add(20)
+    assert fired.get(timeout=2) == [20]
+    debouncer.stop()
+
+
+def test_debouncer_keeps_events_of_a_busy_job():
+    fired = queue.Queue()
+    attempts = []
+
+    def on_fire(events):
+        attempts.append(events)
+        if len(attempts) == 1:
+            return False
+        fired.put(events)
+        return True
+
+    debouncer = Debouncer(on_fire, debounce=0.05, max_wait=1)
+    debouncer.start()
+    debouncer.add("a")
+
+    assert fired.get(timeout=2) == ["a"]
+    assert len(attempts) == 2
+    debouncer.stop()
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_file_watcher(tmp_path, monkeypatch, inotify):
+    if not inotify:
+        monkeypatch.setattr(event_triggers, "_libc", None)
+        monkeypatch.setattr(event_triggers, "POLL_INTERVAL", 0.05)
+    elif event_triggers._libc is None:
+        pytest.skip("inotify is not available")
+
+    watcher, events = collect(FileWatcher, str(tmp_path), "*.csv")
+    (tmp_path / "ignored.txt").write_text("x")
+    (tmp_path / "data.csv").write_text("x")
+
+    assert events.get(timeout=2) == {
+        "type": "file",
+        "path": str(tmp_path / "data.csv"),
+    }
+    watcher.stop()
+
+
+def test_queue_reader(tmp_path):
+    fifo = tmp_path / "jobs.fifo"
+    reader, events = collect(QueueReader, str(fifo))
+
+    fd = os.open(fifo, os.O_WRONLY)
+    os.write(fd, b'{"id": 1}\nplain text\n')
+    os.close(fd)
+
+    assert events.get(timeout=2) == {"type": "queue", "data": {"id": 1}}
+    assert events.get(timeout=2) == {"type": "queue", "data": "plain text"}
+    reader.stop()
+
+
+def test_webhook_trigger():
+    fired = queue.Queue()
+    manager = EventTriggerManager(
+        lambda job, events: fired.put((job.id, events)) or True
+    )
+    job = Job(
+        id="deploy",
+        name="Deploy",
+        plugin="echo",
+        trigger={"type": "webhook", "port": 0, "debounce": 0.05},
+    )
+    manager.add_job(job)
+    port = manager.servers[0].server_address[1]
+    manager.start()
+
+    for i in range(3):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/deploy", data=f'{{"n": {i}}}'.encode()
+        )
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 202
+
+    job_id, events = fired.get(timeout=2)
+    assert job_id == "deploy"
+    assert [event["data"]["n"] for event in events] == [0, 1, 2]
+    manager.stop()
+
+
+def test_webhook_port_in_use():
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        job = Job(
+            id="deploy",
+            name="Deploy",
+            plugin="echo",
+            trigger={"type": "webhook", "port": busy.getsockname()[1]},
+        )
+        manager = EventTriggerManager(lambda job, events: True)
+
+        with pytest.raises(JobValidationError):
+            manager.add_job(job)
+    assert not manager.has_triggers()
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_stopped_source_is_inactive(tmp_path, monkeypatch, inotify):
+    if not inotify:
+        monkeypatch.setattr(event_triggers, "_libc", None)
+    stopped = queue.Queue()
+    manager = EventTriggerManager(lambda job, events: True, stopped.put)
+    job = Job(
+        id="ingest",
+        name="Ingest",
+        plugin="echo",
+        trigger={"type": "file", "path": str(tmp_path / "missing" / "inbox")},
+    )
+    manager.add_job(job)
+    assert manager.has_triggers()
+
+    manager.start()
+
+    assert stopped.get(timeout=2) is job
+    assert not manager.has_triggers()
+    manager.stop()
+
+
+def test_validate_job_trigger():
+    job = Job(id="job", name="Job", trigger={"type": "file"})
+    with pytest.raises(JobValidationError):
+        _validate_job_trigger(job)
+
+    job = Job(id="job", name="Job", schedule="* * * * *", trigger={"type": "webhook"})
+    with pytest.raises(JobValidationError):
+        _validate_job_trigger(job)
@@ -0,0 +1,63 @@
+import pytest
+from unittest.mock import MagicMock
+from taskcrafter.exceptions.hook import HookNotFound
+from taskcrafter.exceptions.job import JobFailedError
+from taskcrafter.hook_loader import HookManager
+from taskcrafter.models.hook import HookType
+from taskcrafter.models.job import Job
+
+JOBS_FILE = """
+jobs:
+  - id: hello
+    name: Hello
+    plugin: echo
+  - id: before
+    name: Before
+    plugin: echo
+    enabled: false
+hooks:
+  before_job:
+    - before
+"""
+
+
+def _hook_manager():
+    job_manager = MagicMock()
+    job_manager.job_get_by_id.side_effect = lambda job_id: Job(
+        id=job_id, name=job_id, plugin="echo", enabled=False
+    )
+
+    return HookManager(JOBS_FILE, job_manager=job_manager)
+
+
+def test_hooks_are_indexed_by_type():
+    hook_manager = _hook_manager()
+
+    assert hook_manager.has_hook(HookType.BEFORE_JOB)
+    assert hook_manager.hook_get_by_type(HookType.BEFORE_JOB).jobs[0].id == "before"
+
+    with pytest.raises(HookNotFound):
+        hook_manager.hook_get_by_type(HookType.AFTER_ALL)
+
+
+def test_run_hook_runs_a_copy_of_each_hook_job():
+    hook_manager = _hook_manager()
+    hook_job = hook_manager.hook_get_by_type(HookType.BEFORE_JOB).jobs[0]
+
+    hook_manager.run_hook(HookType.BEFORE_JOB, "hello")
+
+    run_job = hook_manager.job_manager.run_job
+    run_job.assert_called_once()
+    job, stack = run_job.call_args.args
+    assert job is not hook_job
+    assert job.enabled is True
+    assert hook_job.enabled is False
+    assert stack == ["Hook(before_job;parent=hello)"]
+
+
+def test_run_hook_ignores_missing_and_failing_hooks():
+    hook_manager = _hook_manager()
+    hook_manager.job_manager.run_job.side_effect = JobFailedError("failed")
+
+    assert hook_manager.run_hook(HookType.AFTER_JOB, "hello") is None
+    assert hook_manager.run_hook(HookType.BEFORE_JOB, "hello") is not None
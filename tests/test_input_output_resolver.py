@@ -0,0 +1,112 @@
+from pathlib import Path
+from taskcrafter.input_output_resolver import (
+    CacheManager,
+    InputResolver,
+    find_profile_path,
+    list_runs,
+    prune_runs,
+)
+from taskcrafter.models.result import ResultHandle
+
+
+def test_resolve_items(tmp_path, monkeypatch):
+    resolver = InputResolver(CacheManager(tmp_path))
+    items_file = tmp_path / "items.txt"
+    items_file.write_text("a\nb\n\nc\n")
+    monkeypatch.setenv("TASKCRAFTER_ITEMS", '["x", "y"]')
+
+    assert resolver.resolve_items([1, 2]) == [1, 2]
+    assert resolver.resolve_items(f"${{file:{items_file}}}") == ["a", "b", "c"]
+    assert resolver.resolve_items("${env:TASKCRAFTER_ITEMS}") == ["x", "y"]
+    assert resolver.resolve_items("[1, 'two']") == [1, "two"]
+
+
+def test_result_handle_output(tmp_path):
+    cache = CacheManager(tmp_path)
+    resolver = InputResolver(cache)
+    handle = ResultHandle.from_bytes(b"\x00\xffdata", cache.get_result_dir())
+
+    cache.write_output("job", {"blob": handle, "raw": b"\x01\x02"})
+
+    assert not (cache.get_result_dir() / Path(handle.path).name).exists()
+    assert cache.get_output_file("job", key="raw").read_bytes() == b"\x01\x02"
+
+    resolved = resolver.resolve("${handle:job:blob}")
+    assert isinstance(resolved, ResultHandle)
+    assert bytes(resolved.buffer()) == b"\x00\xffdata"
+    assert resolver.resolve("at ${handle:job:blob}") == f"at {resolved.path}"
+
+
+def test_result_handle_from_path(tmp_path):
+    cache = CacheManager(tmp_path)
+    extract = tmp_path / "extract.csv"
+    extract.write_text("a,b\n")
+
+    cache.write_output("job", ResultHandle.from_path(extract))
+
+    assert cache.get_output_file("job").is_symlink()
+    assert cache.read_handle("job").read_bytes() == b"a,b\n"
+
+
+def test_result_keeps_type(tmp_path):
+    cache = CacheManager(tmp_path)
+    resolver = InputResolver(cache)
+
+    cache.write_output("job", {"rows": [{"id": 1}], "blob": b"\x00\xff", "n": 3})
+    cache.get_output_file("legacy").write_text("plain")
+
+    assert resolver.resolve("${result:job:rows}") == [{"id": 1}]
+    assert resolver.resolve("${result:job:blob}") == b"\x00\xff"
+    assert resolver.resolve("${result:job:n}") == 3
+    assert resolver.resolve("n=${result:job:n}") == "n=3"
+    assert resolver.resolve("${result:legacy}") == "plain"
+    assert resolver.resolve_items("${result:job:rows}") == [{"id": 1}]
+    # missing results are empty strings, not None
+    assert resolver.resolve("${result:missing}") == ""
+    assert resolver.resolve("${result:job:missing}") == ""
+    assert resolver.resolve("[${result:missing}]") == "[]"
+    assert resolver.resolve_items("${result:missing}") == []
+
+
+def test_runs_are_namespaced(tmp_path):
+    first = CacheManager(tmp_path, run_id="1")
+    second = CacheManager(tmp_path, run_id="2")
+
+    first.write_output("job", "first")
+
+    assert first.read_output("job") == "first"
+    assert second.read_output("job") is None
+    assert [run.run_id for run in list_runs(tmp_path)] == ["1"]
+
+
+def test_find_profile_path(tmp_path):
+    for run_id in ["1", "2", "3"]:
+        cache = CacheManager(tmp_path, run_id)
+        cache.run_dir.mkdir(parents=True)
+        if run_id != "3":
+            path = cache.get_profile_path("job")
+            path.parent.mkdir()
+            path.with_name("job.prof").write_text("")
+
+    assert find_profile_path("job", tmp_path) == tmp_path / "runs/2/profiles/job"
+    assert find_profile_path("other", tmp_path) is None
+
+    prune_runs(tmp_path, max_runs=1)
+    assert find_profile_path("job", tmp_path) is None
+
+
+def test_prune_runs(tmp_path):
+    for run_id in ["1", "2", "3", "4"]:
+        CacheManager(tmp_path, run_id=run_id).write_output("job", "x" * 1024)
+    (tmp_path / ".job.1.stdout").write_text("legacy")
+
+    removed = prune_runs(tmp_path, max_runs=3, keep=["1"])
+    assert [run.run_id for run in removed] == ["2"]
+    assert not (tmp_path / ".job.1.stdout").exists()
+
+    removed = prune_runs(tmp_path, max_size_mb=2.5 / 1024, keep=["1"])
+    assert [run.run_id for run in removed] == ["3"]
+
+    removed = prune_runs(tmp_path, max_age_days=0)
+    assert [run.run_id for run in removed] == ["1", "4"]
+    assert list_runs(tmp_path) == []
@@ -0,0 +1,334 @@
+import os
+import time
+from types import ModuleType
+from taskcrafter.config import app_config
+from taskcrafter.input_output_resolver import CacheManager, list_runs
+from taskcrafter.job_loader import JobManager, merge_partitions
+from taskcrafter.metrics import job_duration
+from taskcrafter.models.job import JobStatus
+from taskcrafter.models.plugin import PluginInterface
+from taskcrafter.models.result import RESULT_DIR_ENV
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.plugin_loader import import_and_validate_plugin
+from taskcrafter.plugins import binary, echo
+from taskcrafter.rate_limiter import RateLimiter
+from taskcrafter.tracing import tracer
+
+JOBS = """
+jobs:
+  - id: part
+    name: Partitioned
+    plugin: flaky
+    partitions: 4
+    retries:
+      count: 1
+    params:
+      index: ${PARTITION_INDEX}
+      count: ${PARTITION_COUNT}
+"""
+
+
+class FlakyPlugin(PluginInterface):
+    name = "Flaky"
+    description = "Fails the first run of partition 2."
+    in_process = True
+    runs: list[str] = []
+
+    def run(self, params: dict):
+        FlakyPlugin.runs.append(params["index"])
+        if params["index"] == "2" and FlakyPlugin.runs.count("2") == 1:
+            raise RuntimeError("flaky")
+
+        return f"{params['index']}/{params['count']};"
+
+
+def test_partitions_retry_failed_only(tmp_path, monkeypatch):
+    module = ModuleType("flaky")
+    module.Plugin = FlakyPlugin
+    import_and_validate_plugin("flaky", module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+
+    manager = JobManager(JOBS)
+    manager.start_run()
+    job = manager.job_get_by_id("part")
+    manager.run_job(job)
+
+    assert job.result.get_status() == JobStatus.SUCCESS
+    assert sorted(FlakyPlugin.runs) == ["0", "1", "2", "2", "3"]
+    assert manager.cache.read_output("part") == "0/4;1/4;2/4;3/4;"
+
+
+def test_merge_partitions():
+    assert merge_partitions(["a", "b"]) == "ab"
+    assert merge_partitions([b"a", b"b"]) == b"ab"
+    assert merge_partitions([{"a": 1}, "b"]) == [{"a": 1}, "b"]
+    assert merge_partitions(
+        [{"rows": "a;", "count": 1}, {"rows": "b;", "count": 2, "last": b"x"}]
+    ) == {"rows": "a;b;", "count": [1, 2], "last": b"x"}
+
+
+CONDITIONS = """
+jobs:
+  - id: check
+    name: Check
+    plugin: echo_thread
+    params:
+      message: skip
+  - id: deploy
+    name: Deploy
+    plugin: echo_thread
+    depends_on: [check]
+    when: result("check", "message") == "deploy"
+  - id: notify
+    name: Notify
+    plugin: echo_thread
+    depends_on: [deploy]
+  - id: cleanup
+    name: Cleanup
+    plugin: echo_thread
+    when: env["TASKCRAFTER_CLEANUP"] == "1"
+    on_success: [report]
+  - id: report
+    name: Report
+    plugin: echo_thread
+"""
+
+
+class EchoPlugin(PluginInterface):
+    name = "Echo"
+    description = "Returns its params."
+    in_process = True
+
+    def run(self, params: dict):
+        return params
+
+
+def test_conditions_skip_downstream(tmp_path, monkeypatch):
+    module = ModuleType("echo_thread")
+    module.Plugin = EchoPlugin
+    import_and_validate_plugin("echo_thread", module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+    monkeypatch.delenv("TASKCRAFTER_CLEANUP", raising=False)
+
+    manager = JobManager(CONDITIONS)
+    manager.start_run()
+    # conditions without results are evaluated before anything is scheduled
+    assert manager.prune_jobs() == ["cleanup", "report"]
+
+    # as scheduled, dependants wait until check runs them
+    for job_id in ["deploy", "notify", "check"]:
+        manager.run_job(manager.job_get_by_id(job_id))
+
+    statuses = {job.id: job.result.get_status() for job in manager.jobs}
+    assert statuses == {
+        "check": JobStatus.SUCCESS,
+        "deploy": JobStatus.SKIPPED,
+        "notify": JobStatus.SKIPPED,
+        "cleanup": JobStatus.SKIPPED,
+        "report": JobStatus.SKIPPED,
+    }
+    assert manager.get_in_progress() == 0
+    assert manager.cache.read_output("deploy") is None
+
+
+def test_result_transfer_traced(tmp_path, monkeypatch):
+    import_and_validate_plugin("echo", echo)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+    monkeypatch.setattr(tracer, "enabled", False)
+    tracer.enable()
+
+    manager = JobManager(
+        "jobs:\n  - id: hello\n    name: Hello\n    plugin: echo\n"
+        "    params:\n      message: hi\n"
+    )
+    manager.start_run()
+    manager.run_job(manager.job_get_by_id("hello"))
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans["queue.get"].parent_id == spans["plugin.run"].span_id
+    assert manager.cache.read_value("hello", "message") == "hi"
+
+
+STREAMS = """
+jobs:
+  - id: numbers
+    name: Numbers
+    plugin: binary
+    params:
+      command: seq
+      args: ["1", "3"]
+  - id: params
+    name: Params
+    plugin: echo
+    stream_from: numbers
+    params:
+      message: hi
+  - id: count
+    name: Count
+    plugin: count_stream
+    stream_from: numbers
+"""
+
+
+class CountStreamPlugin(PluginInterface):
+    name = "Count stream"
+    description = "Counts the chunks of its stream and returns its params."
+    in_process = True
+
+    def run(self, params: dict):
+        return params | {"chunks": len(list(params["_stream"]))}
+
+
+def test_stream_consumers_return_params(tmp_path, monkeypatch):
+    import_and_validate_plugin("echo", echo)
+    import_and_validate_plugin("binary", binary)
+    module = ModuleType("count_stream")
+    module.Plugin = CountStreamPlugin
+    import_and_validate_plugin("count_stream", module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+
+    manager = JobManager(STREAMS)
+    manager.start_run()
+    manager.run_job(manager.job_get_by_id("numbers"))
+
+    for job in manager.jobs:
+        assert job.result.get_status() == JobStatus.SUCCESS, job.id
+    # the pipe is not part of the results
+    assert manager.cache.read_value("params", "message") == "hi"
+    assert manager.cache.read_value("params", "_stream") is None
+    assert manager.cache.read_value("count", "chunks") == 3
+
+
+CHAINED = """
+jobs:
+  - id: source
+    name: Source
+    plugin: echo_thread
+    on_success: [target, target, target]
+  - id: target
+    name: Target
+    plugin: timed
+    rate_limit: slow
+"""
+
+
+class TimedPlugin(PluginInterface):
+    name = "Timed"
+    description = "Records when it runs."
+    in_process = True
+    runs: list[float] = []
+
+    def run(self, params: dict):
+        TimedPlugin.runs.append(time.monotonic())
+
+
+def test_chained_jobs_rate_limited(tmp_path, monkeypatch):
+    for name, plugin in [("echo_thread", EchoPlugin), ("timed", TimedPlugin)]:
+        module = ModuleType(name)
+        module.Plugin = plugin
+        import_and_validate_plugin(name, module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+
+    manager = JobManager(CHAINED)
+    manager.start_run()
+    manager.rate_limiter = RateLimiter(
+        {"slow": RateLimit(name="slow", rate=5, burst=1)}
+    )
+    duration = job_duration.get_sum(job="source", plugin="echo_thread")
+    # on_success jobs run inline, without the pool, and still wait for tokens
+    manager.run_job(manager.job_get_by_id("source"))
+    manager.rate_limiter.stop()
+
+    assert len(TimedPlugin.runs) == 3
+    assert TimedPlugin.runs[-1] - TimedPlugin.runs[0] >= 0.35
+    # the duration of source does not include the jobs it triggered
+    assert 0 < job_duration.get_sum(job="source", plugin="echo_thread") - duration < 0.3
+
+
+def test_partitions_profiled_separately(tmp_path, monkeypatch):
+    import_and_validate_plugin("echo", echo)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+
+    manager = JobManager(
+        "jobs:\n  - id: part\n    name: Part\n    plugin: echo\n"
+        "    partitions: 2\n    profile: cpu\n"
+        "    params:\n      message: ${PARTITION_INDEX}\n"
+    )
+    manager.start_run()
+    manager.run_job(manager.job_get_by_id("part"))
+
+    assert manager.job_get_by_id("part").result.get_status() == JobStatus.SUCCESS
+    for index in range(2):
+        path = manager.cache.get_profile_path("part", index)
+        assert path.parent.joinpath(f"{path.name}.prof").exists()
+
+
+def test_thread_spans_nest(tmp_path, monkeypatch):
+    import_and_validate_plugin("echo", echo)
+    import_and_validate_plugin("binary", binary)
+    module = ModuleType("echo_thread")
+    module.Plugin = EchoPlugin
+    import_and_validate_plugin("echo_thread", module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+    monkeypatch.setattr(tracer, "enabled", False)
+    tracer.enable()
+
+    manager = JobManager(
+        STREAMS.replace("plugin: count_stream", "plugin: echo_thread")
+        + "  - id: part\n    name: Part\n    plugin: echo_thread\n"
+        "    partitions: 2\n"
+    )
+    manager.start_run()
+    manager.run_job(manager.job_get_by_id("numbers"))
+    manager.run_job(manager.job_get_by_id("part"))
+
+    spans = {span.span_id: span for span in tracer.spans}
+    jobs = {span.attributes["job"]: span for span in tracer.spans if span.name == "job"}
+    # stream jobs run in their own threads, as children of the upstream job
+    assert jobs["params"].parent_id == jobs["numbers"].span_id
+    assert jobs["count"].parent_id == jobs["numbers"].span_id
+
+    partitions = [span for span in tracer.spans if span.name == "partition"]
+    assert len(partitions) == 2
+    for span in partitions:
+        assert spans[span.parent_id].name == "partitions"
+        assert spans[spans[span.parent_id].parent_id] is jobs["part"]
+
+
+def test_events_param(tmp_path, monkeypatch):
+    module = ModuleType("echo_thread")
+    module.Plugin = EchoPlugin
+    import_and_validate_plugin("echo_thread", module)
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+
+    manager = JobManager(
+        "jobs:\n  - id: ingest\n    name: Ingest\n    plugin: echo_thread\n"
+        "    params:\n      events: all\n"
+    )
+    manager.start_run()
+    manager.run_job(manager.job_get_by_id("ingest"), events=[{"path": "a.csv"}])
+
+    # events do not replace a param of the same name
+    assert manager.cache.read_value("ingest", "events") == "all"
+    assert manager.cache.read_value("ingest", "_events") == [{"path": "a.csv"}]
+
+
+def test_start_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_config.cache, "dir", str(tmp_path))
+    monkeypatch.setattr(app_config.cache, "max_runs", 1)
+    monkeypatch.delenv(RESULT_DIR_ENV, raising=False)
+    for run_id in ["1", "2"]:
+        CacheManager(tmp_path, run_id=run_id).write_output("job", "x")
+
+    # reading the jobs, e.g. jobs list, changes nothing
+    manager = JobManager("jobs: []\n")
+    assert len(list_runs(tmp_path)) == 2
+    assert RESULT_DIR_ENV not in os.environ
+
+    manager.start_run()
+    # the cache is pruned in the background
+    deadline = time.monotonic() + 5
+    while len(list_runs(tmp_path)) > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [run.run_id for run in list_runs(tmp_path)] == ["2"]
+    assert os.environ[RESULT_DIR_ENV] == str(manager.cache.get_result_dir().absolute())
@@ -1,4 +1,5 @@
-from taskcrafter.logger import _setup, LOG_FILE
+from taskcrafter.logger import _setup, _stop_listener, JsonFormatter, LOG_FILE
+import json
 import logging
 
 
@@ -9,3 +10,28 @@ def test_logger_setup():
     logger = _setup("test_logger", level=logging.DEBUG, log_file=LOG_FILE)
     assert logger.name == "test_logger"
     assert logger.level == logging.DEBUG
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "test", logging.INFO, __file__, 1, "Hello %s", ("world",), None
+    )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["message"] == "Hello world"
+
+
+def test_logger_writes_through_queue(tmp_path):
+    log_file = tmp_path / "logs" / "test.log"
+    logger = _setup(
+        "test_queue_logger", log_file=str(log_file), level="info", log_format="json"
+    )
+
+    logger.debug("not logged")
+    logger.info("logged %d", 1)
+    _stop_listener("test_queue_logger")
+
+    lines = log_file.read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["logged 1"]
@@ -0,0 +1,48 @@
+import urllib.request
+from taskcrafter.metrics import CONTENT_TYPE, MetricsRegistry
+
+
+def test_render_openmetrics():
+    registry = MetricsRegistry()
+    runs = registry.counter("test_runs", "Runs.", ("job",))
+    duration = registry.histogram("test_duration_seconds", "Duration.", buckets=(1, 5))
+
+    runs.inc(job="hello")
+    runs.inc(job="hello")
+    duration.observe(0.5)
+    duration.observe(3)
+
+    text = registry.render()
+
+    assert "# TYPE test_runs counter" in text
+    assert 'test_runs_total{job="hello"} 2.0' in text
+    assert 'test_duration_seconds_bucket{le="1.0"} 1' in text
+    assert 'test_duration_seconds_bucket{le="5.0"} 2' in text
+    assert 'test_duration_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_duration_seconds_sum 3.5" in text
+    assert text.endswith("# EOF\n")
+
+
+def test_write_textfile(tmp_path):
+    registry = MetricsRegistry()
+    registry.gauge("test_in_progress", "In progress.").set(3)
+
+    path = tmp_path / "metrics" / "taskcrafter.prom"
+    registry.write_textfile(str(path))
+
+    assert "test_in_progress 3.0" in path.read_text()
+
+
+def test_serve_metrics():
+    registry = MetricsRegistry()
+    registry.gauge("test_in_progress", "In progress.").set(1)
+
+    registry.serve(0)
+    port = registry.server.server_address[1]
+
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+            assert resp.headers["Content-Type"] == CONTENT_TYPE
+            assert "test_in_progress 1.0" in resp.read().decode()
+    finally:
+        registry.shutdown()
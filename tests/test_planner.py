@@ -0,0 +1,87 @@
+import pytest
+from taskcrafter.exceptions.job import JobValidationError
+from taskcrafter.models.job import Job
+from taskcrafter.planner import build_plan
+from taskcrafter.preview import plan_preview
+
+
+def make_jobs():
+    extract_a = Job(id="extract_a", name="Extract A", on_success=["report"])
+    extract_b = Job(id="extract_b", name="Extract B", partitions=4)
+    transform = Job(
+        id="transform", name="Transform", depends_on=["extract_a", "extract_b"]
+    )
+    load = Job(id="load", name="Load", stream_from="transform")
+    report = Job(id="report", name="Report")
+
+    return [extract_a, extract_b, transform, load, report]
+
+
+def test_build_plan_waves_and_critical_path():
+    durations = {"extract_a": 1, "extract_b": 5, "transform": 2, "load": 3}
+
+    plan = build_plan(make_jobs(), durations, default_duration=0.5)
+    waves = [[step.job_id for step in wave] for wave in plan.get_waves()]
+
+    # report is enabled, so it is scheduled and also runs after extract_a
+    assert waves == [
+        ["extract_a", "extract_b", "report"],
+        ["transform", "report", "load"],
+    ]
+    # load streams from transform, so both start when extract_b finished
+    assert plan.critical_path == ["extract_b", "transform", "load"]
+    assert plan.makespan == 8
+    assert plan.get_max_width() == 6
+    assert plan.get_total_duration() == 12
+
+    triggered, scheduled = [step for step in plan.steps if step.job_id == "report"]
+    assert triggered.estimated and triggered.triggered
+    assert triggered.start == 1
+    assert triggered.depends_on == ["extract_a"]
+    assert scheduled.start == 0 and not scheduled.triggered
+
+
+def test_build_plan_blocked_jobs():
+    jobs = make_jobs()
+    jobs[1].enabled = False
+
+    plan = build_plan(jobs)
+
+    assert plan.blocked == ["transform", "load"]
+    assert [step.job_id for step in plan.steps] == ["extract_a", "report", "report"]
+
+
+def test_build_plan_disabled_trigger_target():
+    build = Job(id="build", name="Build")
+    deploy = Job(id="deploy", name="Deploy", depends_on=["build"], on_success=["ok"])
+    ok = Job(id="ok", name="Ok", enabled=False)
+    unused = Job(id="unused", name="Unused", enabled=False)
+
+    plan = build_plan([build, deploy, ok, unused], {"build": 1, "deploy": 2, "ok": 5})
+    waves = [[step.job_id for step in wave] for wave in plan.get_waves()]
+
+    # disabled jobs only run when they are triggered
+    assert waves == [["build"], ["deploy"], ["ok"]]
+    assert plan.critical_path == ["build", "deploy", "ok"]
+    assert plan.makespan == 8
+    assert plan.blocked == []
+
+    deploy.enabled = False
+    plan = build_plan([build, deploy, ok, unused])
+
+    assert [step.job_id for step in plan.steps] == ["build"]
+    assert plan.blocked == []
+
+
+def test_build_plan_trigger_cycle():
+    a = Job(id="a", name="A", depends_on=["b"])
+    b = Job(id="b", name="B", on_success=["a"], depends_on=["a"])
+
+    with pytest.raises(JobValidationError):
+        build_plan([a, b])
+
+
+def test_plan_preview():
+    plan = build_plan(make_jobs(), {"extract_a": 1})
+
+    assert plan_preview(plan, pool_size=2) is None
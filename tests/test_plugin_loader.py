@@ -0,0 +1,70 @@
+import queue
+from types import ModuleType
+from taskcrafter.exceptions.plugin import PluginExecutionError
+from taskcrafter.models.plugin import PluginInterface
+from taskcrafter.models.result import HANDLE_THRESHOLD, ResultHandle
+from taskcrafter.plugin_loader import (
+    import_and_validate_plugin,
+    plugin_execute_batch,
+    wrap_large_result,
+)
+from taskcrafter.plugins import echo, exception
+
+
+def test_plugin_execute_batch():
+    import_and_validate_plugin("echo", echo)
+    import_and_validate_plugin("exception", exception)
+    results = queue.Queue()
+
+    plugin_execute_batch("echo", [{"item": 1}, {"item": 2}], results, 3)
+    index, batch_results, usage = results.get_nowait()
+    assert (index, batch_results) == (3, [{"item": 1}, {"item": 2}])
+    assert usage.get_cpu_time() > 0
+
+    plugin_execute_batch("exception", [{}], results, 0)
+    index, batch_results, _ = results.get_nowait()
+    assert isinstance(batch_results[0], PluginExecutionError)
+
+    plugin_execute_batch("missing", [{}, {}], results, 1)
+    index, batch_results, _ = results.get_nowait()
+    assert len(batch_results) == 2
+
+
+class BatchPlugin(PluginInterface):
+    name = "Batch"
+    description = "Sums numbers, with one setup per batch."
+    setups = 0
+
+    def run(self, params: dict):
+        return self.run_batch([params])[0]
+
+    def run_batch(self, batch: list[dict]) -> list:
+        BatchPlugin.setups += 1
+        return [
+            ValueError("no number") if "number" not in params else params["number"] + 1
+            for params in batch
+        ]
+
+
+def test_plugin_execute_batch_run_batch():
+    module = ModuleType("batch")
+    module.Plugin = BatchPlugin
+    import_and_validate_plugin("batch", module)
+    results = queue.Queue()
+
+    plugin_execute_batch("batch", [{"number": 1}, {}, {"number": 2}], results, 0)
+    _, batch_results, _ = results.get_nowait()
+
+    assert BatchPlugin.setups == 1
+    assert batch_results[0] == 2 and batch_results[2] == 3
+    assert isinstance(batch_results[1], PluginExecutionError)
+
+
+def test_wrap_large_result(tmp_path):
+    large = b"x" * HANDLE_THRESHOLD
+    result = wrap_large_result({"large": large, "small": b"x"}, tmp_path)
+
+    assert isinstance(result["large"], ResultHandle)
+    assert result["large"].size == HANDLE_THRESHOLD
+    assert result["small"] == b"x"
+    assert wrap_large_result(large) is large
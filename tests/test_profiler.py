@@ -0,0 +1,43 @@
+from taskcrafter.profiler import (
+    PROFILE_SUFFIX,
+    SNAPSHOT_SUFFIX,
+    get_profile_file,
+    profile_call,
+    profile_modes,
+    top_allocations,
+    top_functions,
+)
+
+
+def _allocate(size: int):
+    return [str(i) for i in range(size)]
+
+
+def test_profile_modes():
+    assert profile_modes(True) == (True, True)
+    assert profile_modes("cpu") == (True, False)
+    assert profile_modes("memory") == (False, True)
+    assert profile_modes(False) == (False, False)
+
+
+def test_profile_call_writes_profile_and_snapshot(tmp_path):
+    path = tmp_path / "profiles" / "job.1"
+
+    result = profile_call(_allocate, (1000,), path)
+
+    assert len(result) == 1000
+
+    functions = top_functions(get_profile_file(path, PROFILE_SUFFIX), limit=50)
+    assert any("_allocate" in entry.location for entry in functions)
+
+    allocations = top_allocations(get_profile_file(path, SNAPSHOT_SUFFIX))
+    assert any(__file__ in entry.location for entry in allocations)
+
+
+def test_profile_call_cpu_only(tmp_path):
+    path = tmp_path / "job"
+
+    profile_call(_allocate, (10,), path, "cpu")
+
+    assert get_profile_file(path, PROFILE_SUFFIX).exists()
+    assert not get_profile_file(path, SNAPSHOT_SUFFIX).exists()
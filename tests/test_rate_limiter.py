@@ -0,0 +1,91 @@
+import threading
+import time
+from taskcrafter.models.job import Job
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=2)
+    now = bucket.updated
+
+    for _ in range(2):
+        assert bucket.get_wait(now) == 0
+        bucket.take()
+
+    assert round(bucket.get_wait(now), 3) == 0.1
+    assert bucket.get_wait(now + 0.11) == 0
+    # never more than burst tokens
+    assert bucket.get_wait(now + 60) == 0 and bucket.tokens == 2
+
+
+def test_rate_limit_applies_to():
+    limit = RateLimit(name="api", rate=1, plugins=["binary"], hosts=["api.local"])
+
+    assert limit.applies_to(Job(id="a", name="A", rate_limit="api"))
+    assert limit.applies_to(Job(id="b", name="B", plugin="binary"))
+    assert limit.applies_to(
+        Job(id="c", name="C", plugin="url", params={"url": "https://api.local/x"})
+    )
+    assert not limit.applies_to(
+        Job(id="d", name="D", plugin="url", params={"url": "https://other/x"})
+    )
+
+
+def test_rate_limiter_dispatch():
+    limiter = RateLimiter(
+        {
+            "slow": RateLimit(name="slow", rate=5, burst=1),
+            "fast": RateLimit(name="fast", rate=100, burst=3),
+        }
+    )
+    dispatched = []
+    done = threading.Event()
+
+    def dispatch(job_id: str):
+        dispatched.append((job_id, time.monotonic()))
+        if len(dispatched) == 6:
+            done.set()
+
+    start = time.monotonic()
+    for index in range(3):
+        job = Job(id=f"slow{index}", name="Slow", rate_limit="slow")
+        limiter.submit(job, lambda job_id=job.id: dispatch(job_id))
+    for index in range(2):
+        job = Job(id=f"fast{index}", name="Fast", rate_limit="fast")
+        limiter.submit(job, lambda job_id=job.id: dispatch(job_id))
+    # jobs without a limit are dispatched right away
+    limiter.submit(Job(id="free", name="Free"), lambda: dispatch("free"))
+
+    assert done.wait(5)
+    limiter.stop()
+
+    times = dict(dispatched)
+    assert [job_id for job_id, _ in dispatched if job_id.startswith("slow")] == [
+        "slow0",
+        "slow1",
+        "slow2",
+    ]
+    # fast jobs are not held up by the queued slow ones
+    assert times["fast1"] - start < 0.1
+    assert times["slow2"] - start >= 0.35
+
+
+def test_rate_limiter_acquire():
+    limiter = RateLimiter({"slow": RateLimit(name="slow", rate=5, burst=1)})
+    job = Job(id="slow", name="Slow", rate_limit="slow")
+
+    start = time.monotonic()
+    assert limiter.acquire(job)
+    assert limiter.acquire(job)
+    assert time.monotonic() - start >= 0.15
+
+    # a job admitted by submit holds its tokens already
+    start = time.monotonic()
+    with limiter.admitted(job):
+        assert limiter.acquire(job)
+    assert time.monotonic() - start < 0.1
+
+    # waiting jobs are dropped when the limiter stops
+    threading.Timer(0.05, limiter.stop).start()
+    assert not limiter.acquire(job)
@@ -0,0 +1,112 @@
+import json
+import sqlite3
+from taskcrafter.models.job import Job, JobStatus, ResourceUsage
+from taskcrafter.models.run_record import RunRecord
+from taskcrafter.preview import regression_preview, slowest_preview, stats_preview
+from taskcrafter.run_store import RunStore
+
+
+def make_record(job_id: str, elapsed: float, started_at: float, **kwargs):
+    return RunRecord(
+        **{
+            "run_id": "run1",
+            "job_id": job_id,
+            "plugin": "echo",
+            "attempt": 1,
+            "status": "success",
+            "started_at": started_at,
+            "queue_wait": 0.01,
+            "elapsed": elapsed,
+            "output_size": 10,
+        }
+        | kwargs
+    )
+
+
+def test_duration_stats(tmp_path):
+    store = RunStore(tmp_path / "runs.db")
+    store.record([make_record("job1", i, i) for i in range(1, 101)])
+    store.record([make_record("job2", 0.5, 0, plugin="url", status="error")])
+
+    by_job = store.duration_stats()
+
+    assert [entry.name for entry in by_job] == ["job1", "job2"]
+    assert (by_job[0].runs, by_job[0].p50, by_job[0].p95, by_job[0].p99) == (
+        100,
+        50,
+        95,
+        99,
+    )
+    assert by_job[1].errors == 1
+
+    by_plugin = store.duration_stats(by="plugin", since=50)
+    assert [(entry.name, entry.runs) for entry in by_plugin] == [("echo", 51)]
+
+    slowest = store.slowest(3)
+    assert [record.elapsed for record in slowest] == [100, 99, 98]
+
+    assert stats_preview(by_job) is None
+    assert slowest_preview(slowest) is None
+
+
+def test_regressions(tmp_path):
+    store = RunStore(tmp_path / "runs.db")
+    # job1 slowed down in its last 5 runs, job2 is steady
+    store.record([make_record("job1", 1, i) for i in range(50)])
+    store.record([make_record("job1", 3, 50 + i) for i in range(5)])
+    store.record([make_record("job2", 2, i) for i in range(55)])
+    # failed runs are not part of the baseline
+    store.record([make_record("job2", 100, 60, status="error")])
+
+    regressions = store.regressions(window=5, baseline=50, threshold=1.5)
+
+    assert [regression.job_id for regression in regressions] == ["job1"]
+    assert regressions[0].get_ratio() == 3
+    assert store.estimates(limit=5) == {"job1": 3, "job2": 2}
+    assert regression_preview(regressions, 1.5) is None
+
+
+def test_export(tmp_path):
+    store = RunStore(tmp_path / "runs.db")
+    store.record([make_record("job1", i, i) for i in range(3)])
+
+    assert store.export(tmp_path / "runs.csv", job_id="job1") == 3
+    lines = (tmp_path / "runs.csv").read_text().splitlines()
+    assert lines[0].startswith("run_id,job_id,plugin")
+    assert len(lines) == 4
+
+    assert store.export(tmp_path / "runs.json", since=1) == 2
+    records = json.loads((tmp_path / "runs.json").read_text())
+    assert [record["elapsed"] for record in records] == [1, 2]
+
+
+def test_record_from_job():
+    job = Job(id="job1", name="Job 1", plugin="echo", schedule="* * * * *")
+    job.result.start()
+    job.result.run_time = 1.5
+    job.result.attempts = 2
+    # scheduled jobs stay running after they succeeded
+    job.result.set_status(JobStatus.RUNNING)
+
+    job.result.usage += ResourceUsage(user_time=0.5, max_rss=1024)
+
+    record = RunRecord.from_job(job, "run1")
+
+    assert (record.status, record.elapsed, record.attempt) == ("success", 1.5, 2)
+    assert (record.user_time, record.max_rss) == (0.5, 1024)
+
+
+def test_migrate_store_without_pull_time(tmp_path):
+    connection = sqlite3.connect(tmp_path / "runs.db")
+    connection.execute(
+        "CREATE TABLE job_runs (id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, "
+        "job_id TEXT NOT NULL, plugin TEXT NOT NULL, attempt INTEGER NOT NULL, "
+        "status TEXT NOT NULL, started_at REAL NOT NULL, queue_wait REAL NOT NULL, "
+        "elapsed REAL NOT NULL, output_size INTEGER NOT NULL)"
+    )
+    connection.close()
+
+    store = RunStore(tmp_path / "runs.db")
+    store.record([make_record("job1", 1, 1, pull_time=4.5)])
+
+    assert store.slowest()[0].pull_time == 4.5
@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from taskcrafter.models.job import Job
+from taskcrafter.models.rate_limit import RateLimit
+from taskcrafter.models.scheduler import ExecutorStats, Firing, SchedulerConfig
+from taskcrafter.rate_limiter import RateLimiter
+from taskcrafter.scheduler import SchedulerManager, TimedThreadPool
+
+
+def test_scheduler_config_update_ignores_unset_values():
+    config = SchedulerConfig(**{"pool_size": 4, "coalesce": True})
+
+    config.update(pool_size=None, max_instances=3, coalesce=None, unknown=1)
+
+    assert config.pool_size == 4
+    assert config.max_instances == 3
+    assert config.coalesce is True
+    assert config.get_job_defaults() == {
+        "max_instances": 3,
+        "misfire_grace_time": 1,
+        "coalesce": True,
+    }
+
+
+def test_executor_stats_queue_depth():
+    stats = ExecutorStats(pool_size=2)
+
+    for _ in range(5):
+        stats.job_submitted()
+
+    assert stats.get_running() == 2
+    assert stats.get_queue_depth() == 3
+
+    stats.job_completed()
+    stats.job_completed()
+
+    assert stats.get_queue_depth() == 1
+    assert stats.peak_queue_depth == 3
+
+
+def test_timed_thread_pool_rate_limit():
+    limiter = RateLimiter({"api": RateLimit(name="api", rate=20, burst=1)})
+    pool = TimedThreadPool(2, limiter)
+    jobs = [Job(id=f"job{index}", name="Job", rate_limit="api") for index in range(3)]
+
+    start = time.monotonic()
+    futures = [pool.submit(lambda job: job.id, job) for job in jobs]
+
+    assert [future.result(timeout=5) for future in futures] == ["job0", "job1", "job2"]
+    # two jobs waited for a token, but not for a worker
+    assert time.monotonic() - start >= 0.09
+    assert all(job.result.queue_wait < 0.05 for job in jobs)
+
+    limiter.stop()
+    pool.shutdown()
+
+
+def test_fire_cron_jobs_coalesce():
+    manager = SchedulerManager.__new__(SchedulerManager)
+    manager.config = SchedulerConfig(misfire_grace_time=600)
+    manager.executor_stats = ExecutorStats()
+    manager._stats_lock = threading.Lock()
+    submitted = []
+    manager.submit_job = lambda job: submitted.append(job.id)
+
+    jobs = [
+        Job(id="every", name="Every", schedule="*/5 * * * *"),
+        Job(id="last", name="Last", schedule="*/5 * * * *", coalesce=True),
+    ]
+    now = datetime.now(timezone.utc)
+    # a missed tick within the grace time, the next one is due as well
+    manager.fire_cron_jobs(
+        Firing(time=now - timedelta(minutes=5), jobs=jobs, superseded={"every", "last"})
+    )
+    manager.fire_cron_jobs(Firing(time=now, jobs=jobs))
+
+    assert submitted == ["every", "every", "last"]
@@ -0,0 +1,51 @@
+import threading
+import pytest
+from taskcrafter.exceptions.plugin import PluginExecutionError
+from taskcrafter.stream import StreamClosedError, StreamPipe, feed_streams
+
+
+def rows(count: int):
+    for index in range(count):
+        yield index
+    return {"rows": count}
+
+
+def test_feed_streams_generator():
+    pipe = StreamPipe(maxsize=2)
+    received = []
+    reader = threading.Thread(target=lambda: received.extend(pipe))
+    reader.start()
+
+    result = feed_streams(rows(100), [pipe])
+    pipe.close()
+    reader.join()
+
+    assert result == {"rows": 100}
+    assert received == list(range(100))
+
+
+def test_feed_streams_without_streams():
+    assert feed_streams(rows(3), []) == [0, 1, 2]
+    assert feed_streams("value", None) == "value"
+
+
+def test_stream_backpressure():
+    pipe = StreamPipe(maxsize=1)
+    pipe.put(1)
+
+    # the reader is gone, a full pipe must not block the writer forever
+    pipe.reader_done.set()
+    with pytest.raises(StreamClosedError):
+        pipe.put(2)
+
+
+def test_stream_error():
+    pipe = StreamPipe()
+    pipe.put("chunk")
+    pipe.close("boom")
+    pipe.close()
+
+    chunks = iter(pipe)
+    assert next(chunks) == "chunk"
+    with pytest.raises(PluginExecutionError):
+        next(chunks)
@@ -0,0 +1,80 @@
+import json
+import threading
+import pytest
+from taskcrafter.tracing import STATUS_CODE_ERROR, Tracer
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+
+    with tracer.span("job") as span:
+        assert span is None
+
+    assert tracer.spans == []
+
+
+def test_spans_nest_per_thread():
+    tracer = Tracer()
+    tracer.enable()
+
+    with tracer.span("job", job="hello") as job_span:
+        with tracer.span("apply_templates") as child:
+            tracer.set_attribute("params", 2)
+
+        def other_thread():
+            with tracer.span("job", job="other"):
+                pass
+
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+
+    spans = {span.span_id: span for span in tracer.spans}
+    assert spans[child.span_id].parent_id == job_span.span_id
+    assert spans[child.span_id].attributes == {"params": 2}
+    assert job_span.parent_id is None
+    assert [
+        s.parent_id for s in tracer.spans if s.attributes.get("job") == "other"
+    ] == [None]
+
+
+def test_attach_span_of_other_thread():
+    tracer = Tracer()
+    tracer.enable()
+
+    with tracer.span("partitions") as parent:
+
+        def partition():
+            with tracer.attach(parent), tracer.span("partition"):
+                pass
+
+        thread = threading.Thread(target=partition)
+        thread.start()
+        thread.join()
+
+    spans = {span.name: span for span in tracer.spans}
+    assert spans["partition"].parent_id == parent.span_id
+    # attached spans are not recorded twice
+    assert len(tracer.spans) == 2
+
+
+def test_export_otlp_json(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+
+    with pytest.raises(ValueError):
+        with tracer.span("job", job="hello", execution_stack=["hello"]):
+            raise ValueError("boom")
+
+    path = tmp_path / "trace.json"
+    tracer.export(str(path))
+
+    spans = json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(spans) == 1
+    assert spans[0]["traceId"] == tracer.trace_id
+    assert len(spans[0]["spanId"]) == 16
+    assert spans[0]["status"] == {
+        "code": STATUS_CODE_ERROR,
+        "message": "ValueError: boom",
+    }
+    assert {"key": "job", "value": {"stringValue": "hello"}} in spans[0]["attributes"]
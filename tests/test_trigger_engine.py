@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from taskcrafter.models.job import Job
+from taskcrafter.trigger_engine import TriggerEngine
+
+NOW = datetime(2030, 1, 1, 11, 58, 30, tzinfo=timezone.utc)
+
+
+def make_engine():
+    engine = TriggerEngine(timezone=timezone.utc)
+
+    for i in range(1000):
+        # same expressions share one cohort, whitespace does not matter
+        schedule = "*/5 * * * *" if i % 2 else "*/5  *  * * *"
+        engine.add_job(Job(id=f"job{i}", name="Job", schedule=schedule), now=NOW)
+    engine.add_job(Job(id="hourly", name="Hourly", schedule="0 * * * *"), now=NOW)
+
+    return engine
+
+
+def test_cohorts_are_deduplicated():
+    engine = make_engine()
+
+    assert len(engine.cohorts) == 2
+    assert len(engine.heap) == 2
+    assert engine.get_job_count() == 1001
+
+
+def test_forecast_merges_cohorts_of_a_tick():
+    engine = make_engine()
+
+    firings = engine.forecast(3)
+
+    assert [firing.time.strftime("%H:%M") for firing in firings] == [
+        "12:00",
+        "12:05",
+        "12:10",
+    ]
+    assert firings[0].schedules == ["*/5 * * * *", "0 * * * *"]
+    assert len(firings[0].jobs) == 1001
+    assert len(firings[1].jobs) == 1000
+    # forecasting does not advance the engine
+    assert engine.forecast(1)[0].time == firings[0].time
+
+
+def test_pop_due_fires_missed_ticks():
+    engine = make_engine()
+    late = datetime(2030, 1, 1, 12, 7, tzinfo=timezone.utc).timestamp()
+
+    firing = engine.pop_due(late)
+    assert firing.time.strftime("%H:%M") == "12:00"
+    assert len(firing.jobs) == 1001
+    # 12:05 is due as well, only the hourly job is not superseded
+    assert len(firing.superseded) == 1000 and "hourly" not in firing.superseded
+
+    firing = engine.pop_due(late)
+    assert firing.time.strftime("%H:%M") == "12:05"
+    assert len(firing.jobs) == 1000 and not firing.superseded
+
+    assert engine.pop_due(late) is None
+    assert engine.forecast(1)[0].time.strftime("%H:%M") == "12:10"
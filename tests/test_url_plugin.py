@@ -0,0 +1,77 @@
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from taskcrafter.models.result import RESULT_DIR_ENV, ResultHandle
+from taskcrafter.plugins.url import Plugin
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    clients = set()
+
+    def do_GET(self):
+        Handler.clients.add(self.client_address)
+        body = self.path.encode()
+        if self.path == "/missing":
+            # larger than the socket buffers, an unread body blocks the connection
+            body = b"x" * 1024 * 1024
+        self.send_response(200 if self.path != "/missing" else 404)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Handler.clients.clear()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_url_reuses_connections(server):
+    plugin = Plugin()
+
+    for index in range(5):
+        assert plugin.run({"url": f"{server}/{index}"}) == f"/{index}".encode()
+
+    assert len(Handler.clients) == 1
+
+
+def test_url_batch(server):
+    requests = [{"url": f"{server}/{index}"} for index in range(20)]
+
+    result = Plugin().run({"requests": requests, "concurrency": 4, "pool_size": 4})
+
+    assert result == [f"/{index}".encode() for index in range(20)]
+    assert len(Handler.clients) <= 4
+
+
+def test_url_stream(server, tmp_path, monkeypatch):
+    monkeypatch.setenv(RESULT_DIR_ENV, str(tmp_path / "results"))
+    result = Plugin().run({"url": f"{server}/streamed", "stream": True})
+
+    assert isinstance(result, ResultHandle)
+    assert Path(result.path).parent == tmp_path / "results"
+    assert result.read_bytes() == b"/streamed"
+
+
+def test_url_error(server):
+    with pytest.raises(RuntimeError):
+        Plugin().run({"url": f"{server}/missing", "retries": 0})
+
+
+def test_url_stream_error_reuses_connection(server):
+    plugin = Plugin()
+
+    with pytest.raises(RuntimeError):
+        plugin.run({"url": f"{server}/missing", "stream": True, "retries": 0})
+
+    assert plugin.run({"url": f"{server}/found"}) == b"/found"
+    assert len(Handler.clients) == 1